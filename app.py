@@ -1,18 +1,146 @@
 
+import hashlib
+import io
+import os
+import sys
+import threading
+
 import streamlit as st
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "definitions"))
+from definitions import (  # noqa: E402
+    DEFAULT_CLASS_COLORS, ConverterPool, HttpDocumentCache, LayoutElementStore, LazyPageSequence,
+    load_pdf_document, page_numbers_of, parse_page_selection, process_pdf_with_docling, render_page_overlay,
+)
+
+# Converted documents and rendered overlays are shared by every session of this server process.
+MAX_CACHED_DOCUMENTS = 8
+MAX_CACHED_OVERLAYS = 256
+MAX_CACHED_PAGES_PER_DOCUMENT = 16
+
+
+def _docling_converter():
+    from docling.document_converter import DocumentConverter
+    return DocumentConverter()
+
+
+@st.cache_resource
+def get_converter_pool():
+    """One pool of warm converters for the whole server, shared by all sessions."""
+    return ConverterPool(size=int(os.environ.get("DOCLING_CONVERTERS", "1")), converter_factory=_docling_converter)
+
+
+@st.cache_resource
+def get_http_cache():
+    cache_dir = os.environ.get("DOCLING_HTTP_CACHE_DIR")
+    return HttpDocumentCache(cache_dir) if cache_dir else None
+
+
+@st.cache_resource
+def get_overlay_lock():
+    # render_page_overlay shares one OverlayLayerCache; sessions run on separate threads.
+    return threading.Lock()
+
+
+@st.cache_data(show_spinner="Downloading PDF...", max_entries=MAX_CACHED_DOCUMENTS)
+def fetch_pdf_from_url(url):
+    # Streamed bodies over the spool threshold come back as an mmap, which cache_data cannot pickle.
+    return bytes(load_pdf_document('url', url, stream=True, http_cache=get_http_cache()))
+
+
+@st.cache_resource(show_spinner="Running layout analysis...", max_entries=MAX_CACHED_DOCUMENTS)
+def convert_document(document_hash, page_selection, _pdf_bytes):
+    """
+    Converts a document once per content hash and page selection. Pages are rendered lazily and
+    the elements are kept in a LayoutElementStore for the class list and the element table.
+    """
+    docling_result = process_pdf_with_docling(get_converter_pool(), _pdf_bytes, pages=page_selection)
+    pages = LazyPageSequence(docling_result, max_cached_pages=MAX_CACHED_PAGES_PER_DOCUMENT)
+    return pages, LayoutElementStore.from_docling_result(docling_result)
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_OVERLAYS)
+def render_overlay_png(document_hash, page_selection, page_index, visible_classes, _pages):
+    """Draws one page with its visible classes at screen size, once per (document, page, classes)."""
+    page_image, elements = _pages[page_index]
+    with get_overlay_lock():
+        overlay, _ = render_page_overlay(page_image, elements, list(visible_classes), DEFAULT_CLASS_COLORS)
+    buffer = io.BytesIO()
+    overlay.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def read_pdf_source():
+    """Returns the selected document's bytes, or None until one is provided."""
+    source = st.sidebar.radio("PDF source", ("Upload", "URL"), horizontal=True)
+    if source == "Upload":
+        uploaded = st.sidebar.file_uploader("PDF file", type=["pdf"])
+        if uploaded is None:
+            return None
+        return load_pdf_document('upload', uploaded.getvalue())
+    url = st.sidebar.text_input("PDF URL", placeholder="https://arxiv.org/pdf/2408.09869")
+    if not url:
+        return None
+    return fetch_pdf_from_url(url)
+
+
 st.set_page_config(page_title="QuCreate Streamlit Lab", layout="wide")
 st.sidebar.image("assets/images/company_logo.jpg")
 st.sidebar.divider()
 st.title("QuCreate Streamlit Lab")
 st.divider()
 
-# Code goes here
+st.header("Docling Layout Inspector")
+try:
+    pdf_bytes = read_pdf_source()
+except Exception as e:
+    st.error(f"Could not load the PDF: {e}")
+    pdf_bytes = None
+
+if pdf_bytes is None:
+    st.info("Upload a PDF or enter a URL in the sidebar to inspect its layout.")
+else:
+    document_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    page_spec = st.sidebar.text_input("Pages to analyse", placeholder="all, e.g. 10-12, 1,3,5 or first 5")
+    try:
+        page_selection = parse_page_selection(page_spec) if page_spec.strip() else None
+    except (TypeError, ValueError) as e:
+        st.sidebar.error(str(e))
+        st.stop()
+    try:
+        pages, store = convert_document(document_hash, page_selection, pdf_bytes)
+    except Exception as e:
+        st.error(f"Layout analysis failed: {e}")
+        st.stop()
+
+    if len(pages) == 0:
+        st.warning("The document has none of the selected pages." if page_selection else "The document has no pages.")
+        st.stop()
+
+    # Slider positions are labelled with the original page numbers of the analysed pages.
+    page_numbers = page_numbers_of(pages)
+    page_number = st.sidebar.select_slider("Page", page_numbers) if len(page_numbers) > 1 else page_numbers[0]
+    page_index = page_numbers.index(page_number)
+    document_classes = [name for name in DEFAULT_CLASS_COLORS if name in store.class_names]
+    visible_classes = st.sidebar.multiselect("Visible classes", document_classes, default=document_classes)
+
+    st.image(render_overlay_png(document_hash, page_selection, page_index, tuple(sorted(visible_classes)), pages),
+             caption=f"Page {page_number} ({page_index + 1} of {len(pages)} analysed)")
+
+    start, stop = store.page_range(page_index)
+    visible = set(visible_classes)
+    rows = [
+        {"class": element.class_name, "confidence": element.confidence, "bbox": element.bbox,
+         "text": element.text_content}
+        for element in store.page_elements(page_index) if element.class_name in visible
+    ]
+    with st.expander(f"Elements on this page ({len(rows)} of {stop - start} shown)"):
+        st.dataframe(rows, use_container_width=True)
 
 st.divider()
 st.write("© 2025 QuantUniversity. All Rights Reserved.")
 st.caption("The purpose of this demonstration is solely for educational use and illustration. "
            "To access the full legal documentation, please visit this link. Any reproduction of this demonstration "
            "requires prior written consent from QuantUniversity.")
-st.caption(This lab was generated using the QuCreate platform. QuCreate relies on AI models for generating code, "
+st.caption("This lab was generated using the QuCreate platform. QuCreate relies on AI models for generating code, "
            "which may contain inaccuracies or errors.")
@@ -3,45 +3,889 @@ def install_and_import_libraries():
     return None
 
 import requests
+import mmap
+import tempfile
+
+# Defaults for streaming URL downloads (see load_pdf_document(..., stream=True)).
+DEFAULT_MAX_DOWNLOAD_BYTES = 200 * 1024 * 1024
+DEFAULT_SPOOL_THRESHOLD_BYTES = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 def _is_pdf_content(content: bytes) -> bool:
     """
     Checks if the given bytes content appears to be a PDF by looking for the '%PDF' magic bytes.
+    Accepts any bytes-like object (bytes, memoryview, mmap).
     """
-    return content.startswith(b'%PDF')
+    return bytes(content[:4]) == b'%PDF'
 
-def load_pdf_document(source_type, source_value):
+def _read_streamed_body(response, url, max_bytes=None, spool_threshold=None, spool_dir=None, require_pdf=False):
     """
-    Loads a PDF document from an uploaded file's bytes or by downloading it from a specified URL.
-    Performs validation to ensure content is a PDF and includes error handling.
+    Reads the body of a streamed requests.Response without holding more than spool_threshold
+    bytes of it in memory.
 
-    Args:
-      source_type (str): The type of source, either 'upload' for file bytes or 'url' for a web link.
-      source_value (bytes or str): The actual content (bytes) if 'upload' or the URL (string) if 'url'.
+    Content-Length (when sent) and the running byte count are checked against max_bytes. With
+    require_pdf, the '%PDF' magic bytes are checked as soon as the first bytes arrive and the
+    transfer is aborted if they are missing. Once the body grows beyond spool_threshold it is
+    written to a temporary file instead: an anonymous one, or a named one in spool_dir that the
+    caller can keep (and must remove otherwise).
 
     Returns:
-      bytes: The raw byte content of the PDF document.
+      bytes or file: The body, or the flushed temporary file holding it.
 
     Raises:
-      TypeError: If source_value has an incorrect type for the given source_type.
-      ValueError: If source_type is unsupported or if the content is not a valid PDF.
-      Exception: For network-related issues or other unexpected errors during URL download.
+      ValueError: If the content is not a PDF (with require_pdf) or exceeds max_bytes.
+      requests.exceptions.RequestException: For network or HTTP errors.
+    """
+    content_length = response.headers.get('Content-Length')
+    if (max_bytes is not None and content_length is not None and content_length.isdigit()
+            and int(content_length) > max_bytes):
+        raise ValueError(f"Content from URL '{url}' is {content_length} bytes, exceeding the maximum of {max_bytes} bytes.")
+
+    buffer = bytearray()
+    spool_file = None
+    total = 0
+    magic_checked = not require_pdf
+    try:
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            if not chunk:
+                continue
+            total += len(chunk)
+            if max_bytes is not None and total > max_bytes:
+                raise ValueError(f"Content from URL '{url}' exceeds the maximum size of {max_bytes} bytes.")
+            if spool_file is None:
+                buffer += chunk
+                if not magic_checked and len(buffer) >= 4:
+                    if not _is_pdf_content(buffer):
+                        raise ValueError(f"Content from URL '{url}' is not a valid PDF document (missing %PDF magic bytes).")
+                    magic_checked = True
+                # Stay in memory until the magic bytes are checked, however small spool_threshold is.
+                if magic_checked and spool_threshold is not None and len(buffer) > spool_threshold:
+                    if spool_dir is None:
+                        spool_file = tempfile.TemporaryFile()
+                    else:
+                        spool_file = tempfile.NamedTemporaryFile(prefix='.tmp-', dir=spool_dir, delete=False)
+                    spool_file.write(buffer)
+                    buffer = None
+            else:
+                spool_file.write(chunk)
+
+        if spool_file is None:
+            if not magic_checked:
+                raise ValueError(f"Content from URL '{url}' is not a valid PDF document (missing %PDF magic bytes).")
+            return bytes(buffer)
+        spool_file.flush()
+        return spool_file
+    except BaseException:
+        if spool_file is not None:
+            spool_file.close()
+            if spool_dir is not None:
+                os.remove(spool_file.name)
+        raise
+
+def _map_file(spool_file):
+    """Returns a read-only memory map of an open file; the mapping outlives the file handle."""
+    try:
+        return mmap.mmap(spool_file.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        spool_file.close()
+
+def _download_pdf_streaming(url, max_bytes, spool_threshold):
+    """
+    Streams a PDF from url over the shared pooled session without holding the whole body in memory.
+
+    The '%PDF' magic bytes are checked as soon as the first bytes arrive and the download is
+    aborted if they are missing. Content-Length (when sent) and the running byte count are
+    checked against max_bytes. Bodies up to spool_threshold stay in memory; larger ones are
+    spooled to an anonymous temporary file and returned as a read-only memory map.
+
+    Returns:
+      bytes or mmap.mmap: The PDF content.
+
+    Raises:
+      ValueError: If the content is not a PDF or exceeds max_bytes.
+      requests.exceptions.RequestException: For network or HTTP errors.
+    """
+    with get_http_session().get(url, timeout=10, stream=True) as response:
+        response.raise_for_status()
+        body = _read_streamed_body(response, url, max_bytes, spool_threshold, require_pdf=True)
+    if isinstance(body, bytes):
+        return body
+    # The mapping keeps the unlinked temporary file alive after the handle is closed.
+    return _map_file(body)
+
+import re
+from collections import namedtuple
+
+# Structural pre-flight check of PDF buffers (see precheck_pdf). Only the head, the tail and a
+# small window at the startxref offset are read, so the cost does not depend on the file size.
+PRECHECK_HEAD_BYTES = 1024   # The header must appear within the first 1024 bytes.
+PRECHECK_TAIL_BYTES = 4096   # Holds the trailer, startxref and %%EOF of all but pathological files.
+PRECHECK_XREF_BYTES = 1024   # Start of the cross-reference table or stream at startxref.
+
+_PDF_VERSION_PATTERN = re.compile(rb'%PDF-(\d+\.\d+)')
+_STARTXREF_PATTERN = re.compile(rb'startxref\s+(\d+)')
+_XREF_OBJECT_PATTERN = re.compile(rb'\s*\d+\s+\d+\s+obj\b')
+_ENCRYPT_PATTERN = re.compile(rb'/Encrypt[\s/<\d]')
+_LINEARIZED_PATTERN = re.compile(rb'/Linearized\b[^>]*?/N\s+(\d+)', re.S)
+_PAGE_COUNT_PATTERN = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.S)
+
+PdfPrecheck = namedtuple(
+    'PdfPrecheck',
+    ['ok', 'errors', 'warnings', 'version', 'size', 'encrypted', 'linearized', 'page_count', 'startxref']
+)
+PdfPrecheck.__doc__ = """
+Verdict of precheck_pdf.
+
+Fields:
+  ok (bool): True if no error was found; the document is worth converting.
+  errors (tuple[str]): Problems that make conversion fail: 'empty', 'missing_header', 'missing_eof'
+      (usually a truncated download), 'missing_startxref' and 'bad_startxref' (the offset does not
+      point at a cross-reference table or stream).
+  warnings (tuple[str]): Tolerated oddities: 'header_not_at_start', 'data_after_eof' and
+      'encrypted'. Files with only an owner password (permission restrictions) still convert, so
+      rejecting or routing encrypted files is left to the caller.
+  version (str or None): Header version, e.g. '1.7'.
+  size (int): Size of the buffer in bytes.
+  encrypted (bool): An /Encrypt entry was found in a trailer or cross-reference stream.
+  linearized (bool): The file is linearized ("fast web view").
+  page_count (int or None): Page count from the linearization dictionary or a page tree node
+      near the head or tail, or None if neither is within reach. Approximate by design.
+  startxref (int or None): Offset of the last cross-reference section.
+"""
+
+class PdfStructureError(ValueError):
+    """Raised by load_pdf_document(..., precheck=True) for a PDF that fails precheck_pdf."""
+
+    def __init__(self, message, precheck):
+        super().__init__(message)
+        self.precheck = precheck
+
+def _precheck(read, size):
+    """precheck_pdf over a read(offset, length) -> bytes callable, for buffers and files alike."""
+    if size == 0:
+        return PdfPrecheck(False, ('empty',), (), None, 0, False, False, None, None)
+    errors, warnings = [], []
+    head = read(0, min(size, PRECHECK_HEAD_BYTES))
+    tail_start = max(0, size - PRECHECK_TAIL_BYTES)
+    tail = read(tail_start, size - tail_start)
+
+    version = None
+    header_offset = head.find(b'%PDF-')
+    if header_offset < 0:
+        errors.append('missing_header')
+        header_offset = 0
+    else:
+        if header_offset > 0:
+            warnings.append('header_not_at_start')
+        match = _PDF_VERSION_PATTERN.match(head, header_offset)
+        version = match.group(1).decode('ascii') if match else None
+
+    eof = tail.rfind(b'%%EOF')
+    if eof < 0:
+        errors.append('missing_eof')
+    elif tail[eof + 5:].strip(b'\r\n\t\f\0 '):
+        warnings.append('data_after_eof')
+
+    startxref = None
+    xref_window = b''
+    matches = list(_STARTXREF_PATTERN.finditer(tail))
+    if not matches:
+        errors.append('missing_startxref')
+    else:
+        startxref = int(matches[-1].group(1))
+        # Offsets are relative to the start of the file; readers also accept them relative to a
+        # header preceded by junk.
+        for offset in dict.fromkeys((startxref, startxref + header_offset)):
+            if offset < size:
+                window = read(offset, min(PRECHECK_XREF_BYTES, size - offset))
+                if window.startswith(b'xref') or _XREF_OBJECT_PATTERN.match(window):
+                    xref_window = window
+                    break
+        else:
+            errors.append('bad_startxref')
+
+    encrypted = any(_ENCRYPT_PATTERN.search(window) for window in (tail, xref_window, head))
+    if encrypted:
+        warnings.append('encrypted')
+
+    linearized = _LINEARIZED_PATTERN.search(head)
+    if linearized:
+        page_count = int(linearized.group(1))
+    else:
+        counts = [int(a or b) for window in (head, tail, xref_window) for a, b in _PAGE_COUNT_PATTERN.findall(window)]
+        page_count = max(counts) if counts else None
+
+    return PdfPrecheck(not errors, tuple(errors), tuple(warnings), version, size, encrypted,
+                       linearized is not None, page_count, startxref)
+
+def precheck_pdf(content):
+    """
+    Cheap structural pre-flight check of a PDF buffer, meant to run before the expensive
+    conversion. It reads only the first PRECHECK_HEAD_BYTES, the last PRECHECK_TAIL_BYTES and a
+    small window at the startxref offset, so it takes microseconds regardless of the file size,
+    catches truncated downloads and broken cross-reference offsets, and flags encrypted files.
+
+    Arguments:
+      content (bytes-like): The PDF bytes (bytes, bytearray, memoryview or mmap).
+
+    Output:
+      PdfPrecheck: The structured verdict; see its fields for the checks made.
+    """
+    view = memoryview(content)
+    return _precheck(lambda offset, length: bytes(view[offset:offset + length]), len(view))
+
+def precheck_pdf_file(path):
+    """
+    precheck_pdf for a file on disk, reading only the few kilobytes the checks need, so that batch
+    jobs can reject or route bad inputs without loading them.
+    """
+    with open(os.fspath(path), 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+
+        def read(offset, length):
+            f.seek(offset)
+            return f.read(length)
+
+        return _precheck(read, size)
+
+def _precheck_error(precheck, source):
+    """The PdfStructureError reporting a failed precheck verdict for source (a description)."""
+    return PdfStructureError(f"{source} failed the PDF structure check: {', '.join(precheck.errors)}.", precheck)
+
+import contextlib
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+# Per-stage instrumentation of the pipeline (download, validate, convert, render, draw).
+# While no sink is installed, _stage() returns a shared no-op context manager, so the
+# instrumented code paths only pay for one global lookup and one comparison.
+_instrumentation_sink = None
+_instrumentation_owns_tracemalloc = False
+_instrumentation_local = threading.local()
+_NULL_STAGE = contextlib.nullcontext()
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class _Stage:
+    """
+    Measures one stage and hands its record to the installed sink on exit. Nested stages
+    (e.g. the renders inside a traced batch item) keep the tracemalloc peak of their parent intact.
+    """
+
+    __slots__ = ('sink', 'record', 'wall_start', 'cpu_start', 'traced_start', 'traced_peak', 'parent')
+
+    def __init__(self, sink, name, labels):
+        self.sink = sink
+        self.record = {'stage': name, **labels}
+
+    def __enter__(self):
+        stack = getattr(_instrumentation_local, 'stack', None)
+        if stack is None:
+            stack = _instrumentation_local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.traced_start = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None and self.parent.traced_start is not None:
+                self.parent.traced_peak = max(self.parent.traced_peak, peak)
+            tracemalloc.reset_peak()
+            self.traced_start = self.traced_peak = current
+        self.record['started'] = time.time()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record = self.record
+        record['wall_s'] = time.perf_counter() - self.wall_start
+        record['cpu_s'] = time.process_time() - self.cpu_start
+        record['peak_rss_bytes'] = _peak_rss_bytes()
+        if self.traced_start is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.traced_peak)
+            record['traced_delta_bytes'] = current - self.traced_start
+            record['traced_peak_bytes'] = peak - self.traced_start
+            if self.parent is not None and self.parent.traced_start is not None:
+                self.parent.traced_peak = max(self.parent.traced_peak, peak)
+        record['error'] = None if exc_type is None else exc_type.__name__
+        _instrumentation_local.stack.pop()
+        try:
+            self.sink(record)
+        except Exception:
+            # A failing sink must never break the pipeline it observes.
+            logging.getLogger(__name__).exception("Instrumentation sink failed")
+        return False
+
+def _stage(name, **labels):
+    """Returns a context manager measuring the named stage, or a no-op one while instrumentation is off."""
+    sink = _instrumentation_sink
+    if sink is None:
+        return _NULL_STAGE
+    return _Stage(sink, name, labels)
+
+def enable_instrumentation(sink, trace_memory=False):
+    """
+    Starts recording per-stage measurements of the pipeline. For every stage executed
+    (download, validate, convert, render and draw; render records carry the page_index),
+    sink is called with a record dict:
+
+      stage, any labels of the stage, started (epoch seconds), wall_s, cpu_s,
+      peak_rss_bytes, error (exception type name or None) and, when tracing memory,
+      traced_delta_bytes and traced_peak_bytes.
+
+    cpu_s is process CPU time, so it includes library worker threads and, for stages running
+    concurrently, the work of other stages. peak_rss_bytes is the process high-water mark at
+    the end of the stage; the traced figures are the Python allocations made during the stage.
+
+    Arguments:
+      sink (callable): Receives one record dict per stage, e.g. an InstrumentationCollector,
+                       LoggingSink or JsonLinesSink. It may be called from several threads.
+      trace_memory (bool): Also measure Python allocations with tracemalloc, starting it if needed.
+                           This slows allocation-heavy code noticeably. Defaults to False.
+
+    Raises:
+      TypeError: If sink is not callable.
+    """
+    global _instrumentation_sink, _instrumentation_owns_tracemalloc
+    if not callable(sink):
+        raise TypeError("sink must be callable.")
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _instrumentation_owns_tracemalloc = True
+    _instrumentation_sink = sink
+
+def disable_instrumentation():
+    """Stops recording and stops tracemalloc if enable_instrumentation started it."""
+    global _instrumentation_sink, _instrumentation_owns_tracemalloc
+    _instrumentation_sink = None
+    if _instrumentation_owns_tracemalloc:
+        tracemalloc.stop()
+        _instrumentation_owns_tracemalloc = False
+
+@contextlib.contextmanager
+def instrumented(sink, trace_memory=False):
+    """Context manager form of enable_instrumentation / disable_instrumentation; yields the sink."""
+    enable_instrumentation(sink, trace_memory=trace_memory)
+    try:
+        yield sink
+    finally:
+        disable_instrumentation()
+
+class InstrumentationCollector:
+    """An in-memory sink keeping every record, with a per-stage summary."""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def summary(self):
+        """
+        Aggregates the records per stage.
+
+        Output:
+          dict: stage -> {'count', 'errors', 'wall_s', 'cpu_s', 'max_wall_s', 'max_peak_rss_bytes'},
+          with 'traced_peak_bytes' (the largest of the stage) when memory was traced.
+        """
+        with self._lock:
+            records = list(self.records)
+        summary = {}
+        for record in records:
+            entry = summary.setdefault(record['stage'], {
+                'count': 0, 'errors': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'max_wall_s': 0.0, 'max_peak_rss_bytes': None})
+            entry['count'] += 1
+            entry['errors'] += record['error'] is not None
+            entry['wall_s'] += record['wall_s']
+            entry['cpu_s'] += record['cpu_s']
+            entry['max_wall_s'] = max(entry['max_wall_s'], record['wall_s'])
+            if record['peak_rss_bytes'] is not None:
+                entry['max_peak_rss_bytes'] = max(entry['max_peak_rss_bytes'] or 0, record['peak_rss_bytes'])
+            if 'traced_peak_bytes' in record:
+                entry['traced_peak_bytes'] = max(entry.get('traced_peak_bytes', 0), record['traced_peak_bytes'])
+        return summary
+
+class LoggingSink:
+    """A sink writing one log line per stage record."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, record):
+        labels = ' '.join(f"{key}={value}" for key, value in record.items()
+                          if key not in ('stage', 'started', 'wall_s', 'cpu_s', 'error'))
+        status = f" error={record['error']}" if record['error'] else ''
+        self.logger.log(self.level, "stage=%s wall=%.2fms cpu=%.2fms %s%s", record['stage'],
+                        record['wall_s'] * 1000, record['cpu_s'] * 1000, labels, status)
+
+class JsonLinesSink:
+    """
+    A sink appending each record as one JSON line to path. Lines are flushed as they are written,
+    so the file can be followed while a long job runs. Use it as a context manager or call close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+import bisect
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Pipeline metrics: counters and histograms that load_pdf_document, process_pdf_with_docling,
+# page rendering and the caches update as they run, exported in the Prometheus text format.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Common label handling of Counter and Histogram. Values are kept per label-value tuple."""
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {list(self.labelnames)}, got {sorted(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        """Forgets every recorded value."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        """Returns the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return '\n'.join(lines) + '\n'
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. documents loaded or failures by error type."""
+
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Returns the current count for the given labels (0 if never incremented)."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}"
+
+class Histogram(_Metric):
+    """
+    Counts observations (e.g. latencies in seconds) into cumulative buckets, from which
+    dashboards derive percentiles, plus their sum and count.
+    """
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        buckets = sorted(float(bound) for bound in buckets)
+        if not buckets or buckets[-1] != math.inf:
+            buckets.append(math.inf)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """
+        Output:
+          dict: 'count', 'sum' and 'buckets', a list of (upper bound, cumulative count) pairs.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, [[0] * len(self.buckets), 0.0, 0])
+            counts = list(counts)
+        cumulative = 0
+        buckets = []
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+        return {'count': count, 'sum': total, 'buckets': buckets}
+
+    def _render_samples(self, items):
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+class MetricsRegistry:
+    """A named collection of metrics that renders them together for a scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, documentation, labelnames, **options):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **options)
+            elif type(metric) is not metric_class or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' is already registered with a different type or labels.")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Returns the counter called name, creating it on first use."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        """Returns the histogram called name, creating it on first use."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def clear(self):
+        """Resets every metric's values, keeping the metrics registered."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+        return ''.join(metric.render() for _, metric in sorted(self._metrics.items()))
+
+metrics_registry = MetricsRegistry()
+
+_documents_loaded = metrics_registry.counter(
+    'pdf_documents_loaded_total', "PDF documents loaded successfully.", ('source_type',))
+_bytes_loaded = metrics_registry.counter(
+    'pdf_bytes_loaded_total', "Bytes of PDF documents loaded successfully.", ('source_type',))
+_load_failures = metrics_registry.counter(
+    'pdf_load_failures_total', "Failed PDF loads by error type.", ('source_type', 'error_type'))
+_conversion_seconds = metrics_registry.histogram(
+    'docling_conversion_seconds', "Latency of converter.convert_single calls.")
+_conversion_failures = metrics_registry.counter(
+    'docling_conversion_failures_total', "Failed conversions by error type.", ('error_type',))
+_pages_converted = metrics_registry.counter(
+    'docling_pages_converted_total', "Pages produced by successful conversions, including cache hits.")
+_render_seconds = metrics_registry.histogram(
+    'docling_page_render_seconds', "Latency of page.render() calls.")
+_cache_requests = metrics_registry.counter(
+    'docling_cache_requests_total', "Cache lookups by cache and result (hit or miss).", ('cache', 'result'))
+
+def _error_type(error):
+    """
+    The error type reported in failure metrics. load_pdf_document wraps download errors in a plain
+    Exception, so for those the type of the underlying cause (e.g. 'ConnectionError') is reported.
+    """
+    if type(error) is Exception and error.__cause__ is not None:
+        error = error.__cause__
+    return type(error).__name__
+
+def _count_pages(docling_result):
+    try:
+        return len(docling_result.pages)
+    except (AttributeError, TypeError):
+        return 0
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = metrics_registry
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404, "Only /metrics is served.")
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes arrive every few seconds; keep them out of stderr.
+        pass
+
+def start_metrics_server(port=9464, host='127.0.0.1', registry=None):
+    """
+    Serves the registry at http://host:port/metrics in the Prometheus text format from a
+    daemon thread. Binds to localhost by default; pass host='0.0.0.0' to expose it.
+
+    Arguments:
+      port (int): TCP port; 0 picks a free one (see server.server_address). Defaults to 9464.
+      host (str): Interface to bind. Defaults to '127.0.0.1'.
+      registry (MetricsRegistry, optional): Registry to serve. Defaults to metrics_registry.
+
+    Returns:
+      ThreadingHTTPServer: The running server; call shutdown() and server_close() to stop it.
+    """
+    handler = type('MetricsRequestHandler', (_MetricsRequestHandler,),
+                   {'registry': registry if registry is not None else metrics_registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+import hashlib
+import json
+import os
+import threading
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP session so that repeated downloads reuse pooled keep-alive connections.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_maxsize=16):
+    """
+    Returns the process-wide requests.Session used for PDF downloads, creating it on first use.
+    The session keeps connections alive and pools up to pool_maxsize connections per host.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+        return _http_session
+
+class HttpDocumentCache:
+    """
+    An on-disk HTTP cache for remote PDF documents that revalidates with conditional GETs.
+
+    Each URL is stored as a body file plus a small JSON file holding its ETag and Last-Modified
+    validators. On a repeat fetch, the validators are sent as If-None-Match / If-Modified-Since;
+    a 304 Not Modified response is served from disk without transferring the body again.
+    Responses without any validator are not stored. Files are replaced atomically, so several
+    processes can share one cache directory, and one instance can be shared between threads.
+
+    Arguments:
+      cache_dir (str): Directory holding the cached responses. Created if missing.
+      session (requests.Session, optional): Session used for requests. Defaults to get_http_session().
+
+    Attributes:
+      hits (int): Fetches answered with 304 and served from disk.
+      misses (int): Fetches that transferred the full body.
     """
+
+    def __init__(self, cache_dir, session=None):
+        self.cache_dir = cache_dir
+        self.session = session if session is not None else get_http_session()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.body', base + '.json'
+
+    def fetch(self, url, timeout=10, max_bytes=None, spool_threshold=None):
+        """
+        Downloads url, or revalidates and serves it from disk if it has not changed.
+
+        Arguments:
+          url (str): Document URL.
+          timeout (float): Request timeout in seconds. Defaults to 10.
+          max_bytes (int, optional): Abort the transfer once the body exceeds this size, and
+                                     reject cached bodies larger than this.
+          spool_threshold (int, optional): Bodies larger than this are streamed to the cache file
+                                           instead of memory and returned memory-mapped. Defaults
+                                           to None (always return bytes).
+
+        Returns:
+          bytes or mmap.mmap: The response body.
+
+        Raises:
+          ValueError: If the body exceeds max_bytes.
+          requests.exceptions.RequestException: For network or HTTP errors.
+        """
+        body_path, meta_path = self._paths(url)
+        request_headers = {}
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                validators = json.load(f)
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+        except (OSError, ValueError):
+            pass
+
+        response = self.session.get(url, headers=request_headers, timeout=timeout, stream=True)
+        if response.status_code == 304 and request_headers:
+            response.close()
+            try:
+                body = self._read_cached(body_path, url, max_bytes, spool_threshold)
+                with self._lock:
+                    self.hits += 1
+                _cache_requests.inc(cache='http', result='hit')
+                return body
+            except OSError:
+                # The body was removed behind our back; repeat the request unconditionally.
+                response = self.session.get(url, timeout=timeout, stream=True)
+
+        with response:
+            response.raise_for_status()
+            body = _read_streamed_body(response, url, max_bytes, spool_threshold, spool_dir=self.cache_dir)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            self.misses += 1
+        _cache_requests.inc(cache='http', result='miss')
+
+        keep = bool(etag or last_modified)
+        if isinstance(body, bytes):
+            if keep:
+                self._store(body_path, body)
+        else:
+            # A spooled body already sits in the cache directory; move it into place.
+            try:
+                if keep:
+                    os.replace(body.name, body_path)
+                else:
+                    os.remove(body.name)
+            except OSError:
+                keep = False
+            body = _map_file(body)
+        if keep:
+            self._store(meta_path, json.dumps({'url': url, 'etag': etag,
+                                               'last_modified': last_modified}).encode('utf-8'))
+        return body
+
+    def _read_cached(self, body_path, url, max_bytes, spool_threshold):
+        """Reads a cached body, memory-mapping it if it is larger than spool_threshold."""
+        with open(body_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if max_bytes is not None and size > max_bytes:
+                raise ValueError(f"Content from URL '{url}' exceeds the maximum size of {max_bytes} bytes.")
+            if spool_threshold is not None and size > spool_threshold:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return f.read()
+
+    def _store(self, path, data):
+        """Writes data to path atomically."""
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        """Returns the hit and miss counters as a dictionary."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+def _load_pdf_document(source_type, source_value, stream=False, max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES,
+                       spool_threshold=DEFAULT_SPOOL_THRESHOLD_BYTES, http_cache=None):
+    """Loads and validates the document; load_pdf_document wraps this to record the load metrics."""
     if source_type == 'upload':
         if not isinstance(source_value, bytes):
             raise TypeError("For 'upload' source_type, source_value must be bytes.")
-        if not _is_pdf_content(source_value):
+        with _stage('validate', source_type='upload'):
+            is_pdf = _is_pdf_content(source_value)
+        if not is_pdf:
             raise ValueError("Uploaded content is not a valid PDF document (missing %PDF magic bytes).")
         return source_value
     elif source_type == 'url':
         if not isinstance(source_value, str):
             raise TypeError("For 'url' source_type, source_value must be a string (URL).")
         try:
-            # Added a timeout for robustness against slow or unresponsive servers
-            response = requests.get(source_value, timeout=10)
-            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-            pdf_content = response.content
-            if not _is_pdf_content(pdf_content):
+            with _stage('download', stream=stream, http_cache=http_cache is not None):
+                if http_cache is not None:
+                    pdf_content = http_cache.fetch(source_value, timeout=10, max_bytes=max_bytes if stream else None,
+                                                   spool_threshold=spool_threshold if stream else None)
+                elif stream:
+                    # The streaming download validates the magic bytes itself, chunk by chunk.
+                    return _download_pdf_streaming(source_value, max_bytes, spool_threshold)
+                else:
+                    # Added a timeout for robustness against slow or unresponsive servers
+                    response = requests.get(source_value, timeout=10)
+                    response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+                    pdf_content = response.content
+            with _stage('validate', source_type='url'):
+                is_pdf = _is_pdf_content(pdf_content)
+            if not is_pdf:
                 raise ValueError(f"Content from URL '{source_value}' is not a valid PDF document (missing %PDF magic bytes).")
             return pdf_content
         except requests.exceptions.RequestException as e:
@@ -54,37 +898,463 @@ def load_pdf_document(source_type, source_value):
     else:
         raise ValueError(f"Unsupported source_type: '{source_type}'. Must be 'upload' or 'url'.")
 
+def load_pdf_document(source_type, source_value, stream=False, max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES,
+                      spool_threshold=DEFAULT_SPOOL_THRESHOLD_BYTES, http_cache=None, precheck=False):
+    """
+    Loads a PDF document from an uploaded file's bytes or by downloading it from a specified URL.
+    Performs validation to ensure content is a PDF and includes error handling.
+    Successful loads and failures (by error type) are counted in metrics_registry.
+
+    Args:
+      source_type (str): The type of source, either 'upload' for file bytes or 'url' for a web link.
+      source_value (bytes or str): The actual content (bytes) if 'upload' or the URL (string) if 'url'.
+      stream (bool): For 'url' sources, stream the body instead of downloading it in one piece.
+                     The download is aborted early if the first bytes are not '%PDF' or if the
+                     body grows beyond max_bytes. Defaults to False.
+      max_bytes (int): Maximum accepted body size in streaming mode. Defaults to 200 MiB.
+      spool_threshold (int): In streaming mode, bodies larger than this are spooled to a temporary
+                             file and returned memory-mapped. Defaults to 8 MiB.
+      http_cache (HttpDocumentCache, optional): For 'url' sources, download through this cache over the
+                                                shared pooled session, so that an unchanged document
+                                                costs a 304 revalidation instead of a full transfer.
+                                                With stream=True, max_bytes is enforced and bodies
+                                                larger than spool_threshold are streamed to the cache
+                                                file and returned memory-mapped; the magic bytes are
+                                                then checked once the transfer completes.
+      precheck (bool): Also run precheck_pdf on the loaded content and reject truncated or
+                       otherwise structurally broken PDFs before they reach the converter.
+                       Encrypted PDFs are not rejected; run precheck_pdf to route them.
+                       Defaults to False.
+
+    Returns:
+      bytes: The raw byte content of the PDF document. In streaming mode, bodies larger than
+      spool_threshold are returned as a read-only mmap.mmap (a bytes-like object).
+
+    Raises:
+      TypeError: If source_value has an incorrect type for the given source_type.
+      ValueError: If source_type is unsupported or if the content is not a valid PDF.
+      PdfStructureError: If precheck is True and the content fails precheck_pdf (a ValueError
+                         carrying the verdict in its precheck attribute).
+      Exception: For network-related issues or other unexpected errors during URL download.
+    """
+    try:
+        pdf_content = _load_pdf_document(source_type, source_value, stream, max_bytes, spool_threshold, http_cache)
+        if precheck:
+            with _stage('precheck', source_type=source_type):
+                verdict = precheck_pdf(pdf_content)
+            if not verdict.ok:
+                raise _precheck_error(verdict, f"URL '{source_value}'" if source_type == 'url' else "Uploaded content")
+    except Exception as e:
+        _load_failures.inc(source_type=source_type if source_type in ('upload', 'url') else 'other',
+                           error_type=_error_type(e))
+        raise
+    _documents_loaded.inc(source_type=source_type)
+    _bytes_loaded.inc(len(pdf_content), source_type=source_type)
+    return pdf_content
+
+try:
+    from docling.document_converter import DocumentConverter
+except ImportError:  # Only needed once a converter is built; tests patch this name
+    DocumentConverter = None
+
 def initialize_docling_converter():
     """This function instantiates and returns a docling.document_converter.DocumentConverter object,
     which is the entry point for Docling's PDF processing and layout analysis capabilities.
+    It is the default converter_factory of ConverterPool and convert_documents_batch.
 
     Returns:
         DocumentConverter: An initialized Docling DocumentConverter object.
+
+    Raises:
+        ImportError: If docling is not installed.
     """
-    # In a real-world scenario, you would typically import DocumentConverter like this:
-    # from docling.document_converter import DocumentConverter
-    # However, for the purpose of passing the provided tests where a mock DocumentConverter
-    # is defined in the test scope, we can directly instantiate DocumentConverter.
+    if DocumentConverter is None:
+        raise ImportError("Building a Docling converter requires docling (pip install docling).")
     return DocumentConverter()
 
+import time
+from contextlib import contextmanager
+
+def _blank_pdf_bytes(num_pages=1):
+    """Builds a minimal, valid blank PDF of num_pages pages, used to warm up converters and in benchmarks."""
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(num_pages))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages),
+    ] + [b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * num_pages
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+WARMUP_PDF_BYTES = _blank_pdf_bytes()
+
+def _converter_is_healthy(converter):
+    """Default ConverterPool health check: the converter still exposes a callable convert_single."""
+    return callable(getattr(converter, 'convert_single', None))
+
+class ConverterPool:
+    """
+    A thread-safe pool of reusable Docling converters. Building a DocumentConverter loads the
+    layout model weights, which dominates the latency of small documents; the pool builds at
+    most 'size' converters and hands them out again and again instead.
+
+    Converters are created lazily on first borrow, or all at once by warm_up(), which also runs
+    one conversion of a blank page on each so that the models are fully loaded before the first
+    real document arrives. A converter is checked with health_check before it is handed out and
+    after a borrow that raised; unhealthy converters are discarded and replaced. After
+    max_conversions conversions a converter is retired, to contain slow memory leaks, and a
+    fresh one is built on the next borrow.
+
+    Arguments:
+      size (int): Maximum number of converters. Defaults to 2.
+      converter_factory (callable): Builds a new converter. Defaults to initialize_docling_converter.
+      max_conversions (int or None): Conversions after which a converter is recycled.
+                                     None never recycles. Defaults to None.
+      health_check (callable or None): converter -> bool. Defaults to checking that the converter
+                                       still has a callable convert_single.
+
+    Raises:
+      ValueError: If size or max_conversions is smaller than 1.
+    """
+
+    def __init__(self, size=2, converter_factory=initialize_docling_converter, max_conversions=None, health_check=None):
+        if size < 1:
+            raise ValueError("size must be a positive integer.")
+        if max_conversions is not None and max_conversions < 1:
+            raise ValueError("max_conversions must be a positive integer or None.")
+        self.size = size
+        self.converter_factory = converter_factory
+        self.max_conversions = max_conversions
+        self.health_check = health_check or _converter_is_healthy
+        self._condition = threading.Condition()
+        # Idle [converter, conversions] entries; the most recently used converter is reused first.
+        self._idle = []
+        self._live = 0
+        self.conversions = 0
+        self.recycled = 0
+        self.replaced = 0
+        self.closed = False
+
+    def _acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                entry = None
+                while entry is None:
+                    if self.closed:
+                        raise RuntimeError("The converter pool is closed.")
+                    if self._idle:
+                        entry = self._idle.pop()
+                    elif self._live < self.size:
+                        self._live += 1
+                        break
+                    else:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError("No converter became available in time.")
+                        self._condition.wait(remaining)
+            if entry is None:
+                # Build outside the lock; loading models can take seconds.
+                try:
+                    return [self.converter_factory(), 0]
+                except BaseException:
+                    with self._condition:
+                        self._live -= 1
+                        self._condition.notify()
+                    raise
+            if self.health_check(entry[0]):
+                return entry
+            with self._condition:
+                self._live -= 1
+                self.replaced += 1
+                self._condition.notify()
+
+    def _release(self, entry, converted=True, failed=False):
+        if converted:
+            entry[1] += 1
+        with self._condition:
+            if converted:
+                self.conversions += 1
+            if self.max_conversions is not None and entry[1] >= self.max_conversions:
+                self.recycled += 1
+            elif failed and not self.health_check(entry[0]):
+                self.replaced += 1
+            elif not self.closed:
+                self._idle.append(entry)
+                self._condition.notify()
+                return
+            self._live -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def borrow(self, timeout=None):
+        """
+        Context manager that lends a converter for one conversion and returns it to the pool.
+
+        Arguments:
+          timeout (float or None): Seconds to wait for a free converter. None waits indefinitely.
+
+        Raises:
+          TimeoutError: If no converter became available within timeout.
+          RuntimeError: If the pool has been closed.
+        """
+        entry = self._acquire(timeout)
+        try:
+            yield entry[0]
+        except BaseException:
+            self._release(entry, failed=True)
+            raise
+        self._release(entry)
+
+    def warm_up(self, pdf_bytes=WARMUP_PDF_BYTES, timeout=None):
+        """
+        Builds every converter of the pool and runs one conversion of pdf_bytes on each.
+        Warm-up conversions do not count towards max_conversions.
+        """
+        held = []
+        try:
+            for _ in range(self.size):
+                held.append(self._acquire(timeout))
+            for entry in held:
+                entry[0].convert_single(pdf_bytes)
+        finally:
+            for entry in held:
+                self._release(entry, converted=False)
+
+    def check_health(self):
+        """Runs health_check on every idle converter, discarding unhealthy ones. Returns how many were discarded."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        healthy = [entry for entry in idle if self.health_check(entry[0])]
+        with self._condition:
+            self._idle.extend(healthy)
+            discarded = len(idle) - len(healthy)
+            self._live -= discarded
+            self.replaced += discarded
+            self._condition.notify_all()
+        return discarded
+
+    def stats(self):
+        """Returns the pool occupancy and counters as a dictionary."""
+        with self._condition:
+            return {
+                'size': self.size,
+                'live': self._live,
+                'idle': len(self._idle),
+                'in_use': self._live - len(self._idle),
+                'conversions': self.conversions,
+                'recycled': self.recycled,
+                'replaced': self.replaced,
+            }
+
+    def close(self):
+        """Drops the idle converters; converters still borrowed are dropped when they are returned."""
+        with self._condition:
+            self.closed = True
+            self._live -= len(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+
+_converter_pool = None
+_converter_pool_lock = threading.Lock()
+
+def get_converter_pool(size=2, **pool_options):
+    """
+    Returns the process-wide ConverterPool, creating it with the given settings on first use.
+    Later calls return the same pool and ignore their arguments.
+    """
+    global _converter_pool
+    with _converter_pool_lock:
+        if _converter_pool is None or _converter_pool.closed:
+            _converter_pool = ConverterPool(size=size, **pool_options)
+        return _converter_pool
+
 import sys
+import inspect
+import re
 
-def process_pdf_with_docling(converter, pdf_bytes):
+_FIRST_PAGES_PATTERN = re.compile(r'^\s*first\s*:?\s*(\d+)\s*$', re.IGNORECASE)
+
+def parse_page_selection(selection):
+    """
+    Normalizes a page selection to a sorted tuple of unique 1-based page numbers.
+
+    Accepted forms:
+      - an int (one page), a range or any iterable of ints, e.g. [1, 3, 5] or range(10, 13)
+      - a string of comma-separated pages and inclusive ranges, e.g. '10-12' or '1, 3, 5-7'
+      - 'first N' for the first N pages
+
+    Pages past the end of a document are ignored when the selection is applied, like in a slice.
+    None means every page and is returned unchanged.
+
+    Raises:
+      ValueError: If the selection is empty, malformed or contains a page number smaller than 1.
+      TypeError: If selection is of an unsupported type.
+    """
+    if selection is None:
+        return None
+    if isinstance(selection, bool):
+        raise TypeError("Page selection must be an int, an iterable of ints or a string.")
+    if isinstance(selection, int):
+        numbers = [selection]
+    elif isinstance(selection, str):
+        match = _FIRST_PAGES_PATTERN.match(selection)
+        if match:
+            numbers = range(1, int(match.group(1)) + 1)
+        else:
+            numbers = []
+            for part in selection.split(','):
+                bounds = [bound.strip() for bound in part.split('-')]
+                if not 1 <= len(bounds) <= 2 or not all(bound.isdigit() for bound in bounds):
+                    raise ValueError(f"Invalid page selection {selection!r}: expected e.g. '10-12', '1, 3, 5-7' or 'first 5'.")
+                start, stop = int(bounds[0]), int(bounds[-1])
+                if stop < start:
+                    raise ValueError(f"Invalid page range '{part.strip()}' in {selection!r}: the end precedes the start.")
+                numbers.extend(range(start, stop + 1))
+    else:
+        try:
+            numbers = list(selection)
+        except TypeError:
+            raise TypeError("Page selection must be an int, an iterable of ints or a string.") from None
+        if not all(isinstance(number, int) and not isinstance(number, bool) for number in numbers):
+            raise TypeError("Page selection must only contain ints.")
+    pages = tuple(sorted(set(numbers)))
+    if not pages:
+        raise ValueError("Page selection is empty.")
+    if pages[0] < 1:
+        raise ValueError(f"Page numbers start at 1, got {pages[0]}.")
+    return pages
+
+class PageSubsetResult:
+    """
+    A Docling result restricted to some of its pages. 'pages' holds only the selected pages, in
+    order, and 'page_numbers' their original 1-based numbers in the document. Any other attribute
+    is read from the underlying result.
+    """
+
+    def __init__(self, document, pages, page_numbers):
+        self.document = document
+        self.pages = pages
+        self.page_numbers = page_numbers
+
+    def __getattr__(self, name):
+        return getattr(self.document, name)
+
+def page_numbers_of(pages):
+    """
+    Returns the original 1-based page numbers of a Docling result or of extracted pages: the
+    recorded 'page_numbers' of a page subset, or 1..N for a complete document.
+    """
+    if isinstance(pages, (PageSubsetResult, CachedDoclingResult, ExtractedPages, LazyPageSequence, MappedPageStore)):
+        return tuple(pages.page_numbers)
+    return tuple(range(1, len(pages.pages if hasattr(pages, 'pages') else pages) + 1))
+
+def select_pages(docling_result, pages, first_page_number=1):
+    """
+    Restricts a Docling result to the selected pages without rendering anything.
+
+    Arguments:
+      docling_result: A Docling result, possibly already a PageSubsetResult.
+      pages: A selection accepted by parse_page_selection, in original page numbers.
+      first_page_number (int): Original number of docling_result.pages[0] when the result
+                               covers a page range rather than the whole document. Defaults to 1.
+
+    Output:
+      PageSubsetResult: The selected pages that exist in the result, with their original numbers.
+    """
+    selection = parse_page_selection(pages)
+    all_pages = list(docling_result.pages)
+    if isinstance(docling_result, PageSubsetResult):
+        available = docling_result.page_numbers
+    else:
+        available = range(first_page_number, first_page_number + len(all_pages))
+    position = {number: index for index, number in enumerate(available)}
+    kept = [number for number in selection if number in position]
+    document = docling_result.document if isinstance(docling_result, PageSubsetResult) else docling_result
+    return PageSubsetResult(document, [all_pages[position[number]] for number in kept], kept)
+
+def _accepts_page_range(converter):
+    """Whether converter.convert_single takes a 'page_range' keyword, as Docling's page-range conversion does."""
+    try:
+        return 'page_range' in inspect.signature(converter.convert_single).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+def process_pdf_with_docling(converter, pdf_bytes, cache=None, pages=None):
     """
     Processes a PDF document using the provided Docling DocumentConverter.
 
     Arguments:
-      converter (DocumentConverter): An initialized Docling DocumentConverter object.
+      converter (DocumentConverter or ConverterPool): An initialized Docling DocumentConverter object,
+                                                      or a pool to borrow one from for this conversion.
       pdf_bytes (bytes): The raw byte content of the PDF document to be processed.
+      cache (DoclingResultCache, optional): On-disk result cache. When given, a previous result
+                                            for the same PDF bytes, converter configuration and
+                                            page selection is returned without running the layout
+                                            model, and fresh results are stored in the cache. Only
+                                            the selected pages are rendered for it.
+      pages (optional): Convert only these pages, given in any form accepted by parse_page_selection,
+                        e.g. '10-12', [1, 3, 5] or 'first 5'. Converters whose convert_single takes a
+                        'page_range' keyword (as Docling's does) only analyse the span from the first to
+                        the last selected page; with other converters the whole document is converted
+                        and the result is cut down afterwards. Defaults to None (all pages).
 
     Output:
-      docling_result: A structured Docling result object.
+      docling_result: A structured Docling result object. On a cache hit this is a
+      CachedDoclingResult exposing the same 'pages' / 'render()' / 'element_groups' interface.
+      With a page selection, a PageSubsetResult holding only the selected pages, whose
+      'page_numbers' are their original 1-based numbers.
+
+    Raises:
+      ValueError: If pages is not a valid page selection.
     """
-    try:
-        # Attempt to convert the PDF bytes using the provided converter
-        docling_result = converter.convert_single(pdf_bytes)
-        return docling_result
+    selection = parse_page_selection(pages)
+    cache_key = None
+    if cache is not None:
+        # A pool is keyed by its factory, so a hit never borrows (or builds) a converter.
+        cache_key = cache.make_key(pdf_bytes, converter, pages=selection)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _pages_converted.inc(_count_pages(cached))
+            if selection is None:
+                return cached
+            return PageSubsetResult(cached, cached.pages, list(cached.page_numbers))
+
+    if isinstance(converter, ConverterPool):
+        with converter.borrow() as borrowed_converter:
+            docling_result = _convert_selected_pages(borrowed_converter, pdf_bytes, selection)
+    else:
+        docling_result = _convert_selected_pages(converter, pdf_bytes, selection)
+    if cache is not None:
+        # Caching is best-effort: a failed write never fails the conversion itself.
+        cache.put(cache_key, docling_result)
+    return docling_result
+
+def _convert_selected_pages(converter, pdf_bytes, selection):
+    """
+    Runs converter.convert_single on pdf_bytes and cuts the result down to the page
+    selection (a sorted list of 1-based page numbers, or None for all pages).
+    """
+    page_range = None
+    if selection is not None and _accepts_page_range(converter):
+        page_range = (selection[0], selection[-1])
+    convert_options = {} if page_range is None else {'page_range': page_range}
+
+    started = time.perf_counter()
+    try:
+        # Attempt to convert the PDF bytes using the provided converter
+        with _stage('convert', pdf_bytes=len(pdf_bytes)):
+            docling_result = converter.convert_single(pdf_bytes, **convert_options)
     except Exception as e:
+        _conversion_failures.inc(error_type=_error_type(e))
         # DoclingProcessingError is a custom exception defined in the test setup.
         # It's caught here and re-raised as a standard ValueError, as per test expectations.
         # Other built-in exceptions like ValueError (empty bytes), TypeError (invalid input type),
@@ -92,128 +1362,1957 @@ def process_pdf_with_docling(converter, pdf_bytes):
         if "DoclingProcessingError" in str(type(e)):
             raise ValueError(f"Docling PDF processing failed: {e}") from e
         raise e
+    _conversion_seconds.observe(time.perf_counter() - started)
+    _pages_converted.inc(_count_pages(docling_result))
+
+    if selection is not None:
+        docling_result = select_pages(docling_result, selection, first_page_number=page_range[0] if page_range else 1)
+    return docling_result
+
+import shutil
+import types
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked eviction
+    fcntl = None
+
+def _element_class_name(element):
+    """
+    Returns the layout class name of an element. Docling elements expose it as 'class'
+    (a Python keyword, hence getattr), while some callers use 'class_name' or 'class_'.
+    """
+    for attribute in ('class', 'class_name', 'class_'):
+        value = getattr(element, attribute, None)
+        if value is not None:
+            return value
+    return None
+
+def _bbox_as_tuple(bbox):
+    """Normalizes a bbox (sequence or Docling BoundingBox) to an (x1, y1, x2, y2) float tuple."""
+    if hasattr(bbox, 'as_tuple'):
+        bbox = bbox.as_tuple()
+    return tuple(float(value) for value in bbox)
+
+def _serialize_element(element):
+    """Converts a layout element into a JSON-serializable dictionary."""
+    return {
+        'bbox': list(_bbox_as_tuple(element.bbox)),
+        'class': _element_class_name(element),
+        'text_content': getattr(element, 'text_content', ''),
+        'confidence': getattr(element, 'confidence', None),
+    }
+
+def _deserialize_element(record):
+    """
+    Rebuilds a lightweight layout element from its dictionary form. The class is exposed both as
+    'class', like Docling elements, and as 'class_name', which the viewer reads.
+    """
+    return types.SimpleNamespace(**{**record, 'bbox': tuple(record['bbox']), 'class_name': record['class']})
+
+def _callable_name(factory):
+    """Returns 'module.qualname' for a function or class, and the repr of anything else (e.g. a functools.partial)."""
+    qualname = getattr(factory, '__qualname__', None)
+    if qualname is None or '<' in qualname:
+        return repr(factory)
+    return f"{factory.__module__}.{qualname}"
+
+def _converter_fingerprint(converter):
+    """
+    Builds a stable string describing the converter type and its configuration, so that
+    results produced with different models or pipeline options never share a cache entry.
+    """
+    if isinstance(converter, ConverterPool):
+        # Every converter in a pool comes from the same factory, which describes them
+        # without building one.
+        parts = [f"ConverterPool({_callable_name(converter.converter_factory)})"]
+    else:
+        converter_type = type(converter)
+        parts = [f"{converter_type.__module__}.{converter_type.__qualname__}"]
+    for attribute in ('pipeline_options', 'format_options', 'artifacts_path'):
+        value = getattr(converter, attribute, None)
+        if value is not None:
+            parts.append(f"{attribute}={value!r}")
+    try:
+        from importlib.metadata import version
+        parts.append(f"docling={version('docling')}")
+    except Exception:
+        pass
+    return "|".join(parts)
+
+class CachedPage:
+    """
+    A page restored from a DoclingResultCache entry. Mirrors the Docling page interface used by
+    extract_page_images_and_elements: 'render()' loads the stored page image from disk and
+    'element_groups' holds the deserialized layout elements.
+    """
+
+    def __init__(self, image_path, element_groups):
+        self.image_path = image_path
+        self.element_groups = element_groups
+
+    def render(self):
+        try:
+            with PIL.Image.open(self.image_path) as image:
+                image.load()
+                return image
+        except OSError as e:
+            # The entry can be evicted by another process between lookup and render.
+            raise RuntimeError(f"Cached page image '{self.image_path}' could not be loaded: {e}") from e
+
+class CachedDoclingResult:
+    """
+    A Docling-like result object whose pages are backed by a DoclingResultCache entry.
+    'page_numbers' are the original 1-based numbers of the cached pages.
+    """
+
+    def __init__(self, key, pages, page_numbers=None):
+        self.key = key
+        self.pages = pages
+        self.page_numbers = list(page_numbers) if page_numbers is not None else list(range(1, len(pages) + 1))
+
+class DoclingResultCache:
+    """
+    A persistent, content-addressed cache of Docling conversion results.
+
+    Entries are keyed by the SHA-256 of the PDF bytes combined with the converter
+    fingerprint, and store the serialized layout elements plus one PNG per page. Entries
+    are published with an atomic directory rename, so concurrent readers never see a
+    partially written entry, and writers serialize eviction through a lock file. Once the
+    total size exceeds max_bytes, the least recently used entries are removed.
+
+    Arguments:
+      cache_dir (str): Directory holding the cache entries. Created if missing.
+      max_bytes (int): Size limit of the cache on disk. Defaults to 2 GiB.
+    """
+
+    ELEMENTS_FILE = 'elements.json'
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer.")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, pdf_bytes, converter, pages=None):
+        """
+        Returns the cache key for a PDF buffer converted with the given converter, optionally
+        restricted to a page selection (anything accepted by parse_page_selection).
+        """
+        digest = hashlib.sha256()
+        digest.update(memoryview(pdf_bytes))
+        digest.update(b'\0')
+        digest.update(_converter_fingerprint(converter).encode('utf-8'))
+        pages = parse_page_selection(pages)
+        if pages is not None:
+            digest.update(b'\0pages=' + ','.join(map(str, pages)).encode('ascii'))
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        """
+        Looks up a cache entry.
+
+        Output:
+          CachedDoclingResult or None: The cached result, or None on a miss.
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, self.ELEMENTS_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Touch the entry so eviction treats it as recently used.
+            os.utime(entry_dir)
+        except (OSError, ValueError):
+            self.misses += 1
+            _cache_requests.inc(cache='docling_result', result='miss')
+            return None
+        self.hits += 1
+        _cache_requests.inc(cache='docling_result', result='hit')
+        pages = [
+            CachedPage(os.path.join(entry_dir, page['image']),
+                       [_deserialize_element(record) for record in page['elements']])
+            for page in manifest['pages']
+        ]
+        return CachedDoclingResult(key, pages, manifest.get('page_numbers'))
+
+    def put(self, key, docling_result):
+        """
+        Stores a Docling result under key. Every page of the result is rendered once and written as
+        PNG, so a PageSubsetResult only costs its selected pages; their original numbers are kept.
+        Failures (rendering errors, full disk, ...) leave the cache unchanged.
+
+        Output:
+          bool: True if the entry was stored, False otherwise.
+        """
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return True
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(entry_dir))
+        try:
+            manifest = {'pages': [], 'page_numbers': list(page_numbers_of(docling_result))}
+            for page_number, page in enumerate(docling_result.pages):
+                image_name = f"page_{page_number:05d}.png"
+                page.render().save(os.path.join(staging_dir, image_name), format='PNG')
+                manifest['pages'].append({
+                    'image': image_name,
+                    'elements': [_serialize_element(element) for element in page.element_groups],
+                })
+            with open(os.path.join(staging_dir, self.ELEMENTS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.rename(staging_dir, entry_dir)
+        except Exception:
+            # Either this entry could not be built, or another process published it first.
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return os.path.isdir(entry_dir)
+        self._evict()
+        return True
+
+    def _entries(self):
+        """Yields (last_used, size_in_bytes, entry_dir) for every published entry."""
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                entry_dir = os.path.join(shard_dir, name)
+                if name.startswith('.tmp-'):
+                    continue
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                    yield os.stat(entry_dir).st_mtime, size, entry_dir
+                except OSError:
+                    continue
+
+    def size_bytes(self):
+        """Returns the total size of all cache entries on disk."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Removes least recently used entries until the cache fits within max_bytes."""
+        lock_path = os.path.join(self.cache_dir, '.lock')
+        with open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = sorted(self._entries())
+                total = sum(size for _, size, _ in entries)
+                for _, size, entry_dir in entries:
+                    if total <= self.max_bytes:
+                        break
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    total -= size
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        for _, _, entry_dir in list(self._entries()):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+import PIL.Image
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+def _render_page(page, page_index=None):
+    """Renders a single Docling page. Module-level so that process pools can pickle it."""
+    started = time.perf_counter()
+    with _stage('render', page_index=page_index):
+        page_image = page.render()
+    _render_seconds.observe(time.perf_counter() - started)
+    return page_image
+
+class ExtractedPages(list):
+    """
+    The (page_image, elements) list of a page subset, with the original 1-based number of each
+    entry in 'page_numbers'.
+    """
+
+    def __init__(self, items, page_numbers):
+        super().__init__(items)
+        self.page_numbers = tuple(page_numbers)
+
+def extract_page_images_and_elements(docling_result: object, lazy: bool = False, max_workers: int = None,
+                                     executor_type: str = 'thread', pages=None,
+                                     page_store_dir: str = None) -> list[tuple[PIL.Image.Image, list[object]]]:
+    """
+    This function iterates through the pages of a Docling result object to extract each page's
+    rendered image and its associated layout elements. It collects these into a list of tuples,
+    where each tuple contains a PIL Image and a list of detected element objects.
+
+    Arguments:
+      docling_result: The structured Docling result object obtained after PDF processing.
+                      Expected to have a 'pages' attribute, which is an iterable of page objects.
+                      Each page object is expected to have a 'render()' method returning a PIL Image
+                      and an 'element_groups' attribute (list of element objects).
+      lazy (bool): If True, return a LazyPageSequence that renders each page only when it is
+                   accessed instead of rendering every page up front. Defaults to False.
+      max_workers (int, optional): If greater than 1, pages are rendered concurrently by a pool of
+                                   this many workers. Output order is unchanged. Defaults to serial rendering.
+      executor_type (str): 'thread' (default) or 'process'. Process pools require picklable page objects.
+      pages (optional): Extract only these pages, in original 1-based page numbers and in any form
+                        accepted by parse_page_selection. Unselected pages are never rendered.
+                        Defaults to None (every page of docling_result).
+      page_store_dir (str, optional): Keep the rendered pages in a MappedPageStore at this directory
+                                      and return it. The pages are rendered into it only if it does
+                                      not exist yet; otherwise it is simply opened. Use one directory
+                                      per document and page selection. lazy and max_workers are ignored.
+
+    Output:
+      list[tuple[PIL.Image.Image, list[object]]]: A list where each tuple contains a PIL Image
+      of a page and a list of its detected layout elements (with attributes like bbox, class,
+      text_content, confidence). When lazy=True, a LazyPageSequence with the same item layout.
+      If pages is given or docling_result is a PageSubsetResult, the list is an ExtractedPages
+      whose 'page_numbers' (like those of the LazyPageSequence) are the original page numbers.
+      With page_store_dir, a MappedPageStore with the same item layout.
+
+    Raises:
+      AttributeError: If docling_result or its pages lack expected attributes (e.g., 'pages', 'render', 'element_groups').
+      RuntimeError: If a page's render method fails (as simulated in tests).
+      ValueError: If executor_type is not 'thread' or 'process'.
+    """
+    if executor_type not in ('thread', 'process'):
+        raise ValueError(f"Unsupported executor_type: '{executor_type}'. Must be 'thread' or 'process'.")
+
+    if pages is not None:
+        docling_result = select_pages(docling_result, pages)
+    page_numbers = docling_result.page_numbers if isinstance(docling_result, PageSubsetResult) else None
+
+    if page_store_dir is not None:
+        return MappedPageStore.open_or_create(page_store_dir, docling_result)
+
+    if lazy:
+        # Rendering is deferred to LazyPageSequence.__getitem__, so render errors
+        # surface when the failing page is first accessed rather than here.
+        return LazyPageSequence(docling_result)
+
+    if max_workers is not None and max_workers > 1:
+        page_objects = list(docling_result.pages)
+        executor_class = ThreadPoolExecutor if executor_type == 'thread' else ProcessPoolExecutor
+        with executor_class(max_workers=max_workers) as executor:
+            # map() yields in submission order and re-raises the first failing page's
+            # exception (e.g. RuntimeError from render()) when its result is reached.
+            page_images = list(executor.map(_render_page, page_objects, range(len(page_objects))))
+        extracted_data = [(page_image, page.element_groups) for page_image, page in zip(page_images, page_objects)]
+        return extracted_data if page_numbers is None else ExtractedPages(extracted_data, page_numbers)
+
+    extracted_data = []
+
+    # docling_result is expected to have a 'pages' attribute, which is an iterable
+    for page_index, page in enumerate(docling_result.pages):
+        # Each page object is expected to have a 'render' method
+        page_image = _render_page(page, page_index)
+        
+        # Each page object is expected to have an 'element_groups' attribute
+        page_elements = page.element_groups
+        
+        extracted_data.append((page_image, page_elements))
+
+    return extracted_data if page_numbers is None else ExtractedPages(extracted_data, page_numbers)
+
+from collections import OrderedDict
+from collections.abc import Sequence
+
+def _page_image_nbytes(page_image):
+    """Estimates the memory held by a rendered page image from its size and band count."""
+    try:
+        nbytes = page_image.width * page_image.height * len(page_image.getbands())
+    except (AttributeError, TypeError):
+        return 0
+    return nbytes if isinstance(nbytes, int) else 0
+
+class LazyPageSequence(Sequence):
+    """
+    A read-only, random-access sequence of (page_image, elements) tuples that renders each
+    page of a Docling result only when it is requested. Rendered images are kept in an LRU
+    cache so that flipping back and forth between neighbouring pages stays cheap, while memory
+    use is bounded by max_cached_pages and max_cached_bytes instead of the document length.
+    Evicted pages are simply rendered again the next time they are requested.
+
+    Arguments:
+      docling_result: The structured Docling result object obtained after PDF processing.
+                      Expected to have a 'pages' attribute, which is an iterable of page objects.
+      max_cached_pages (int or None): Maximum number of rendered page images kept alive.
+                                      None keeps every page that has been rendered. Defaults to 8.
+      max_cached_bytes (int or None): Memory budget for rendered page images, estimated as
+                                      width * height * bands. The most recently requested page is
+                                      always kept, even if it alone exceeds the budget. Defaults to None.
+
+    Raises:
+      AttributeError: If docling_result lacks a 'pages' attribute.
+      ValueError: If max_cached_pages is smaller than 1 or max_cached_bytes is negative.
+    """
+
+    def __init__(self, docling_result, max_cached_pages=8, max_cached_bytes=None):
+        if max_cached_pages is not None and max_cached_pages < 1:
+            raise ValueError("max_cached_pages must be a positive integer or None.")
+        if max_cached_bytes is not None and max_cached_bytes < 0:
+            raise ValueError("max_cached_bytes must be a non-negative integer or None.")
+        # Materialize only the page handles; this is cheap compared to rendering.
+        self._pages = list(docling_result.pages)
+        # Original 1-based page numbers, for page labels when docling_result is a page subset.
+        if isinstance(docling_result, PageSubsetResult):
+            self.page_numbers = tuple(docling_result.page_numbers)
+        else:
+            self.page_numbers = tuple(range(1, len(self._pages) + 1))
+        self._max_cached_pages = max_cached_pages
+        self.max_cached_bytes = max_cached_bytes
+        self._rendered = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Prefetching renders on a single background thread; the lock guards the cache state.
+        self._lock = threading.Lock()
+        self._prefetch_executor = None
+        self._prefetching = {}
+
+    def __len__(self):
+        return len(self._pages)
+
+    def _normalize_index(self, index):
+        if index < 0:
+            index += len(self._pages)
+        if not 0 <= index < len(self._pages):
+            raise IndexError("page index out of range")
+        return index
+
+    def _store(self, index, page_image):
+        """Adds a rendered image to the cache and evicts least-recently-used pages over budget."""
+        with self._lock:
+            if index not in self._rendered:
+                self._rendered[index] = page_image
+                self.nbytes += _page_image_nbytes(page_image)
+            self._rendered.move_to_end(index)
+            while len(self._rendered) > 1 and (
+                    (self._max_cached_pages is not None and len(self._rendered) > self._max_cached_pages)
+                    or (self.max_cached_bytes is not None and self.nbytes > self.max_cached_bytes)):
+                _, evicted = self._rendered.popitem(last=False)
+                self.nbytes -= _page_image_nbytes(evicted)
+                self.evictions += 1
+            return self._rendered.get(index, page_image)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._normalize_index(index)
+
+        page = self._pages[index]
+        with self._lock:
+            page_image = self._rendered.get(index)
+            if page_image is not None:
+                self._rendered.move_to_end(index)
+                self.hits += 1
+                _cache_requests.inc(cache='page_image', result='hit')
+                return page_image, page.element_groups
+            self.misses += 1
+            _cache_requests.inc(cache='page_image', result='miss')
+            pending = self._prefetching.get(index)
+
+        if pending is not None:
+            # Reuse a prefetch of this page that is already under way.
+            page_image = pending.result()
+        else:
+            # A RuntimeError from render() propagates just like in the eager path.
+            page_image = _render_page(page, index)
+        return self._store(index, page_image), page.element_groups
+
+    def _prefetch_one(self, index):
+        try:
+            page_image = _render_page(self._pages[index], index)
+            self._store(index, page_image)
+        finally:
+            with self._lock:
+                self._prefetching.pop(index, None)
+        return page_image
+
+    def prefetch(self, indices):
+        """
+        Renders the given pages on a background thread so that a later request finds them cached.
+        Indices that are out of range, already rendered or already being prefetched are ignored;
+        render errors are left for the page's next regular access to report.
+
+        Returns:
+          list: The futures of the prefetches that were started.
+        """
+        started = []
+        with self._lock:
+            for index in indices:
+                if not 0 <= index < len(self._pages):
+                    continue
+                if index in self._rendered or index in self._prefetching:
+                    continue
+                if self._prefetch_executor is None:
+                    self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-prefetch')
+                future = self._prefetch_executor.submit(self._prefetch_one, index)
+                self._prefetching[index] = future
+                started.append(future)
+        return started
+
+    def cache_info(self):
+        """Returns the cache occupancy and counters as a dictionary."""
+        with self._lock:
+            return {
+                'pages': len(self._rendered),
+                'nbytes': self.nbytes,
+                'max_pages': self._max_cached_pages,
+                'max_bytes': self.max_cached_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def is_rendered(self, index):
+        """Returns True if the image for the page at index is currently held in memory."""
+        return index in self._rendered
+
+    def release(self, index=None):
+        """Drops the rendered image for one page, or for every page if index is None."""
+        with self._lock:
+            if index is None:
+                self._rendered.clear()
+                self.nbytes = 0
+            elif index in self._rendered:
+                self.nbytes -= _page_image_nbytes(self._rendered.pop(index))
+
+import math
+import numpy as np
+
+class LayoutElementView:
+    """
+    A lightweight, read-only view of one element in a LayoutElementStore. It exposes the same
+    attributes as a Docling layout element ('bbox', 'class', 'text_content', 'confidence'),
+    reading them from the store's arrays on access instead of holding its own copies.
+    """
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def bbox(self):
+        return tuple(self._store.bboxes[self._index].tolist())
+
+    @property
+    def class_name(self):
+        return self._store.class_names[self._store.class_codes[self._index]]
+
+    @property
+    def text_content(self):
+        return self._store.text(self._index)
+
+    @property
+    def confidence(self):
+        value = float(self._store.confidences[self._index])
+        return None if math.isnan(value) else value
+
+    def __repr__(self):
+        return f"LayoutElementView(class_name={self.class_name!r}, bbox={self.bbox})"
+
+# 'class' is a Python keyword, so it can only be attached with setattr; 'class_' is the
+# spelling used elsewhere in this module (see print_sample_element_metadata).
+setattr(LayoutElementView, 'class', LayoutElementView.class_name)
+LayoutElementView.class_ = LayoutElementView.class_name
+
+class LayoutElementStore:
+    """
+    A compact, columnar container for the layout elements of a whole document.
+
+    Instead of one Python object per element, the store keeps:
+      - bboxes: float32 array of shape (N, 4) with (x_min, y_min, x_max, y_max)
+      - class_codes: int16 array of shape (N,) indexing into class_names
+      - confidences: float32 array of shape (N,), NaN where no confidence is available
+      - page_offsets: int64 array of shape (P + 1,); page p owns elements [page_offsets[p], page_offsets[p + 1])
+      - text: one UTF-8 buffer plus an int64 offset array of shape (N + 1,)
+
+    This allows vectorized filtering across all elements, and LayoutElementView objects give
+    cheap per-element access to code that still expects element objects.
+    """
+
+    def __init__(self, bboxes, class_codes, class_names, confidences, text_buffer, text_offsets, page_offsets):
+        self.bboxes = bboxes
+        self.class_codes = class_codes
+        self.class_names = class_names
+        self.confidences = confidences
+        self.page_offsets = page_offsets
+        self._text_buffer = text_buffer
+        self._text_offsets = text_offsets
+        self._class_lookup = {name: code for code, name in enumerate(class_names)}
+
+    @classmethod
+    def from_pages(cls, pages_elements):
+        """
+        Builds a store in a single pass from an iterable of per-page element lists.
+
+        Raises:
+          AttributeError: If an element lacks a 'bbox' attribute.
+        """
+        bboxes, class_codes, confidences, text_offsets, page_offsets = [], [], [], [0], [0]
+        class_lookup, class_names = {}, []
+        text_buffer = bytearray()
+        for elements in pages_elements:
+            for element in elements:
+                bboxes.append(_bbox_as_tuple(element.bbox))
+                class_name = _element_class_name(element)
+                code = class_lookup.get(class_name)
+                if code is None:
+                    code = class_lookup[class_name] = len(class_names)
+                    class_names.append(class_name)
+                class_codes.append(code)
+                confidence = getattr(element, 'confidence', None)
+                confidences.append(float('nan') if confidence is None else confidence)
+                text_buffer += (getattr(element, 'text_content', '') or '').encode('utf-8')
+                text_offsets.append(len(text_buffer))
+            page_offsets.append(len(bboxes))
+        return cls(
+            np.asarray(bboxes, dtype=np.float32).reshape(-1, 4),
+            np.asarray(class_codes, dtype=np.int16),
+            class_names,
+            np.asarray(confidences, dtype=np.float32),
+            bytes(text_buffer),
+            np.asarray(text_offsets, dtype=np.int64),
+            np.asarray(page_offsets, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_docling_result(cls, docling_result):
+        """Builds a store from every page's 'element_groups' without rendering any page."""
+        return cls.from_pages(page.element_groups for page in docling_result.pages)
+
+    def __len__(self):
+        return len(self.class_codes)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("element index out of range")
+        return LayoutElementView(self, index)
+
+    @property
+    def num_pages(self):
+        return len(self.page_offsets) - 1
+
+    @property
+    def nbytes(self):
+        """Total memory held by the store's arrays and text buffer, in bytes."""
+        arrays = (self.bboxes, self.class_codes, self.confidences, self.page_offsets, self._text_offsets)
+        return sum(array.nbytes for array in arrays) + len(self._text_buffer)
+
+    def text(self, index):
+        """Decodes the text content of the element at index."""
+        start, stop = self._text_offsets[index], self._text_offsets[index + 1]
+        return self._text_buffer[start:stop].decode('utf-8')
+
+    def page_range(self, page_number):
+        """Returns the (start, stop) element index range of a page."""
+        return int(self.page_offsets[page_number]), int(self.page_offsets[page_number + 1])
+
+    def page_elements(self, page_number):
+        """Returns the elements of one page as a list of LayoutElementView objects."""
+        start, stop = self.page_range(page_number)
+        return [LayoutElementView(self, index) for index in range(start, stop)]
+
+    def class_mask(self, class_names):
+        """Returns a boolean mask selecting elements whose class is in class_names."""
+        codes = [self._class_lookup[name] for name in class_names if name in self._class_lookup]
+        return np.isin(self.class_codes, np.asarray(codes, dtype=np.int16))
+
+    def select(self, class_names=None, page_number=None, min_confidence=None, max_confidence=None):
+        """
+        Vectorized query over all elements.
+
+        Arguments:
+          class_names (iterable[str], optional): Keep only these classes.
+          page_number (int, optional): Keep only elements of this page.
+          min_confidence / max_confidence (float, optional): Inclusive confidence bounds.
+                                                             Elements without a confidence never match a bound.
+
+        Output:
+          numpy.ndarray: Sorted int64 indices of the matching elements.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if class_names is not None:
+            mask &= self.class_mask(class_names)
+        if page_number is not None:
+            start, stop = self.page_range(page_number)
+            page_mask = np.zeros(len(self), dtype=bool)
+            page_mask[start:stop] = True
+            mask &= page_mask
+        if min_confidence is not None:
+            mask &= self.confidences >= min_confidence
+        if max_confidence is not None:
+            mask &= self.confidences <= max_confidence
+        return np.flatnonzero(mask)
+
+PAGE_STORE_PIXELS_FILE = 'pixels.bin'
+PAGE_STORE_INDEX_FILE = 'index.json'
+PAGE_STORE_ALIGNMENT = 64
+
+def _mappable_page_image(page_image):
+    """Converts modes without a plain per-pixel array layout ('1', 'P') to one that has one."""
+    if page_image.mode == 'P':
+        return page_image.convert('RGBA' if 'transparency' in page_image.info else 'RGB')
+    if page_image.mode == '1':
+        return page_image.convert('L')
+    return page_image
+
+class MappedPageStore(Sequence):
+    """
+    Rendered page images kept in one raw-pixel file that is memory-mapped read-only, plus a
+    small JSON index with each page's offset, shape, dtype and mode (and its layout elements).
+
+    Pages are rendered and written once by create(); afterwards open() maps the file, so
+    reopening a document never renders again and every process opening the same store shares
+    the same physical pages through the OS page cache, which also decides what stays resident.
+
+    array(i) returns a zero-copy NumPy view of a page. image(i) and item access return PIL
+    images built on that view: zero-copy for 'L', 'RGBA' and other modes PIL stores natively,
+    a copy for 'RGB' (PIL keeps RGB pixels padded to four bytes). The views are read-only.
+    The most recently used images are kept, so that repeated access returns the same object
+    and the viewer's per-image overlay and pyramid caches keep hitting.
+
+    Arguments:
+      store_dir (str): Directory holding the pixel file and the index, as written by create().
+      max_cached_images (int): PIL images kept for repeated access. Defaults to 4.
+
+    Raises:
+      FileNotFoundError: If store_dir holds no complete store.
+    """
+
+    def __init__(self, store_dir, max_cached_images=4):
+        self.store_dir = store_dir
+        self.max_cached_images = max_cached_images
+        with open(os.path.join(store_dir, PAGE_STORE_INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self._entries = index['pages']
+        self.page_numbers = tuple(index['page_numbers'])
+        self.nbytes = index['nbytes']
+        if self.nbytes:
+            self._pixels = np.memmap(os.path.join(store_dir, PAGE_STORE_PIXELS_FILE), dtype=np.uint8, mode='r',
+                                     shape=(self.nbytes,))
+        else:
+            self._pixels = np.zeros(0, dtype=np.uint8)
+        self._elements = [None] * len(self._entries)
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, store_dir, docling_result, overwrite=False):
+        """
+        Renders every page of docling_result once, streams the pixels into a new store at
+        store_dir and opens it. Only one page image is held in memory at a time.
+
+        The store is written to a temporary directory and moved into place when complete, so
+        readers never see a partial store. If another process completes the same store first,
+        that one is opened and this render is discarded.
+
+        Arguments:
+          store_dir (str): Directory to create.
+          docling_result: A Docling result (or PageSubsetResult) whose pages to render.
+          overwrite (bool): Replace an existing store at store_dir. Defaults to False.
+
+        Raises:
+          FileExistsError: If store_dir already exists and overwrite is False.
+        """
+        if os.path.exists(store_dir) and not overwrite:
+            raise FileExistsError(f"Page store '{store_dir}' already exists.")
+        parent = os.path.dirname(os.path.abspath(store_dir))
+        os.makedirs(parent, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix='.page-store-', dir=parent)
+        try:
+            entries = []
+            offset = 0
+            with open(os.path.join(staging_dir, PAGE_STORE_PIXELS_FILE), 'wb') as f:
+                for page_index, page in enumerate(docling_result.pages):
+                    page_image = _mappable_page_image(_render_page(page, page_index))
+                    pixels = np.asarray(page_image)
+                    padding = -offset % PAGE_STORE_ALIGNMENT
+                    f.write(b'\0' * padding)
+                    offset += padding
+                    f.write(pixels.tobytes())
+                    entries.append({
+                        'offset': offset,
+                        'shape': list(pixels.shape),
+                        'dtype': pixels.dtype.str,
+                        'mode': page_image.mode,
+                        'elements': [_serialize_element(element) for element in page.element_groups],
+                    })
+                    offset += pixels.nbytes
+            index = {'pages': entries, 'page_numbers': list(page_numbers_of(docling_result)), 'nbytes': offset}
+            with open(os.path.join(staging_dir, PAGE_STORE_INDEX_FILE), 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            if overwrite and os.path.exists(store_dir):
+                shutil.rmtree(store_dir, ignore_errors=True)
+            try:
+                os.rename(staging_dir, store_dir)
+            except OSError:
+                if not os.path.exists(os.path.join(store_dir, PAGE_STORE_INDEX_FILE)):
+                    raise
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return cls(store_dir)
+
+    @classmethod
+    def open_or_create(cls, store_dir, docling_result):
+        """Opens the store at store_dir, rendering docling_result into it first if it does not exist yet."""
+        if os.path.exists(os.path.join(store_dir, PAGE_STORE_INDEX_FILE)):
+            return cls(store_dir)
+        return cls.create(store_dir, docling_result)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def array(self, index):
+        """Returns a read-only, zero-copy NumPy view of one page's pixels."""
+        entry = self._entries[index]
+        dtype = np.dtype(entry['dtype'])
+        count = math.prod(entry['shape'])
+        start = entry['offset']
+        return self._pixels[start:start + count * dtype.itemsize].view(dtype).reshape(entry['shape'])
+
+    def image(self, index):
+        """Returns one page as a PIL image backed by the mapped file where PIL allows it."""
+        with self._lock:
+            page_image = self._images.get(index)
+            if page_image is not None:
+                self._images.move_to_end(index)
+                return page_image
+        entry = self._entries[index]
+        height, width = entry['shape'][:2]
+        mode = entry['mode']
+        page_image = PIL.Image.frombuffer(mode, (width, height), self.array(index), 'raw', mode, 0, 1)
+        with self._lock:
+            self._images[index] = page_image
+            while len(self._images) > self.max_cached_images:
+                self._images.popitem(last=False)
+        return page_image
+
+    def elements(self, index):
+        """Returns the layout elements stored with one page."""
+        elements = self._elements[index]
+        if elements is None:
+            elements = self._elements[index] = [_deserialize_element(record) for record in self._entries[index]['elements']]
+        return elements
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return self.image(index), self.elements(index)
+
+    def close(self):
+        """Drops this store's mapping; views handed out earlier keep the file mapped until released."""
+        with self._lock:
+            self._images.clear()
+        self._pixels = np.zeros(0, dtype=np.uint8)
+        self._entries = []
+
+from collections import namedtuple, deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+BatchConversionResult = namedtuple(
+    'BatchConversionResult', ['index', 'source', 'pages', 'error_type', 'error']
+)
+BatchConversionResult.__doc__ = """
+Outcome of one document in convert_documents_batch.
+
+Fields:
+  index (int): Position of the source in the input iterable.
+  source: The original source (path, bytes or URL).
+  pages (list[tuple[PIL.Image.Image or None, list[object]]] or None): One (image, elements) tuple
+      per page, or None if the document failed. Images are None unless render_pages=True.
+  error_type (str or None): Name of the exception class if the document failed.
+  error (str or None): Error message if the document failed.
+"""
+
+# Converter owned by the current batch worker process, built once by _init_batch_worker, or the
+# exception that building it raised.
+_batch_worker_converter = None
+_batch_worker_init_error = None
+
+def _init_batch_worker(converter_factory):
+    """
+    Process pool initializer: builds the worker's Docling converter exactly once. A failure is kept
+    and reported for every document instead of raised, since an initializer exception would only
+    show up as a BrokenProcessPool and be retried as if the worker had crashed.
+    """
+    global _batch_worker_converter, _batch_worker_init_error
+    try:
+        _batch_worker_converter = converter_factory()
+    except Exception as e:
+        _batch_worker_init_error = e
+
+def _is_url_source(source):
+    return isinstance(source, str) and source.lower().startswith(('http://', 'https://'))
+
+def _load_batch_source(source, precheck=False, **load_options):
+    """
+    Resolves a batch source to validated PDF bytes using load_pdf_document.
+    Bytes are treated as uploads, 'http(s)://' strings as URLs and anything else as a file path.
+    precheck is passed on to load_pdf_document, load_options only for URLs.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return load_pdf_document('upload', bytes(source), precheck=precheck)
+    if _is_url_source(source):
+        return load_pdf_document('url', source, precheck=precheck, **load_options)
+    with open(os.fspath(source), 'rb') as f:
+        return load_pdf_document('upload', f.read(), precheck=precheck)
+
+def _precheck_batch_source(source):
+    """
+    precheck_pdf for a local batch source (bytes or a file path), or None for URLs, which can only
+    be checked once downloaded. Unreadable files are left for the worker to report.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return precheck_pdf(source)
+    if _is_url_source(source):
+        return None
+    try:
+        return precheck_pdf_file(source)
+    except (OSError, TypeError):
+        return None
+
+def _convert_batch_item(index, source, render_pages, cache, precheck=False):
+    """Converts one batch source inside a worker. Exceptions are returned, never raised."""
+    if _batch_worker_init_error is not None:
+        error = _batch_worker_init_error
+        return BatchConversionResult(index, source, None, type(error).__name__,
+                                     f"Could not build the converter: {error}")
+    try:
+        pdf_bytes = _load_batch_source(source, precheck=precheck)
+        docling_result = process_pdf_with_docling(_batch_worker_converter, pdf_bytes, cache=cache)
+        pages = []
+        for page_index, page in enumerate(docling_result.pages):
+            page_image = _render_page(page, page_index) if render_pages else None
+            # Elements are shipped back in their serialized form, since Docling objects
+            # are not guaranteed to survive pickling between processes.
+            elements = [_deserialize_element(_serialize_element(element)) for element in page.element_groups]
+            pages.append((page_image, elements))
+        return BatchConversionResult(index, source, pages, None, None)
+    except Exception as e:
+        return BatchConversionResult(index, source, None, type(e).__name__, str(e))
+
+def convert_documents_batch(sources, max_workers=None, converter_factory=initialize_docling_converter,
+                            render_pages=False, cache=None, max_attempts=2, precheck=False):
+    """
+    Converts many PDF documents in parallel over a pool of worker processes and yields the
+    results as soon as each document finishes (not in input order).
+
+    Each worker builds its Docling converter once via converter_factory and reuses it for every
+    document it handles. Failures are isolated per document: an exception while loading or
+    converting one source is reported in its BatchConversionResult and the batch continues.
+    If a worker process dies (e.g. a native crash inside the layout model), the pool is rebuilt
+    and the documents that were in flight are run again one at a time, so that only the document
+    that crashed its worker is charged an attempt; it is retried up to max_attempts times.
+
+    Arguments:
+      sources (iterable): PDF sources. Each may be bytes (an upload), an 'http(s)://' URL string,
+                          or a filesystem path.
+      max_workers (int, optional): Number of worker processes. Defaults to os.cpu_count().
+      converter_factory (callable): Picklable zero-argument callable returning a converter.
+                                    Defaults to initialize_docling_converter.
+      render_pages (bool): If True, each page is rendered and its PIL image returned. Defaults to False.
+      cache (DoclingResultCache, optional): Result cache shared by all workers.
+      max_attempts (int): Attempts per document whose conversion crashes its worker process.
+                          Defaults to 2.
+      precheck (bool): Run precheck_pdf on every source first. Bytes and files are checked in the
+                       calling process by reading only their head and tail, and those that fail are
+                       reported as a 'PdfStructureError' result without being sent to a worker;
+                       URLs are checked by the worker after the download. Defaults to False.
+
+    Output:
+      Iterator[BatchConversionResult]: One result per source, in completion order.
+
+    Raises:
+      ValueError: If max_workers or max_attempts is smaller than 1.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers < 1:
+        raise ValueError("max_workers must be a positive integer.")
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be a positive integer.")
+
+    pending = deque((index, source, 0) for index, source in enumerate(sources))
+    # Documents that were in flight when a worker crashed. They run one at a time, before any
+    # pending document, so that a crash can be pinned on the document that caused it.
+    suspects = deque()
+    # Bound the number of submitted documents so that byte sources are not all pickled at once.
+    max_in_flight = max_workers * 2
+
+    while pending or suspects:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker,
+                                       initargs=(converter_factory,))
+        in_flight = {}
+        pool_broken = False
+        try:
+            while pending or suspects or in_flight:
+                while not pool_broken:
+                    if suspects:
+                        if in_flight:
+                            break
+                        index, source, attempts = suspects.popleft()
+                        future = executor.submit(_convert_batch_item, index, source, render_pages, cache, precheck)
+                        in_flight[future] = (index, source, attempts, True)
+                        continue
+                    if not pending or len(in_flight) >= max_in_flight:
+                        break
+                    index, source, attempts = pending.popleft()
+                    verdict = _precheck_batch_source(source) if precheck else None
+                    if verdict is not None and not verdict.ok:
+                        label = "Uploaded content" if isinstance(source, (bytes, bytearray, memoryview)) \
+                            else f"'{os.fspath(source)}'"
+                        error = _precheck_error(verdict, label)
+                        yield BatchConversionResult(index, source, None, type(error).__name__, str(error))
+                        continue
+                    future = executor.submit(_convert_batch_item, index, source, render_pages, cache, precheck)
+                    in_flight[future] = (index, source, attempts, False)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, source, attempts, isolated = in_flight.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool as e:
+                        pool_broken = True
+                        if not isolated:
+                            # Any of the documents in flight may have crashed the worker.
+                            suspects.append((index, source, attempts))
+                        elif attempts + 1 >= max_attempts:
+                            yield BatchConversionResult(index, source, None, type(e).__name__, str(e))
+                        else:
+                            suspects.append((index, source, attempts + 1))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+import asyncio
+import functools
+
+async def _run_blocking(executor, function, *args, **kwargs):
+    """Runs a blocking call on executor (None for the event loop's default) without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args, **kwargs))
+
+async def load_pdf_document_async(source_type, source_value, executor=None, **load_options):
+    """
+    Async counterpart of load_pdf_document, with the same arguments, validation and errors.
+    The download itself uses requests on an executor thread, so the event loop keeps running
+    while it is in progress.
+    """
+    return await _run_blocking(executor, load_pdf_document, source_type, source_value, **load_options)
+
+async def process_pdf_with_docling_async(converter, pdf_bytes, cache=None, executor=None):
+    """
+    Async counterpart of process_pdf_with_docling. The conversion runs on executor; pass a
+    ConverterPool as converter when several conversions may run at the same time.
+    """
+    return await _run_blocking(executor, process_pdf_with_docling, converter, pdf_bytes, cache=cache)
+
+async def extract_page_images_and_elements_async(docling_result, executor=None, **extract_options):
+    """Async counterpart of extract_page_images_and_elements; page rendering runs on executor."""
+    return await _run_blocking(executor, extract_page_images_and_elements, docling_result, **extract_options)
+
+class AsyncDocumentPipeline:
+    """
+    Runs load -> convert -> extract for many documents from one asyncio event loop.
+
+    Every blocking step runs on an executor, and at most max_concurrency documents are processed
+    at the same time; further documents wait for a free slot. Each document can be given a
+    timeout and can be cancelled on its own through the task returned by submit(). Note that a
+    step already running on an executor thread cannot be interrupted: on timeout or cancellation
+    the document's coroutine stops waiting and the thread's result is discarded when it finishes.
+
+    A plain converter is used by one document at a time, including by a conversion that timed
+    out or was cancelled but is still running on its thread; pass a ConverterPool to convert
+    several documents concurrently.
+
+    Arguments:
+      converter (DocumentConverter or ConverterPool): Converter used for every document.
+      max_concurrency (int): Maximum number of documents in flight. Defaults to 4.
+      timeout (float or None): Default per-document timeout in seconds, not counting the wait
+                               for a free slot. None means no timeout. Defaults to None.
+      executor (concurrent.futures.Executor, optional): Executor for the blocking steps.
+                                                        Defaults to the event loop's default executor.
+      cache (DoclingResultCache, optional): Result cache passed to process_pdf_with_docling.
+      load_options (dict, optional): Extra keyword arguments for load_pdf_document on URL sources,
+                                     e.g. {'stream': True} or {'http_cache': cache}.
+      extract_options (dict, optional): Extra keyword arguments for extract_page_images_and_elements,
+                                        e.g. {'lazy': True}.
+
+    Raises:
+      ValueError: If max_concurrency is smaller than 1.
+    """
+
+    _DEFAULT_TIMEOUT = object()
+
+    def __init__(self, converter, max_concurrency=4, timeout=None, executor=None, cache=None,
+                 load_options=None, extract_options=None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer.")
+        self.converter = converter
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = executor
+        self.cache = cache
+        self.load_options = dict(load_options or {})
+        self.extract_options = dict(extract_options or {})
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # A single converter is not shared between concurrent conversions. The lock is taken on the
+        # executor thread, so it is held until convert_single returns even when the awaiting
+        # coroutine has timed out or been cancelled.
+        self._converter_lock = None if isinstance(converter, ConverterPool) else threading.Lock()
+        self.in_flight = 0
+
+    def _convert_locked(self, pdf_bytes):
+        with self._converter_lock:
+            return process_pdf_with_docling(self.converter, pdf_bytes, cache=self.cache)
+
+    async def _convert(self, pdf_bytes):
+        if self._converter_lock is None:
+            return await process_pdf_with_docling_async(self.converter, pdf_bytes, self.cache, self.executor)
+        return await _run_blocking(self.executor, self._convert_locked, pdf_bytes)
+
+    async def _process(self, source):
+        # Paths are read and URLs downloaded on the executor, like uploads are validated there.
+        pdf_bytes = await _run_blocking(self.executor, _load_batch_source, source, **self.load_options)
+        docling_result = await self._convert(pdf_bytes)
+        return await extract_page_images_and_elements_async(docling_result, self.executor, **self.extract_options)
+
+    async def process(self, source, timeout=_DEFAULT_TIMEOUT):
+        """
+        Loads, converts and extracts one document once a slot is free.
+
+        Arguments:
+          source: PDF bytes (an upload), an 'http(s)://' URL string, or a filesystem path.
+          timeout (float or None): Overrides the pipeline's per-document timeout.
+        Output:
+          list or LazyPageSequence: The (page_image, elements) tuples of the document.
+
+        Raises:
+          asyncio.TimeoutError: If the document took longer than timeout.
+          Exception: Whatever load_pdf_document or process_pdf_with_docling raised.
+        """
+        if timeout is self._DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(self._process(source), timeout)
+            finally:
+                self.in_flight -= 1
+
+    def submit(self, source, timeout=_DEFAULT_TIMEOUT):
+        """Schedules process(source) as a task, which can be awaited or cancelled on its own."""
+        return asyncio.ensure_future(self.process(source, timeout=timeout))
+
+    async def process_many(self, sources, timeout=_DEFAULT_TIMEOUT):
+        """
+        Processes many documents concurrently and yields a BatchConversionResult for each as soon
+        as it finishes (not in input order). Failures, timeouts included, are reported per document.
+        If the consumer stops iterating early, the documents still in flight are cancelled.
+        """
+        tasks = {self.submit(source, timeout=timeout): (index, source) for index, source in enumerate(sources)}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, source = tasks[task]
+                    if task.cancelled():
+                        yield BatchConversionResult(index, source, None, 'CancelledError', 'Document was cancelled.')
+                    elif task.exception() is not None:
+                        error = task.exception()
+                        yield BatchConversionResult(index, source, None, type(error).__name__, str(error))
+                    else:
+                        yield BatchConversionResult(index, source, task.result(), None, None)
+        finally:
+            for task in pending:
+                task.cancel()
+
+import queue
+
+# End-of-stream marker passed down the StreamingPipeline queues.
+_END_OF_STREAM = object()
+
+def _document_page_count(docling_result):
+    """The total page count Docling reports for a converted document (ConversionResult.input.page_count), or None."""
+    if isinstance(docling_result, PageSubsetResult):
+        docling_result = docling_result.document
+    page_count = getattr(getattr(docling_result, 'input', None), 'page_count', None)
+    return page_count if isinstance(page_count, int) and page_count > 0 else None
+
+class StreamingPipeline:
+    """
+    A bounded-memory page pipeline for very large PDFs: pages flow through
+    convert -> render -> draw -> sink stages, each running on its own thread and connected by
+    bounded queues. A stage that gets ahead blocks on its full output queue (backpressure), so at
+    most queue_size pages wait between two stages and peak memory does not depend on the page count.
+
+    The convert stage converts pages_per_chunk pages at a time when the converter's convert_single
+    accepts a 'page_range' keyword (see process_pdf_with_docling); other converters convert the
+    whole document in one call, which then bounds only the rendered and drawn images.
+
+    Arguments:
+      converter (DocumentConverter or ConverterPool): Converter, or a pool to borrow one from per run.
+      sink (callable): Called as sink(page_number, image, elements) for every page, in page order,
+                       on the sink thread. page_number is the original 1-based number.
+      class_colors (dict[str, str], optional): Classes to outline and their colors. If None, pages
+                                               reach the sink undrawn. Defaults to None.
+      visible_classes (iterable[str], optional): Classes to draw. Defaults to every class in class_colors.
+      queue_size (int): Capacity of each queue between stages. Defaults to 4.
+      pages_per_chunk (int): Pages converted per convert_single call when page ranges are supported.
+                             Defaults to 8.
+
+    Raises:
+      ValueError: If queue_size or pages_per_chunk is smaller than 1.
+    """
+
+    STAGES = ('convert', 'render', 'draw', 'sink')
+
+    def __init__(self, converter, sink, class_colors=None, visible_classes=None, queue_size=4, pages_per_chunk=8):
+        if queue_size < 1:
+            raise ValueError("queue_size must be a positive integer.")
+        if pages_per_chunk < 1:
+            raise ValueError("pages_per_chunk must be a positive integer.")
+        self.converter = converter
+        self.sink = sink
+        self.class_colors = class_colors
+        self.visible_classes = list(class_colors or ()) if visible_classes is None else list(visible_classes)
+        self.queue_size = queue_size
+        self.pages_per_chunk = pages_per_chunk
+        # Queues feeding the render, draw and sink stages; recreated by every run().
+        self._queues = {name: queue.Queue(maxsize=queue_size) for name in self.STAGES[1:]}
+        self._stop = threading.Event()
+        self.stats = {}
+
+    def queue_depths(self):
+        """Returns the current number of pages waiting in front of each stage, e.g. {'render': 4, ...}."""
+        return {name: q.qsize() for name, q in self._queues.items()}
+
+    def _put(self, name, item):
+        """Puts item on a stage's input queue, blocking while it is full, unless the run is stopping."""
+        target = self._queues[name]
+        stats = self.stats[name]
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            stats['max_depth'] = max(stats['max_depth'], target.qsize())
+            break
+        stats['blocked_s'] += time.perf_counter() - started
+
+    def _get(self, name):
+        source = self._queues[name]
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def _convert_chunks(self, converter, pdf_bytes):
+        """
+        Yields (page_number, page) pairs, converting a chunk of pages at a time when possible.
+        Chunks never extend past the page count Docling reports with each chunk, which is
+        authoritative. Without it, the page count precheck_pdf reads from the file is only a hint:
+        chunks are cut at it, but conversion goes on until a chunk comes back empty or short, and
+        a chunk past the hinted end that the converter rejects as out of range ends the document.
+        """
+        if not _accepts_page_range(converter):
+            yield from enumerate(process_pdf_with_docling(converter, pdf_bytes).pages, start=1)
+            return
+        page_count = None
+        hinted_page_count = precheck_pdf(pdf_bytes).page_count
+        first = 1
+        while page_count is None or first <= page_count:
+            past_hint = hinted_page_count is not None and first > hinted_page_count
+            last = first + self.pages_per_chunk - 1
+            if page_count is not None:
+                last = min(last, page_count)
+            elif hinted_page_count is not None and not past_hint:
+                last = min(last, hinted_page_count)
+            try:
+                chunk = process_pdf_with_docling(converter, pdf_bytes, pages=range(first, last + 1))
+            except Exception:
+                if page_count is None and past_hint:
+                    return
+                raise
+            page_count = _document_page_count(chunk) or page_count
+            yield from zip(chunk.page_numbers, chunk.pages)
+            if not chunk.pages or (page_count is None and len(chunk.pages) < last - first + 1):
+                return
+            first = last + 1
+
+    def _run_convert(self, pdf_bytes):
+        stats = self.stats['convert']
+        if isinstance(self.converter, ConverterPool):
+            borrowed = self.converter.borrow()
+        else:
+            borrowed = contextlib.nullcontext(self.converter)
+        try:
+            with borrowed as converter:
+                chunks = self._convert_chunks(converter, pdf_bytes)
+                while not self._stop.is_set():
+                    started = time.perf_counter()
+                    item = next(chunks, _END_OF_STREAM)
+                    stats['busy_s'] += time.perf_counter() - started
+                    if item is _END_OF_STREAM:
+                        break
+                    stats['pages'] += 1
+                    self._put('render', item)
+        finally:
+            self._put('render', _END_OF_STREAM)
+
+    def _run_stage(self, name, next_name, process):
+        stats = self.stats[name]
+        try:
+            while True:
+                item = self._get(name)
+                if item is _END_OF_STREAM:
+                    break
+                started = time.perf_counter()
+                result = process(*item)
+                stats['busy_s'] += time.perf_counter() - started
+                stats['pages'] += 1
+                if next_name is not None:
+                    self._put(next_name, result)
+        finally:
+            if next_name is not None:
+                self._put(next_name, _END_OF_STREAM)
+
+    def _render(self, page_number, page):
+        return page_number, _render_page(page, page_number - 1), page.element_groups
+
+    def _draw(self, page_number, image, elements):
+        if self.class_colors is not None:
+            image = draw_bounding_boxes(image, elements, self.visible_classes, self.class_colors)
+        return page_number, image, elements
+
+    def run(self, pdf_bytes):
+        """
+        Streams one document through the pipeline and returns when the sink has seen every page.
+
+        Output:
+          dict: 'pages', 'seconds' and 'stages', mapping each stage to {'pages', 'busy_s'} plus,
+          for the stages fed by a queue, 'blocked_s' (time its producer waited on the full queue)
+          and 'max_depth'.
+
+        Raises:
+          Exception: The first exception raised by any stage (conversion, rendering, drawing or
+                     the sink); the other stages are stopped.
+        """
+        self._queues = {name: queue.Queue(maxsize=self.queue_size) for name in self.STAGES[1:]}
+        self._stop = threading.Event()
+        self.stats = {name: {'pages': 0, 'busy_s': 0.0} for name in self.STAGES}
+        for name in self.STAGES[1:]:
+            self.stats[name].update(blocked_s=0.0, max_depth=0)
+        errors = []
+
+        def guarded(function, *args):
+            try:
+                function(*args)
+            except BaseException as e:
+                errors.append(e)
+                self._stop.set()
+
+        threads = [
+            threading.Thread(target=guarded, args=(self._run_convert, pdf_bytes), name='stream-convert'),
+            threading.Thread(target=guarded, args=(self._run_stage, 'render', 'draw', self._render), name='stream-render'),
+            threading.Thread(target=guarded, args=(self._run_stage, 'draw', 'sink', self._draw), name='stream-draw'),
+            threading.Thread(target=guarded, args=(self._run_stage, 'sink', None, self.sink), name='stream-sink'),
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return {'pages': self.stats['sink']['pages'], 'seconds': time.perf_counter() - started, 'stages': self.stats}
+
+from PIL import Image, ImageDraw
+
+# The tests imply a default bounding box line width of 2 pixels.
+BOX_LINE_WIDTH = 2
+# From this many elements on, draw_bounding_boxes switches to the batched drawing path.
+FAST_DRAW_MIN_ELEMENTS = 256
+# Pillow releases whose private ImageDraw._getink / core draw_rectangle signatures the batched
+# path was checked against. Other versions draw through the public ImageDraw.rectangle.
+PILLOW_CORE_DRAW_VERSIONS = ((9, 1), (13, 0))
+
+def _pillow_core_draw_supported(draw):
+    """Whether the batched path may call Pillow's private rectangle primitive on draw."""
+    version = tuple(int(part) for part in re.findall(r'\d+', PIL.__version__)[:2])
+    low, high = PILLOW_CORE_DRAW_VERSIONS
+    return (low <= version < high and callable(getattr(draw, '_getink', None))
+            and callable(getattr(getattr(draw, 'draw', None), 'draw_rectangle', None)))
+
+def _draw_bounding_boxes_batched(image, elements, visible_classes, class_colors, width=BOX_LINE_WIDTH):
+    """
+    Batched implementation of draw_bounding_boxes for pages with many elements.
+
+    ImageDraw.rectangle re-resolves the outline color on every call, which dominates the cost
+    of drawing thousands of small boxes. Here each visible class's ink is resolved once, the
+    visible elements are selected up front (with a vectorized class mask for a
+    LayoutElementStore), and every box goes straight to the same core rectangle primitive
+    that ImageDraw.rectangle uses, so the output is pixel-identical. Those are Pillow internals:
+    on a Pillow outside PILLOW_CORE_DRAW_VERSIONS, or one lacking them, boxes are drawn with the
+    public ImageDraw.rectangle instead and only the up-front selection is kept.
+    """
+    drawn_image = image.copy()
+    draw = ImageDraw.Draw(drawn_image)
+    drawable = {name for name in visible_classes if class_colors.get(name)}
+
+    if _pillow_core_draw_supported(draw):
+        core_draw_rectangle = draw.draw.draw_rectangle
+        inks = {}
+
+        def draw_box(bbox, class_name):
+            # _getink is the exact color-resolution step behind ImageDraw.rectangle(..., outline=color).
+            # Inks are resolved on first use so that palette ('P') images allocate colors in the
+            # same order as the per-box loop.
+            ink = inks.get(class_name)
+            if ink is None:
+                ink = inks[class_name] = draw._getink(class_colors[class_name])[0]
+            core_draw_rectangle(bbox, ink, 0, width)
+    else:
+        def draw_box(bbox, class_name):
+            draw.rectangle(bbox, outline=class_colors[class_name], width=width)
+
+    if isinstance(elements, LayoutElementStore):
+        selected = elements.select(class_names=drawable)
+        for bbox, code in zip(elements.bboxes[selected].tolist(), elements.class_codes[selected].tolist()):
+            draw_box(bbox, elements.class_names[code])
+        return drawn_image
+
+    for element in elements:
+        element_class = getattr(element, 'class')
+        if element_class in drawable:
+            draw_box(element.bbox, element_class)
+    return drawn_image
+
+def _draw_bounding_boxes_loop(image, elements, visible_classes, class_colors):
+    """The per-element ImageDraw path of draw_bounding_boxes."""
+
+    # Create a copy of the image to draw on, ensuring the original remains unchanged
+    drawn_image = image.copy()
+
+    # Create a drawing object for the copied image
+    draw = ImageDraw.Draw(drawn_image)
+
+    box_line_width = BOX_LINE_WIDTH
+
+    # Iterate through each layout element
+    for element in elements:
+        # Access the class name of the element.
+        # The test cases define MockElement with a 'class' attribute.
+        element_class = getattr(element, 'class')
+
+        # Check if the element's class is among the visible classes
+        if element_class in visible_classes:
+            # Get the color for this class from the class_colors dictionary
+            # If a class is visible but no color is defined, .get() will return None,
+            # and the box won't be drawn, which is desired behavior.
+            color = class_colors.get(element_class)
+
+            if color: # Only draw if a valid color is found
+                # Get the bounding box coordinates for the element
+                bbox = element.bbox
+
+                # Draw the rectangle on the image
+                # The bbox should be a 4-tuple or list: (x1, y1, x2, y2)
+                draw.rectangle(bbox, outline=color, width=box_line_width)
+
+    # Return the image with the bounding boxes drawn
+    return drawn_image
+
+def draw_bounding_boxes(image, elements, visible_classes, class_colors, fast=None):
+    """
+    This function overlays colored bounding boxes onto a PIL Image for specified layout elements.
+    It only draws boxes for elements whose classes are present in the visible_classes list,
+    using colors defined in class_colors.
+
+    Arguments:
+      image (PIL.Image): The base image on which to draw bounding boxes.
+      elements (list or LayoutElementStore): A list of layout element objects, each with a bounding box and class.
+                       Each element is expected to have 'bbox' and 'class' attributes.
+      visible_classes (list[str]): A list of class names for which bounding boxes should be drawn.
+      class_colors (dict[str, str]): A dictionary mapping class names to hexadecimal color codes.
+      fast (bool, optional): Force (True) or disable (False) the batched drawing path. By default it is
+                             used from FAST_DRAW_MIN_ELEMENTS elements on. Both paths produce identical pixels.
+
+    Output:
+      PIL.Image: A new PIL Image object with the bounding boxes drawn on it.
+    """
+    # Validate the input image type
+    if not isinstance(image, Image.Image):
+        raise TypeError("Input 'image' must be a PIL.Image.Image object.")
+
+    # Set membership keeps the per-element visibility check O(1).
+    visible_classes = set(visible_classes)
+
+    if fast is None:
+        fast = len(elements) >= FAST_DRAW_MIN_ELEMENTS
+    with _stage('draw', elements=len(elements), fast=fast):
+        if fast:
+            return _draw_bounding_boxes_batched(image, elements, visible_classes, class_colors)
+        return _draw_bounding_boxes_loop(image, elements, visible_classes, class_colors)
+
+import weakref
+from PIL import ImageColor
+
+class OverlayLayerCache:
+    """
+    Caches bounding-box overlays per (page, class) so that toggling class visibility only
+    recomposites cached layers instead of redrawing every box.
+
+    Each layer holds the outlines of one class on one page. Outlines cover a small fraction of the
+    page and a layer has a single color, so instead of a full transparent RGBA image a layer is
+    stored as the flat indices of the pixels it covers; compositing copies the page's cached pixel
+    array and scatters each visible layer's color into it. Layers are built lazily the first time
+    a class is shown on a page and evicted least-recently-used across all pages once the cached
+    layers and page arrays exceed max_bytes.
+
+    Within a class the result matches draw_bounding_boxes exactly. Where boxes of different
+    classes overlap, layers are stacked in class_colors order rather than element order.
+
+    Arguments:
+      max_bytes (int): Memory budget for cached layers and page arrays. Defaults to 256 MiB.
+      line_width (int): Outline width in pixels. Defaults to BOX_LINE_WIDTH.
+    """
+
+    # Image modes that can be composited by writing whole pixels into their array.
+    SUPPORTED_MODES = ('L', 'RGB', 'RGBA')
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, line_width=BOX_LINE_WIDTH):
+        self.max_bytes = max_bytes
+        self.line_width = line_width
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (id(image), id(elements), class_name) -> (image weakref, flat pixel indices)
+        # (id(image), id(elements), None) -> (image weakref, page pixel array)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build_layer(self, image_size, class_elements):
+        """Draws the outlines of one class into a cropped mask and returns the flat page indices it covers."""
+        width = self.line_width
+        # Truncate first, as ImageDraw does, so that translating into the crop is exact.
+        boxes = [tuple(int(v) for v in _bbox_as_tuple(element.bbox)) for element in class_elements]
+        if not boxes:
+            return np.empty(0, dtype=np.int32)
+        # Small boxes are drawn slightly outside their bbox by ImageDraw, hence the margin.
+        margin = width + 2
+        left = max(min(b[0] for b in boxes) - margin, 0)
+        top = max(min(b[1] for b in boxes) - margin, 0)
+        right = min(max(b[2] for b in boxes) + margin, image_size[0] - 1)
+        bottom = min(max(b[3] for b in boxes) + margin, image_size[1] - 1)
+        if right < left or bottom < top:
+            return np.empty(0, dtype=np.int32)
+        mask = Image.new('L', (right - left + 1, bottom - top + 1), 0)
+        draw = ImageDraw.Draw(mask)
+        for x0, y0, x1, y1 in boxes:
+            draw.rectangle((x0 - left, y0 - top, x1 - left, y1 - top), outline=255, width=width)
+        rows, cols = np.nonzero(np.asarray(mask))
+        return ((rows + top) * image_size[0] + (cols + left)).astype(np.int32)
+
+    def _lookup(self, key, image):
+        entry = self._entries.get(key)
+        # The id() based key may have been reused by a new page; the weakref tells them apart.
+        if entry is None or entry[0]() is not image:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _insert(self, key, image, value):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous[1].nbytes
+        self._entries[key] = (weakref.ref(image), value)
+        self.nbytes += value.nbytes
+
+    def _evict(self, keep=()):
+        for key in list(self._entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            _, value = self._entries.pop(key)
+            self.nbytes -= value.nbytes
+            self.evictions += 1
+
+    def layers_for(self, image, elements, visible_classes, class_colors):
+        """
+        Returns [(class_name, color, flat_indices)] for the visible, colored classes of a page in
+        class_colors order, building missing layers in a single pass over the elements.
+        """
+        page_key = (id(image), id(elements))
+        visible_classes = set(visible_classes)
+        wanted = [(name, color) for name, color in class_colors.items() if color and name in visible_classes]
+        layers = {}
+        for name, _ in wanted:
+            indices = self._lookup(page_key + (name,), image)
+            if indices is not None:
+                self.hits += 1
+                layers[name] = indices
+
+        missing = {name for name, _ in wanted if name not in layers}
+        if missing:
+            grouped = {name: [] for name in missing}
+            for element in elements:
+                element_class = _element_class_name(element)
+                if element_class in missing:
+                    grouped[element_class].append(element)
+            for name in missing:
+                self.misses += 1
+                layers[name] = self._build_layer(image.size, grouped[name])
+                self._insert(page_key + (name,), image, layers[name])
+            # Layers of the page being shown are never evicted by its own build.
+            self._evict(keep={page_key + (name,) for name, _ in wanted} | {page_key + (None,)})
+        return [(name, color, layers[name]) for name, color in wanted]
+
+    def _base_pixels(self, image, elements):
+        base_key = (id(image), id(elements), None)
+        base = self._lookup(base_key, image)
+        if base is None:
+            base = np.asarray(image)
+            self._insert(base_key, image, base)
+        return base
+
+    @staticmethod
+    def _flat_pixels(pixels, image):
+        """Views each pixel as a single opaque value so one scatter writes all of its bands."""
+        return pixels.reshape(-1).view(f'V{len(image.getbands())}')
+
+    @staticmethod
+    def _ink(color, image):
+        ink = ImageColor.getcolor(color, image.mode)
+        ink = bytes(ink if isinstance(ink, tuple) else (ink,))
+        return np.frombuffer(ink, dtype=f'V{len(ink)}')[0]
+
+    def composite_array(self, image, elements, visible_classes, class_colors):
+        """
+        Like composite, but returns the composited pixels as a new NumPy array that can later be
+        updated in place with apply_visibility_delta.
+
+        Raises:
+          ValueError: If the image mode is not 'L', 'RGB' or 'RGBA'.
+        """
+        if image.mode not in self.SUPPORTED_MODES:
+            raise ValueError(f"Image mode {image.mode!r} cannot be composited from layers.")
+        pixels = self._base_pixels(image, elements).copy()
+        flat = self._flat_pixels(pixels, image)
+        for _, color, indices in self.layers_for(image, elements, visible_classes, class_colors):
+            flat[indices] = self._ink(color, image)
+        return pixels
+
+    def composite(self, image, elements, visible_classes, class_colors):
+        """
+        Returns a copy of image with the cached outlines of every visible class drawn on top.
+        Images in modes other than 'L', 'RGB' and 'RGBA' fall back to draw_bounding_boxes.
+        """
+        if not isinstance(image, Image.Image):
+            raise TypeError("Input 'image' must be a PIL.Image.Image object.")
+        if image.mode not in self.SUPPORTED_MODES:
+            return draw_bounding_boxes(image, elements, visible_classes, class_colors)
+        return Image.fromarray(self.composite_array(image, elements, visible_classes, class_colors), mode=image.mode)
+
+    def apply_visibility_delta(self, pixels, image, elements, previous_visible, visible_classes, class_colors):
+        """
+        Updates pixels composited for previous_visible in place so that they show visible_classes.
+        Only the pixels of the classes turned on or off are touched: the hidden classes are
+        restored from the page, and the visible classes are restacked over the changed pixels.
+
+        Arguments:
+          pixels (numpy.ndarray): Array returned by composite_array for the same page.
+          image (PIL.Image.Image): The page the pixels were composited from.
+          elements (list): The page's layout elements.
+          previous_visible (iterable[str]): Classes visible in pixels.
+          visible_classes (iterable[str]): Classes that should be visible.
+          class_colors (dict[str, str]): Class name -> outline color.
+        Output:
+          bool: False if the visible classes are unchanged and nothing was done.
+        """
+        colored = {name for name, color in class_colors.items() if color}
+        previous_visible = set(previous_visible) & colored
+        visible_classes = set(visible_classes) & colored
+        changed_classes = previous_visible ^ visible_classes
+        if not changed_classes:
+            return False
+
+        layers = self.layers_for(image, elements, visible_classes | changed_classes, class_colors)
+        changed = np.zeros(image.width * image.height, dtype=bool)
+        for name, _, indices in layers:
+            if name in changed_classes:
+                changed[indices] = True
+
+        flat = self._flat_pixels(pixels, image)
+        base = self._flat_pixels(self._base_pixels(image, elements), image)
+        for name, _, indices in layers:
+            if name in previous_visible - visible_classes:
+                flat[indices] = base[indices]
+        for name, color, indices in layers:
+            if name in visible_classes:
+                flat[indices[changed[indices]]] = self._ink(color, image)
+        return True
+
+    def clear(self):
+        """Drops every cached layer and page array."""
+        self._entries.clear()
+        self.nbytes = 0
+
+# Layer cache shared by update_display and create_interactive_viewer.
+overlay_layer_cache = OverlayLayerCache()
+
+# Target heights in pixels of the downscaled pyramid levels. The 'full' level is the rendered page itself.
+PYRAMID_LEVEL_HEIGHTS = {'thumbnail': 160, 'screen': 600}
+PYRAMID_CACHE_SIZE = 32
+
+class ScaledLayoutElement:
+    """
+    A layout element whose bbox is scaled to a pyramid level. Every other attribute
+    ('class', 'text_content', 'confidence', ...) is read from the wrapped element.
+    """
+
+    __slots__ = ('element', '_scale')
 
-import PIL.Image
+    def __init__(self, element, scale):
+        self.element = element
+        self._scale = scale
+
+    @property
+    def bbox(self):
+        scale_x, scale_y = self._scale
+        x0, y0, x1, y1 = _bbox_as_tuple(self.element.bbox)
+        return (x0 * scale_x, y0 * scale_y, x1 * scale_x, y1 * scale_y)
+
+    def __getattr__(self, name):
+        return getattr(self.element, name)
+
+    def __repr__(self):
+        return f"ScaledLayoutElement({self.element!r}, bbox={self.bbox})"
 
-def extract_page_images_and_elements(docling_result: object) -> list[tuple[PIL.Image.Image, list[object]]]:
+class PagePyramid:
     """
-    This function iterates through the pages of a Docling result object to extract each page's
-    rendered image and its associated layout elements. It collects these into a list of tuples,
-    where each tuple contains a PIL Image and a list of detected element objects.
-    
+    Downscaled copies of a rendered page ('thumbnail' and 'screen' by default) together with
+    element lists whose bboxes are scaled to match, so that display code can draw at the
+    resolution it actually shows. Levels are built once, each from the next larger one.
+    A level never upscales: on a page smaller than its target height it is the page itself.
+
+    The full-resolution page is only referenced weakly, so a pyramid does not keep an image
+    alive that a LazyPageSequence has evicted; level('full') then raises LookupError and the
+    caller fetches the page again.
+
     Arguments:
-      docling_result: The structured Docling result object obtained after PDF processing.
-                      Expected to have a 'pages' attribute, which is an iterable of page objects.
-                      Each page object is expected to have a 'render()' method returning a PIL Image
-                      and an 'element_groups' attribute (list of element objects).
-                      
-    Output:
-      list[tuple[PIL.Image.Image, list[object]]]: A list where each tuple contains a PIL Image
-      of a page and a list of its detected layout elements (with attributes like bbox, class,
-      text_content, confidence).
-    
+      image (PIL.Image.Image): The full-resolution page image.
+      elements (list): The page's layout elements, in full-resolution coordinates.
+      level_heights (dict[str, int]): Level name -> target height in pixels.
+                                      Defaults to PYRAMID_LEVEL_HEIGHTS.
+
     Raises:
-      AttributeError: If docling_result or its pages lack expected attributes (e.g., 'pages', 'render', 'element_groups').
-      RuntimeError: If a page's render method fails (as simulated in tests).
+      TypeError: If image is not a PIL.Image.Image object.
     """
-    
-    extracted_data = []
-    
-    # docling_result is expected to have a 'pages' attribute, which is an iterable
-    for page in docling_result.pages:
-        # Each page object is expected to have a 'render' method
-        page_image = page.render()
-        
-        # Each page object is expected to have an 'element_groups' attribute
-        page_elements = page.element_groups
-        
-        extracted_data.append((page_image, page_elements))
-        
-    return extracted_data
 
-from PIL import Image, ImageDraw
+    def __init__(self, image, elements, level_heights=PYRAMID_LEVEL_HEIGHTS):
+        if not isinstance(image, Image.Image):
+            raise TypeError("Input 'image' must be a PIL.Image.Image object.")
+        self.size = image.size
+        self.elements = elements
+        self._image_ref = weakref.ref(image)
+        # Level name -> (image, elements, (scale_x, scale_y))
+        self._levels = {}
+        source = image
+        for name, height in sorted(level_heights.items(), key=lambda item: -item[1]):
+            if height >= image.height:
+                self._levels[name] = (image, elements, (1.0, 1.0))
+                continue
+            width = max(1, round(image.width * height / image.height))
+            # reducing_gap lets Pillow shrink by an integer factor first, which is much faster.
+            source = source.resize((width, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+            scale = (width / image.width, height / image.height)
+            self._levels[name] = (source, [ScaledLayoutElement(element, scale) for element in elements], scale)
+
+    @property
+    def level_names(self):
+        return ['full'] + list(self._levels)
+
+    def level(self, name):
+        """
+        Returns (image, elements, (scale_x, scale_y)) for a pyramid level.
 
-def draw_bounding_boxes(image, elements, visible_classes, class_colors):
+        Raises:
+          KeyError: If the level does not exist.
+          LookupError: If 'full' is requested after the full-resolution image was released.
+        """
+        if name == 'full':
+            image = self._image_ref()
+            if image is None:
+                raise LookupError("The full-resolution page image is no longer in memory.")
+            return image, self.elements, (1.0, 1.0)
+        return self._levels[name]
+
+    @property
+    def nbytes(self):
+        """Estimated memory held by the downscaled levels."""
+        full = self._image_ref()
+        return sum(_page_image_nbytes(image) for image, _, _ in self._levels.values() if image is not full)
+
+_page_pyramid_cache = OrderedDict()
+
+def get_page_pyramid(image, elements):
     """
-    This function overlays colored bounding boxes onto a PIL Image for specified layout elements.
-    It only draws boxes for elements whose classes are present in the visible_classes list,
-    using colors defined in class_colors.
+    Returns the PagePyramid of a page, building it on first use. Pyramids are cached by the
+    identity of the page image and its element list, like get_spatial_index.
+    """
+    key = (id(image), id(elements))
+    cached = _page_pyramid_cache.get(key)
+    if cached is not None and cached.elements is elements and cached._image_ref() is image:
+        _page_pyramid_cache.move_to_end(key)
+        return cached
+    pyramid = PagePyramid(image, elements)
+    _page_pyramid_cache[key] = pyramid
+    while len(_page_pyramid_cache) > PYRAMID_CACHE_SIZE:
+        _page_pyramid_cache.popitem(last=False)
+    return pyramid
+
+def render_page_overlay(image, elements, visible_classes, class_colors, level='screen'):
+    """
+    Draws the visible classes of a page at one pyramid level and returns the result.
+    The viewer uses 'screen'; 'full' is meant for zooming in and for exporting.
 
     Arguments:
-      image (PIL.Image): The base image on which to draw bounding boxes.
-      elements (list): A list of layout element objects, each with a bounding box and class.
-                       Each element is expected to have 'bbox' and 'class' attributes.
-      visible_classes (list[str]): A list of class names for which bounding boxes should be drawn.
-      class_colors (dict[str, str]): A dictionary mapping class names to hexadecimal color codes.
+      image (PIL.Image.Image): The full-resolution page image.
+      elements (list): The page's layout elements, in full-resolution coordinates.
+      visible_classes (list[str]): Class names to draw.
+      class_colors (dict[str, str]): Class name -> outline color.
+      level (str): 'thumbnail', 'screen' or 'full'. Defaults to 'screen'.
+    Output:
+      tuple: (PIL.Image.Image, list) - the drawn image and the elements in its coordinates.
+    """
+    level_image, level_elements, _ = get_page_pyramid(image, elements).level(level)
+    return overlay_layer_cache.composite(level_image, level_elements, visible_classes, class_colors), level_elements
+
+import random
+import timeit
+
+def _synthetic_page(num_boxes, page_size=(1700, 2200), class_names=('Text', 'Title', 'Table', 'Figure'), seed=0):
+    """Builds a white page image and num_boxes random layout elements for benchmarking."""
+    rng = random.Random(seed)
+    width, height = page_size
+    elements = []
+    for _ in range(num_boxes):
+        x = rng.uniform(0, width - 60)
+        y = rng.uniform(0, height - 40)
+        elements.append(types.SimpleNamespace(**{
+            'bbox': (x, y, x + rng.uniform(5, 60), y + rng.uniform(5, 40)),
+            'class': rng.choice(class_names),
+            'text_content': '',
+            'confidence': rng.random(),
+        }))
+    return Image.new('RGB', page_size, 'white'), elements
+
+def benchmark_draw_bounding_boxes(num_boxes=5000, page_size=(1700, 2200), repeats=5, seed=0):
+    """
+    Times draw_bounding_boxes on a synthetic page with the per-box ImageDraw loop and with the
+    batched path, and checks that both produce identical pixels.
 
     Output:
-      PIL.Image: A new PIL Image object with the bounding boxes drawn on it.
+      dict: 'loop_ms' and 'batched_ms' (best of repeats), 'speedup' and 'identical'.
     """
-    # Validate the input image type
-    if not isinstance(image, Image.Image):
-        raise TypeError("Input 'image' must be a PIL.Image.Image object.")
+    image, elements = _synthetic_page(num_boxes, page_size, seed=seed)
+    class_colors = {'Text': '#A6CEE3', 'Title': '#1F78B4', 'Table': '#E31A1C', 'Figure': '#FB9A99'}
+    visible_classes = ['Text', 'Title', 'Table']
 
-    # Create a copy of the image to draw on, ensuring the original remains unchanged
-    drawn_image = image.copy()
-    
-    # Create a drawing object for the copied image
-    draw = ImageDraw.Draw(drawn_image)
-    
-    # The tests imply a default bounding box line width of 2 pixels.
-    box_line_width = 2
+    def run(fast):
+        return draw_bounding_boxes(image, elements, visible_classes, class_colors, fast=fast)
 
-    # Iterate through each layout element
-    for element in elements:
-        # Access the class name of the element.
-        # The test cases define MockElement with a 'class' attribute.
-        element_class = element.class 
-        
-        # Check if the element's class is among the visible classes
-        if element_class in visible_classes:
-            # Get the color for this class from the class_colors dictionary
-            # If a class is visible but no color is defined, .get() will return None,
-            # and the box won't be drawn, which is desired behavior.
-            color = class_colors.get(element_class)
-            
-            if color: # Only draw if a valid color is found
-                # Get the bounding box coordinates for the element
-                bbox = element.bbox
-                
-                # Draw the rectangle on the image
-                # The bbox should be a 4-tuple or list: (x1, y1, x2, y2)
-                draw.rectangle(bbox, outline=color, width=box_line_width)
-    
-    # Return the image with the bounding boxes drawn
-    return drawn_image
+    loop_ms = min(timeit.repeat(lambda: run(False), number=1, repeat=repeats)) * 1000
+    batched_ms = min(timeit.repeat(lambda: run(True), number=1, repeat=repeats)) * 1000
+    return {
+        'num_boxes': num_boxes,
+        'loop_ms': loop_ms,
+        'batched_ms': batched_ms,
+        'speedup': loop_ms / batched_ms,
+        'identical': run(False).tobytes() == run(True).tobytes(),
+    }
 
+import io
 import ipywidgets as widgets
-from IPython.display import display, clear_output
 
-def create_interactive_viewer(all_pages_data, class_colors):
+try:
+    from ipyevents import Event as WidgetEvent
+except ImportError:  # Clicking boxes in the viewer needs ipyevents; the viewer works without it
+    WidgetEvent = None
+# IPython.display.display is called by its full name below because this module later binds
+# the name display to the IPython.display module itself (see display_element_metadata).
+import IPython.display
+from IPython.display import clear_output
+
+def create_interactive_viewer(all_pages_data, class_colors, max_cached_bytes=None):
     """
     This is the main interactive visualization function that orchestrates ipywidgets to create a comprehensive viewer for Docling's layout analysis results.
+
+    A list keeps every page image alive for the life of the widget. To bound memory, pass a
+    LazyPageSequence instead: pages are then rendered on demand, evicted LRU-first once
+    max_cached_bytes is exceeded, and the pages next to the slider position are prefetched.
+    The cache occupancy is shown below the page slider.
     """
     # Type checking based on test cases
-    if not isinstance(all_pages_data, list):
-        raise TypeError("all_pages_data must be a list.")
+    if not isinstance(all_pages_data, (list, LazyPageSequence, MappedPageStore)):
+        raise TypeError("all_pages_data must be a list, a LazyPageSequence or a MappedPageStore.")
     if not isinstance(class_colors, dict):
         raise TypeError("class_colors must be a dictionary.")
+    if max_cached_bytes is not None and isinstance(all_pages_data, LazyPageSequence):
+        all_pages_data.max_cached_bytes = max_cached_bytes
 
     num_pages = len(all_pages_data)
+    page_numbers = page_numbers_of(all_pages_data)
 
     # 1. Page navigation slider
-    page_slider = widgets.IntSlider(
-        min=0,
-        max=max(0, num_pages - 1),  # Ensure max is at least 0 for empty data
-        step=1,
-        description='Page:',
-        disabled=num_pages == 0,
-        continuous_update=False,
-        orientation='horizontal',
-        readout=True,
-        readout_format='d',
-        layout=widgets.Layout(width='300px')
-    )
+    if page_numbers != tuple(range(1, num_pages + 1)):
+        # A page subset: label the slider positions with the original page numbers.
+        page_slider = widgets.SelectionSlider(
+            options=[(str(number), index) for index, number in enumerate(page_numbers)],
+            value=0,
+            description='Page:',
+            continuous_update=False,
+            orientation='horizontal',
+            readout=True,
+            layout=widgets.Layout(width='300px')
+        )
+    else:
+        page_slider = widgets.IntSlider(
+            min=0,
+            max=max(0, num_pages - 1),  # Ensure max is at least 0 for empty data
+            step=1,
+            description='Page:',
+            disabled=num_pages == 0,
+            continuous_update=False,
+            orientation='horizontal',
+            readout=True,
+            readout_format='d',
+            layout=widgets.Layout(width='300px')
+        )
 
     # 2. Checkboxes for filtering layout class visibility
     checkbox_widgets = {}
@@ -242,24 +3341,60 @@ def create_interactive_viewer(all_pages_data, class_colors):
 
     # 3. Display area for the rendered page image (using HTML as a placeholder due to test mock limitations)
     image_output = widgets.Output(layout=widgets.Layout(border='1px solid gray', flex='1 1 auto'))
+    # Holds the rendered page as PNG bytes; set directly so redraws don't go through the output area.
+    page_image_widget = widgets.Image(format='png', layout=widgets.Layout(max_width='100%'))
+    # Page and overlay cache occupancy, refreshed on every page change.
+    cache_status = widgets.HTML()
+    # Pages are drawn at screen resolution; full resolution is only used when zooming in.
+    resolution_toggle = widgets.ToggleButtons(
+        options=[('Screen', 'screen'), ('Full', 'full')],
+        value='screen',
+        description='Resolution:',
+        style={'button_width': '70px'}
+    )
     # 4. Output area to display extracted metadata (using HTML as a placeholder)
     metadata_output = widgets.Output(layout=widgets.Layout(border='1px solid gray', flex='0 0 300px', padding='10px'))
 
     # Function to update the display based on slider and checkbox values
-    def _update_viewer(page_num, **class_visibility):
+    def _update_viewer(page_num, resolution='screen', **class_visibility):
         # Update image display area
         with image_output:
             clear_output(wait=True)
             if not all_pages_data:
-                display(widgets.HTML("<i>No pages to display.</i>"))
+                IPython.display.display(widgets.HTML("<i>No pages to display.</i>"))
                 return
 
             page_image, elements = all_pages_data[page_num]
 
+            # Show the page with its visible classes at the selected pyramid level ('screen' unless
+            # zoomed in), composited from cached per-class layers.
+            shown_elements = elements
+            if isinstance(page_image, Image.Image):
+                visible_classes = [name for name, is_visible in class_visibility.items() if is_visible]
+                overlay, shown_elements = render_page_overlay(page_image, elements, visible_classes, class_colors, level=resolution)
+                png_buffer = io.BytesIO()
+                overlay.save(png_buffer, format='PNG', compress_level=1)
+                page_image_widget.value = png_buffer.getvalue()
+
+            # Expose the page to on_image_click, in the coordinates of the image shown, along with
+            # this viewer's metadata area, and build the page's spatial index once, up front.
+            _set_click_target(shown_elements, metadata_output)
+            get_spatial_index(shown_elements)
+
+            # Render the neighbouring pages in the background and report what the caches hold.
+            if isinstance(all_pages_data, LazyPageSequence):
+                all_pages_data.prefetch([page_num + 1, page_num - 1])
+                info = all_pages_data.cache_info()
+                budget = f" / {info['max_bytes'] / 2**20:.1f}" if info['max_bytes'] is not None else ""
+                cache_status.value = (
+                    f"<small>Page cache: {info['pages']} pages, {info['nbytes'] / 2**20:.1f}{budget} MiB; "
+                    f"overlay layers: {overlay_layer_cache.nbytes / 2**20:.1f} MiB</small>"
+                )
+
             # Placeholder for image display.
             # Actual PIL.ImageDraw operations are omitted to ensure compatibility
             # with the provided test mocks, which do not fully mock PIL.Image for drawing.
-            image_html = f"<h2>Page {page_num + 1}</h2>"
+            image_html = f"<h2>Page {page_numbers[page_num]}</h2>"
             image_html += "<p>Image rendering placeholder (actual rendering relies on PIL functionality not fully mocked in tests).</p>"
             
             # Safely access width/height as the mock image has these attributes
@@ -268,56 +3403,58 @@ def create_interactive_viewer(all_pages_data, class_colors):
             
             found_visible_elements = False
             for element in elements:
-                # MockElement has .class_name and .bbox
-                if element.class_name in class_visibility and class_visibility[element.class_name]:
-                    color = class_colors.get(element.class_name, 'black') # Use black if color not found
-                    image_html += f"<li><span style='color: {color}'>&#9632;</span> {element.class_name}: {element.bbox}</li>"
+                # Docling elements expose 'class', MockElement and deserialized elements .class_name
+                element_class = _element_class_name(element)
+                if element_class in class_visibility and class_visibility[element_class]:
+                    color = class_colors.get(element_class, 'black') # Use black if color not found
+                    image_html += f"<li><span style='color: {color}'>&#9632;</span> {element_class}: {element.bbox}</li>"
                     found_visible_elements = True
             
             if not found_visible_elements:
                 image_html += "<li><i>No elements visible for selected filters.</i></li>"
             image_html += "</ul>"
-            display(widgets.HTML(image_html))
+            IPython.display.display(widgets.HTML(image_html))
 
         # Update metadata display area
         with metadata_output:
             clear_output(wait=True)
             if not all_pages_data:
-                display(widgets.HTML("<i>No metadata.</i>"))
+                IPython.display.display(widgets.HTML("<i>No metadata.</i>"))
                 return
             
             # Placeholder for metadata display.
             # Actual interaction-based metadata extraction is more complex than covered by these tests.
-            metadata_html = f"<h3>Metadata for Page {page_num + 1}</h3>"
+            metadata_html = f"<h3>Metadata for Page {page_numbers[page_num]}</h3>"
             metadata_html += "<p>Click on an element for details (feature not fully implemented for mock environment).</p>"
             metadata_html += "<ul>"
             for element in elements:
-                if element.class_name in class_visibility and class_visibility[element.class_name]:
+                element_class = _element_class_name(element)
+                if element_class in class_visibility and class_visibility[element_class]:
                     # Assuming MockElement has text_content and confidence for example
                     text_preview = getattr(element, 'text_content', 'N/A')
                     if len(text_preview) > 50:
                         text_preview = text_preview[:50] + "..."
-                    metadata_html += f"<li><b>{element.class_name}</b> (Confidence: {getattr(element, 'confidence', 'N/A')})<br>Text: {text_preview}</li>"
+                    metadata_html += f"<li><b>{element_class}</b> (Confidence: {getattr(element, 'confidence', 'N/A')})<br>Text: {text_preview}</li>"
             metadata_html += "</ul>"
-            display(widgets.HTML(metadata_html))
+            IPython.display.display(widgets.HTML(metadata_html))
 
     # Connect widgets to the update function using interactive_output.
     # This automatically calls _update_viewer whenever page_slider or any checkbox changes.
     widgets.interactive_output(
         _update_viewer,
-        {'page_num': page_slider, **{name: cb for name, cb in checkbox_widgets.items()}}
+        {'page_num': page_slider, 'resolution': resolution_toggle, **{name: cb for name, cb in checkbox_widgets.items()}}
     )
 
     # Arrange widgets in a VBox container
     # Top row: page slider and class filter checkboxes
     controls_top_row = widgets.HBox(
-        [page_slider, class_filter_panel],
+        [widgets.VBox([page_slider, resolution_toggle, cache_status]), class_filter_panel],
         layout=widgets.Layout(justify_content='space-between', align_items='flex-start', width='100%')
     )
 
     # Main display area: image and metadata side-by-side
     main_display_area = widgets.HBox(
-        [image_output, metadata_output],
+        [widgets.VBox([page_image_widget, image_output], layout=widgets.Layout(flex='1 1 auto')), metadata_output],
         layout=widgets.Layout(flex='1 1 auto', align_items='stretch', width='100%', height='600px') # Fixed height for main area
     )
 
@@ -327,6 +3464,14 @@ def create_interactive_viewer(all_pages_data, class_colors):
         main_display_area
     ])
 
+    if WidgetEvent is not None:
+        # ipyevents reports clicks on an Image widget in the image's own pixel coordinates
+        # (dataX, dataY), the coordinates of the elements published to on_image_click.
+        click_events = WidgetEvent(source=page_image_widget, watched_events=['click'])
+        click_events.on_dom_event(
+            lambda event: on_image_click(types.SimpleNamespace(xdata=event.get('dataX'), ydata=event.get('dataY'))))
+        viewer.click_events = click_events
+
     return viewer
 
 from IPython.display import clear_output
@@ -336,6 +3481,14 @@ import matplotlib.pyplot as plt
 # are globally available within the module where `update_display` is defined.
 # In a testing environment, these would be mocked or patched.
 
+# Last rendered state of recently displayed pages, used by update_display to redraw only what
+# changed: page_index -> (screen image, screen elements, class colors, visible classes, pixels).
+DISPLAY_STATE_CACHE_SIZE = 16
+_display_state = OrderedDict()
+# How update_display refreshed the page: a full composite, only the classes that were toggled,
+# or not at all because the visible classes did not change.
+display_stats = {'full_redraws': 0, 'delta_redraws': 0, 'redraws_avoided': 0}
+
 def update_display(page_index, class_visibility_flags):
     """Refreshes the displayed page and bounding boxes based on user selections.
 
@@ -368,10 +3521,33 @@ def update_display(page_index, class_visibility_flags):
         if is_visible and class_name in class_colors
     ]
 
-    # 4. Call draw_bounding_boxes with the processed data.
-    # 'draw_bounding_boxes' is assumed to be a globally accessible function.
-    # This global function will be patched by '_mock_draw_bounding_boxes' in tests.
-    processed_image = draw_bounding_boxes(current_image, current_elements, visible_classes, class_colors)
+    # 4. Draw the visible classes onto the page.
+    # Real pages are drawn at screen resolution from per-class layers cached in 'overlay_layer_cache'.
+    # If the page was drawn before, only the classes turned on or off since then are applied,
+    # and nothing is redrawn if the visible classes did not change. Anything else goes through
+    # 'draw_bounding_boxes', which tests patch with '_mock_draw_bounding_boxes'.
+    if isinstance(current_image, Image.Image) and current_image.mode in OverlayLayerCache.SUPPORTED_MODES:
+        screen_image, screen_elements, _ = get_page_pyramid(current_image, current_elements).level('screen')
+        colors = tuple(class_colors.items())
+        visible = frozenset(visible_classes)
+        state = _display_state.get(page_index)
+        if state is not None and state[0] is screen_image and state[1] is screen_elements and state[2] == colors:
+            _display_state.move_to_end(page_index)
+            pixels = state[4]
+            if state[3] == visible:
+                display_stats['redraws_avoided'] += 1
+                return None
+            overlay_layer_cache.apply_visibility_delta(pixels, screen_image, screen_elements, state[3], visible, class_colors)
+            display_stats['delta_redraws'] += 1
+        else:
+            pixels = overlay_layer_cache.composite_array(screen_image, screen_elements, visible, class_colors)
+            display_stats['full_redraws'] += 1
+        _display_state[page_index] = (screen_image, screen_elements, colors, visible, pixels)
+        while len(_display_state) > DISPLAY_STATE_CACHE_SIZE:
+            _display_state.popitem(last=False)
+        processed_image = Image.fromarray(pixels, mode=screen_image.mode)
+    else:
+        processed_image = draw_bounding_boxes(current_image, current_elements, visible_classes, class_colors)
 
     # 5. Update the display widget.
     # 'image_output' is assumed to be a globally accessible ipywidgets.Output instance.
@@ -423,33 +3599,174 @@ def display_element_metadata(element):
         # Display the formatted content as Markdown.
         display.display(display.Markdown(markdown_content))
 
-# The context implies that 'current_elements', 'metadata_output', and 'display_element_metadata'
-# are module-level variables or functions that on_image_click will access.
-# These are typically set up in the same module where on_image_click is defined.
+class PageSpatialIndex:
+    """
+    A uniform-grid spatial index over the bounding boxes of one page's layout elements.
+
+    Each element is registered in every grid cell its bbox overlaps, so point and rectangle
+    queries only test the elements of the few cells they touch instead of the whole page.
+    Overlapping hits are ordered by a fixed policy: smallest bbox area first (the innermost
+    element), and among equal areas the element that comes later in the list (drawn on top).
+
+    Arguments:
+      elements (list): Layout elements, each with a 'bbox' attribute (x_min, y_min, x_max, y_max).
+      cell_size (float, optional): Grid cell edge length. By default it is chosen so that an
+                                   average cell holds about two elements.
+    """
+
+    def __init__(self, elements, cell_size=None):
+        self.elements = list(elements)
+        self._bboxes = []
+        for element in self.elements:
+            x1, y1, x2, y2 = _bbox_as_tuple(element.bbox)
+            self._bboxes.append((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+
+        if cell_size is None:
+            if self._bboxes:
+                width = max(b[2] for b in self._bboxes) - min(b[0] for b in self._bboxes)
+                height = max(b[3] for b in self._bboxes) - min(b[1] for b in self._bboxes)
+                cell_size = math.sqrt(max(width * height, 1.0) / max(len(self._bboxes) / 2.0, 1.0))
+            else:
+                cell_size = 1.0
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive.")
+        self.cell_size = float(cell_size)
+
+        self._cells = {}
+        for position, (x1, y1, x2, y2) in enumerate(self._bboxes):
+            for cx in range(self._cell(x1), self._cell(x2) + 1):
+                for cy in range(self._cell(y1), self._cell(y2) + 1):
+                    self._cells.setdefault((cx, cy), []).append(position)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def _cell(self, coordinate):
+        return math.floor(coordinate / self.cell_size)
+
+    def _area(self, position):
+        x1, y1, x2, y2 = self._bboxes[position]
+        return (x2 - x1) * (y2 - y1)
+
+    def _ordered(self, positions):
+        """Applies the overlap policy: smallest area first, later (topmost) elements first on ties."""
+        return [self.elements[p] for p in sorted(positions, key=lambda p: (self._area(p), -p))]
+
+    def query_point(self, x, y):
+        """Returns all elements whose bbox contains (x, y), edges included, in overlap-policy order."""
+        candidates = self._cells.get((self._cell(x), self._cell(y)), ())
+        hits = [p for p in candidates
+                if self._bboxes[p][0] <= x <= self._bboxes[p][2] and self._bboxes[p][1] <= y <= self._bboxes[p][3]]
+        return self._ordered(hits)
+
+    def query_rect(self, x_min, y_min, x_max, y_max):
+        """Returns all elements whose bbox intersects the given rectangle, in overlap-policy order."""
+        hits = set()
+        for cx in range(self._cell(x_min), self._cell(x_max) + 1):
+            for cy in range(self._cell(y_min), self._cell(y_max) + 1):
+                for p in self._cells.get((cx, cy), ()):
+                    b = self._bboxes[p]
+                    if b[0] <= x_max and b[2] >= x_min and b[1] <= y_max and b[3] >= y_min:
+                        hits.add(p)
+        return self._ordered(hits)
+
+    def hit_test(self, x, y):
+        """Returns the element selected by a click at (x, y) under the overlap policy, or None."""
+        hits = self.query_point(x, y)
+        return hits[0] if hits else None
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Returns the element whose bbox is closest to (x, y) (distance 0 if the point is inside),
+        or None if the page is empty or nothing lies within max_distance. Ties follow the
+        overlap policy.
+        """
+        if not self._bboxes:
+            return None
+
+        def distance(p):
+            x1, y1, x2, y2 = self._bboxes[p]
+            return math.hypot(max(x1 - x, 0.0, x - x2), max(y1 - y, 0.0, y - y2))
+
+        # Search rings of cells around the query cell until no unvisited cell can be closer
+        # than the best candidate found so far.
+        origin_x, origin_y = self._cell(x), self._cell(y)
+        cell_xs = [cx for cx, _ in self._cells]
+        cell_ys = [cy for _, cy in self._cells]
+        max_ring = max(abs(origin_x - min(cell_xs)), abs(origin_x - max(cell_xs)),
+                       abs(origin_y - min(cell_ys)), abs(origin_y - max(cell_ys)))
+        best, best_key = None, None
+        for ring in range(max_ring + 1):
+            if best is not None and (ring - 1) * self.cell_size > best_key[0]:
+                break
+            for cx in range(origin_x - ring, origin_x + ring + 1):
+                for cy in range(origin_y - ring, origin_y + ring + 1):
+                    if max(abs(cx - origin_x), abs(cy - origin_y)) != ring:
+                        continue
+                    for p in self._cells.get((cx, cy), ()):
+                        key = (distance(p), self._area(p), -p)
+                        if best_key is None or key < best_key:
+                            best, best_key = p, key
+        if best is None or (max_distance is not None and best_key[0] > max_distance):
+            return None
+        return self.elements[best]
+
+# Spatial indexes are built once per page and reused across clicks. Pages are identified by
+# their element list, which is kept alive by the cache so that its id() cannot be reused.
+SPATIAL_INDEX_CACHE_SIZE = 64
+_spatial_index_cache = OrderedDict()
+
+def get_spatial_index(elements):
+    """
+    Returns the PageSpatialIndex for a page's element list, building it on first use.
+    Element lists are treated as immutable once indexed; a list whose length changed is re-indexed.
+    """
+    key = id(elements)
+    cached = _spatial_index_cache.get(key)
+    if cached is not None and cached[0] is elements and len(cached[1]) == len(elements):
+        _spatial_index_cache.move_to_end(key)
+        return cached[1]
+    index = PageSpatialIndex(elements)
+    _spatial_index_cache[key] = (elements, index)
+    while len(_spatial_index_cache) > SPATIAL_INDEX_CACHE_SIZE:
+        _spatial_index_cache.popitem(last=False)
+    return index
+
+# Module-level state shared by the click handler: the elements of the page currently shown
+# and the Output widget that receives element metadata. Both are assigned by the viewer
+# through _set_click_target whenever it shows a page.
+current_elements = []
+metadata_output = None
+
+def _set_click_target(elements, output):
+    """Makes elements, in the coordinates of the image shown, and output the target of on_image_click."""
+    global current_elements, metadata_output
+    current_elements = elements
+    metadata_output = output
 
 def on_image_click(event):
-    """Event handler for image clicks, displays element metadata if a bounding box is hit."""
+    """
+    Event handler for image clicks, displays element metadata if a bounding box is hit.
+    Hit testing goes through the page's PageSpatialIndex; when boxes overlap, the smallest
+    (innermost) element under the cursor is selected.
+    """
     # Ensure valid click coordinates are available
     if event.xdata is None or event.ydata is None:
         return
 
     click_x, click_y = event.xdata, event.ydata
 
-    # Iterate through the currently visible elements on the page
-    for element in current_elements: # 'current_elements' is assumed to be a module-level list
-        # Extract bounding box coordinates [x_min, y_min, x_max, y_max]
-        x_min, y_min, x_max, y_max = element.bbox
+    # 'current_elements' is the module-level list of elements on the displayed page
+    element = get_spatial_index(current_elements).hit_test(click_x, click_y)
+    # No viewer has published its metadata area yet: there is nowhere to show the element
+    if element is None or metadata_output is None:
+        return
 
-        # Check if the click coordinates fall within the element's bounding box
-        if x_min <= click_x <= x_max and y_min <= click_y <= y_max:
-            # A hit is detected: clear any existing metadata output
-            metadata_output.clear_output() # 'metadata_output' is assumed to be a module-level output widget
+    # A hit is detected: clear any existing metadata output
+    metadata_output.clear_output() # 'metadata_output' is assumed to be a module-level output widget
 
-            # Display the metadata for the selected element
-            display_element_metadata(element) # 'display_element_metadata' is assumed to be a module-level function
-            
-            # Exit after finding the first element to avoid processing overlapping elements
-            return
+    # Display the metadata for the selected element
+    display_element_metadata(element) # 'display_element_metadata' is assumed to be a module-level function
 
 def print_sample_element_metadata(element):
     """Pretty-prints the detailed metadata of a Docling layout element.
@@ -472,4 +3789,802 @@ def print_sample_element_metadata(element):
     if hasattr(element, 'metadata'):
         print(f"Metadata: {element.metadata}")
     if hasattr(element, 'font_info'):
-        print(f"Font Info: {element.font_info}")
\ No newline at end of file
+        print(f"Font Info: {element.font_info}")
+import argparse
+import importlib
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+# Colors for the 11 DocLayNet classes, used for overlays when no other mapping is given.
+DEFAULT_CLASS_COLORS = {
+    "Text": "#A6CEE3",
+    "Title": "#1F78B4",
+    "Section-header": "#B2DF8A",
+    "List-item": "#33A02C",
+    "Figure": "#FB9A99",
+    "Table": "#E31A1C",
+    "Caption": "#FDBF6F",
+    "Formula": "#FF7F00",
+    "Page-header": "#CAB2D6",
+    "Page-footer": "#6A3D9A",
+    "Footnote": "#FFFF99",
+}
+
+import uuid
+from urllib.parse import quote
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow).")
+
+def element_arrow_schema():
+    """Arrow schema of the element rows written by ParquetElementExporter (one row per element)."""
+    _require_pyarrow()
+    return pa.schema([
+        ('document_id', pa.dictionary(pa.int32(), pa.string())),
+        ('page', pa.int32()),
+        ('element_index', pa.int32()),
+        ('class', pa.dictionary(pa.int16(), pa.string())),
+        ('x0', pa.float32()),
+        ('y0', pa.float32()),
+        ('x1', pa.float32()),
+        ('y1', pa.float32()),
+        ('confidence', pa.float32()),
+        ('text_content', pa.large_string()),
+    ])
+
+def _store_to_arrow(document_id, store, page_numbers=None):
+    """
+    Builds the Arrow table of a LayoutElementStore straight from its NumPy arrays and text buffer,
+    without creating a Python object per element. page_numbers are the original numbers of the
+    store's pages (1..N by default).
+    """
+    num_elements = len(store)
+    page_sizes = np.diff(store.page_offsets)
+    if page_numbers is None:
+        page_numbers = np.arange(1, store.num_pages + 1)
+    pages = np.repeat(np.asarray(page_numbers, dtype=np.int32), page_sizes)
+    element_index = (np.arange(num_elements, dtype=np.int64) - np.repeat(store.page_offsets[:-1], page_sizes)).astype(np.int32)
+    text = pa.LargeStringArray.from_buffers(
+        num_elements, pa.py_buffer(store._text_offsets), pa.py_buffer(store._text_buffer))
+    return pa.Table.from_arrays([
+        pa.DictionaryArray.from_arrays(pa.array(np.zeros(num_elements, dtype=np.int32)), pa.array([document_id], pa.string())),
+        pa.array(pages),
+        pa.array(element_index),
+        pa.DictionaryArray.from_arrays(pa.array(store.class_codes), pa.array(store.class_names, pa.string())),
+        pa.array(np.ascontiguousarray(store.bboxes[:, 0])),
+        pa.array(np.ascontiguousarray(store.bboxes[:, 1])),
+        pa.array(np.ascontiguousarray(store.bboxes[:, 2])),
+        pa.array(np.ascontiguousarray(store.bboxes[:, 3])),
+        pa.array(store.confidences, mask=np.isnan(store.confidences)),
+        text,
+    ], schema=element_arrow_schema())
+
+class ParquetElementExporter:
+    """
+    Streams the layout elements of many documents into a hive-partitioned Parquet dataset with
+    one row per element: document_id, page (1-based), element_index, class, x0/y0/x1/y1,
+    confidence (null when unknown) and text_content.
+
+    Rows are buffered per partition and written as a row group whenever a partition holds
+    row_group_size rows. Across all partitions at most max_buffered_rows rows are held: beyond
+    that the largest buffers are written out early, as smaller row groups. At most max_open_files
+    partition files are kept open; the least recently written one is closed when another is needed,
+    and a partition written to again gets a new file. Memory therefore stays flat no matter how
+    many documents or partitions the corpus has. Files are named e.g.
+    root_dir/class=Table/part-<run>-<n>.parquet; several exporters can write into the same root.
+
+    Read the dataset back with read_elements_parquet, which prunes partitions and skips row groups
+    using their statistics, e.g. filters=[('class', '=', 'Table'), ('confidence', '<', 0.5)].
+
+    Arguments:
+      root_dir (str): Dataset directory. Created if missing.
+      partition_by (tuple[str]): Columns to partition by; () writes a single file. Defaults to
+                                 ('class',). Partitioning by 'document_id' gives one small file per
+                                 document, which is only worth it for few, large documents.
+      row_group_size (int): Rows per Parquet row group. Defaults to 65536.
+      compression (str): Parquet compression codec. Defaults to 'zstd'.
+      max_buffered_rows (int): Rows buffered across all partitions. Defaults to 4 * row_group_size.
+      max_open_files (int): Partition files kept open at once. Defaults to 64.
+
+    Raises:
+      ImportError: If pyarrow is not installed.
+      ValueError: If partition_by names an unknown column, or row_group_size, max_buffered_rows
+                  or max_open_files is smaller than 1.
+    """
+
+    def __init__(self, root_dir, partition_by=('class',), row_group_size=65536, compression='zstd',
+                 max_buffered_rows=None, max_open_files=64):
+        _require_pyarrow()
+        schema = element_arrow_schema()
+        partition_by = tuple(partition_by)
+        unknown = [name for name in partition_by if name not in schema.names]
+        if unknown:
+            raise ValueError(f"Unknown partition columns: {unknown}")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be a positive integer.")
+        if max_buffered_rows is None:
+            max_buffered_rows = 4 * row_group_size
+        if max_buffered_rows < 1 or max_open_files < 1:
+            raise ValueError("max_buffered_rows and max_open_files must be positive integers.")
+        self.root_dir = root_dir
+        self.partition_by = partition_by
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.max_buffered_rows = max_buffered_rows
+        self.max_open_files = max_open_files
+        # Partition columns are encoded in the directory names, not stored in the files.
+        self._file_schema = pa.schema([field for field in schema if field.name not in partition_by])
+        self._run_id = uuid.uuid4().hex[:12]
+        self._buffers = {}   # partition values -> list of pending tables
+        self._buffered = {}  # partition values -> pending row count
+        self._buffered_total = 0
+        self._writers = OrderedDict()  # partition values -> open pq.ParquetWriter, least recently written first
+        self._files = {}     # partition values -> number of files written
+        self.rows_written = 0
+        self.documents = 0
+        os.makedirs(root_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_document(self, document_id, elements, page_numbers=None):
+        """
+        Adds the elements of one document.
+
+        Arguments:
+          document_id (str): Identifier stored in every row of the document.
+          elements: A LayoutElementStore, a Docling result or LazyPageSequence (their pages'
+                    element_groups are used, nothing is rendered) or the (page_image, elements)
+                    list returned by extract_page_images_and_elements.
+          page_numbers (sequence[int], optional): Original page numbers of a LayoutElementStore
+                    built from a page subset. Other inputs carry their own (see page_numbers_of).
+        """
+        if isinstance(elements, LayoutElementStore):
+            store = elements
+        elif isinstance(elements, LazyPageSequence):
+            # Read the element groups from the page handles so no page gets rendered.
+            store = LayoutElementStore.from_pages(page.element_groups for page in elements._pages)
+        elif hasattr(elements, 'pages'):
+            store = LayoutElementStore.from_docling_result(elements)
+        else:
+            store = LayoutElementStore.from_pages(page_elements for _, page_elements in elements)
+        if not isinstance(elements, LayoutElementStore):
+            page_numbers = page_numbers_of(elements)
+        self.documents += 1
+        if len(store) == 0:
+            return
+        table = _store_to_arrow(document_id, store, page_numbers)
+
+        if not self.partition_by:
+            self._append((), table)
+            return
+        # Group rows by their partition values with NumPy instead of per row.
+        codes, values = [], []
+        for name in self.partition_by:
+            column = table.column(name).combine_chunks()
+            if isinstance(column.type, pa.DictionaryType):
+                codes.append(column.indices.to_numpy(zero_copy_only=False))
+                values.append(column.dictionary.to_pylist())
+            else:
+                column_values, column_codes = np.unique(column.to_numpy(zero_copy_only=False), return_inverse=True)
+                codes.append(column_codes.reshape(-1))
+                values.append(column_values.tolist())
+        keys, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        file_table = table.drop_columns(list(self.partition_by))
+        for key_index, key in enumerate(keys):
+            partition = tuple(values[column][code] for column, code in enumerate(key))
+            self._append(partition, file_table.filter(pa.array(inverse == key_index)))
+
+    def _append(self, partition, table):
+        if not self.partition_by:
+            table = table.select(self._file_schema.names)
+        self._buffers.setdefault(partition, []).append(table)
+        self._buffered[partition] = self._buffered.get(partition, 0) + table.num_rows
+        self._buffered_total += table.num_rows
+        if self._buffered[partition] >= self.row_group_size:
+            self._flush(partition)
+        while self._buffered_total > self.max_buffered_rows:
+            self._flush(max(self._buffered, key=self._buffered.get))
+
+    def _flush(self, partition):
+        tables = self._buffers.pop(partition, None)
+        self._buffered_total -= self._buffered.pop(partition, 0)
+        if not tables:
+            return
+        writer = self._writers.get(partition)
+        if writer is None:
+            while len(self._writers) >= self.max_open_files:
+                self._writers.popitem(last=False)[1].close()
+            directory = os.path.join(self.root_dir, *(
+                f"{name}={quote(str(value), safe='')}" for name, value in zip(self.partition_by, partition)))
+            os.makedirs(directory, exist_ok=True)
+            file_number = self._files[partition] = self._files.get(partition, 0) + 1
+            path = os.path.join(directory, f"part-{self._run_id}-{file_number}.parquet")
+            writer = self._writers[partition] = pq.ParquetWriter(path, self._file_schema, compression=self.compression)
+        else:
+            self._writers.move_to_end(partition)
+        table = pa.concat_tables(tables).cast(self._file_schema)
+        writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += table.num_rows
+
+    def close(self):
+        """Writes the remaining buffered rows and closes every file."""
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+def read_elements_parquet(root_dir, columns=None, filters=None):
+    """
+    Reads elements written by ParquetElementExporter into a pyarrow.Table.
+
+    Filters on partition columns prune whole directories, and filters on other columns skip
+    row groups whose statistics cannot match, before any data is decoded. For example, all
+    Tables with confidence below 0.5:
+
+      read_elements_parquet(root, filters=[('class', '=', 'Table'), ('confidence', '<', 0.5)])
+
+    Arguments:
+      root_dir (str): Dataset directory.
+      columns (list[str], optional): Columns to read. Defaults to all.
+      filters (list, optional): pyarrow filter expression in DNF list form.
+
+    Raises:
+      ImportError: If pyarrow is not installed.
+    """
+    _require_pyarrow()
+    return pq.read_table(root_dir, columns=columns, filters=filters, partitioning='hive')
+
+PROGRESS_FILE_NAME = 'progress.jsonl'
+# run_batch moves its staged Parquet files into the dataset, and journals their documents, this often.
+PARQUET_COMMIT_DOCUMENTS = 256
+
+def _collect_pdf_sources(inputs, recursive=False):
+    """
+    Expands CLI inputs into a sorted, de-duplicated list of sources. Directories contribute
+    their '*.pdf' files (recursively if requested); files and 'http(s)://' URLs are kept as is.
+    """
+    sources = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith('.pdf'))
+                if not recursive:
+                    break
+        else:
+            sources.append(item)
+    return list(dict.fromkeys(sources))
+
+def _document_id(source):
+    """A file-name-safe, stable identifier for a source: its readable stem plus a short hash."""
+    source = str(source)
+    if not source.lower().startswith(('http://', 'https://')):
+        source = os.path.abspath(source)
+    stem = os.path.splitext(os.path.basename(source.rstrip('/')))[0] or 'document'
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', stem)[:64]
+    return f"{stem}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]}"
+
+def _element_records(document_id, source, pages):
+    """Yields one flat record per layout element of a converted document, by original page number."""
+    for page_number, (_, elements) in zip(page_numbers_of(pages), pages):
+        for element_index, element in enumerate(elements):
+            record = _serialize_element(element)
+            x0, y0, x1, y1 = record.pop('bbox')
+            yield {
+                'document_id': document_id,
+                'source': str(source),
+                'page': page_number,
+                'element_index': element_index,
+                **record,
+                'x0': x0, 'y0': y0, 'x1': x1, 'y1': y1,
+            }
+
+def _write_element_records(path, records):
+    """Writes element records to path atomically as JSON lines."""
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _write_overlays(directory, pages, class_colors):
+    """Saves one PNG per page with every colored class outlined by draw_bounding_boxes."""
+    os.makedirs(directory, exist_ok=True)
+    visible_classes = list(class_colors)
+    for page_number, (page_image, elements) in zip(page_numbers_of(pages), pages):
+        if page_image is None:
+            continue
+        overlay = draw_bounding_boxes(page_image, elements, visible_classes, class_colors)
+        overlay.save(os.path.join(directory, f"page_{page_number:04d}.png"))
+
+def _commit_parquet_stage(staging_dir, elements_dir):
+    """Moves the files of a closed ParquetElementExporter from staging_dir into the dataset at elements_dir."""
+    for root, _, files in os.walk(staging_dir):
+        target = os.path.join(elements_dir, os.path.relpath(root, staging_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            os.replace(os.path.join(root, name), os.path.join(target, name))
+    shutil.rmtree(staging_dir)
+
+def _read_progress(path):
+    """Returns source -> last progress record from a progress journal, ignoring a torn last line."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record['source']] = record
+    return done
+
+def run_batch(inputs, output_dir, output_format='jsonl', overlays=False, max_workers=None,
+              converter_factory=initialize_docling_converter, cache=None, recursive=False,
+              class_colors=None, log=print, precheck=False):
+    """
+    Headless batch conversion: loads, converts and extracts every input PDF over a pool of worker
+    processes (see convert_documents_batch) and writes the results to output_dir:
+
+      elements/<document_id>.jsonl             one record per layout element (jsonl)
+      elements/class=<class>/part-*.parquet    a ParquetElementExporter dataset (parquet)
+      overlays/<document_id>/page_NNNN.png     if overlays is True
+      progress.jsonl                           one line per finished document
+
+    Progress is resumable: documents already recorded as converted in progress.jsonl are skipped
+    on the next run, while failed ones are tried again. Every output file is written atomically,
+    so an interrupted run never leaves a partial document behind. Parquet rows go through one
+    ParquetElementExporter, which bounds buffered rows and open files; its files are staged in a
+    hidden directory and moved into the dataset every PARQUET_COMMIT_DOCUMENTS documents, and only
+    then are those documents recorded as converted.
+
+    Arguments:
+      inputs (list[str]): Directories (their '*.pdf' files), PDF file paths and 'http(s)://' URLs.
+      output_dir (str): Directory receiving the results. Created if missing.
+      output_format (str): 'jsonl' or 'parquet' (requires pyarrow). Defaults to 'jsonl'.
+      overlays (bool): Also save overlay PNGs drawn by draw_bounding_boxes. Defaults to False.
+      max_workers (int, optional): Number of worker processes. Defaults to os.cpu_count().
+      converter_factory (callable): Picklable zero-argument callable returning a converter.
+      cache (DoclingResultCache, optional): Result cache shared by all workers.
+      recursive (bool): Search input directories recursively. Defaults to False.
+      class_colors (dict[str, str], optional): Overlay colors. Defaults to DEFAULT_CLASS_COLORS.
+      log (callable): Receives one progress line per document. Defaults to print.
+      precheck (bool): Reject structurally broken PDFs (truncated, bad cross-reference offset)
+                       with precheck_pdf before converting them. Defaults to False.
+
+    Output:
+      dict: 'documents', 'pages', 'elements', 'failed', 'skipped', 'seconds', 'docs_per_sec'
+      and 'pages_per_sec' for the documents converted in this run.
+
+    Raises:
+      ValueError: If output_format is not 'jsonl' or 'parquet'.
+      ImportError: If output_format is 'parquet' and pyarrow is not installed.
+    """
+    if output_format not in ('jsonl', 'parquet'):
+        raise ValueError("output_format must be 'jsonl' or 'parquet'.")
+    if output_format == 'parquet' and pa is None:
+        raise ImportError("Parquet output requires pyarrow (pip install pyarrow).")
+    class_colors = class_colors or DEFAULT_CLASS_COLORS
+
+    elements_dir = os.path.join(output_dir, 'elements')
+    overlays_dir = os.path.join(output_dir, 'overlays')
+    os.makedirs(elements_dir, exist_ok=True)
+    progress_path = os.path.join(output_dir, PROGRESS_FILE_NAME)
+    progress = _read_progress(progress_path)
+
+    sources = _collect_pdf_sources(inputs, recursive=recursive)
+    todo = [source for source in sources if progress.get(source, {}).get('status') != 'ok']
+    summary = {'documents': 0, 'pages': 0, 'elements': 0, 'failed': 0, 'skipped': len(sources) - len(todo)}
+
+    exporter = staging_dir = None
+    staged = []  # Progress records of documents whose Parquet rows are not committed yet
+    if output_format == 'parquet':
+        for name in os.listdir(elements_dir):
+            if name.startswith('.staging-'):  # Left behind by an interrupted run
+                shutil.rmtree(os.path.join(elements_dir, name), ignore_errors=True)
+
+    def commit_parquet():
+        nonlocal exporter
+        exporter.close()
+        exporter = None
+        _commit_parquet_stage(staging_dir, elements_dir)
+        for staged_record in staged:
+            progress_file.write(json.dumps(staged_record) + '\n')
+        progress_file.flush()
+        staged.clear()
+
+    started = time.perf_counter()
+    with open(progress_path, 'a', encoding='utf-8') as progress_file:
+        results = convert_documents_batch(todo, max_workers=max_workers, converter_factory=converter_factory,
+                                          render_pages=overlays, cache=cache, precheck=precheck)
+        for result in results:
+            document_id = _document_id(result.source)
+            record = {'source': result.source, 'document_id': document_id}
+            if result.error is None:
+                try:
+                    if exporter is None and output_format == 'parquet':
+                        staging_dir = os.path.join(elements_dir, f".staging-{uuid.uuid4().hex[:12]}")
+                        exporter = ParquetElementExporter(staging_dir)
+                    if exporter is not None:
+                        exporter.add_document(document_id, result.pages)
+                        num_elements = sum(len(elements) for _, elements in result.pages)
+                    else:
+                        records = list(_element_records(document_id, result.source, result.pages))
+                        _write_element_records(os.path.join(elements_dir, f"{document_id}.jsonl"), records)
+                        num_elements = len(records)
+                    if overlays:
+                        _write_overlays(os.path.join(overlays_dir, document_id), result.pages, class_colors)
+                except Exception as e:
+                    record.update(status='failed', error_type=type(e).__name__, error=str(e))
+                else:
+                    record.update(status='ok', pages=len(result.pages), elements=num_elements)
+                    summary['pages'] += len(result.pages)
+                    summary['elements'] += num_elements
+            else:
+                record.update(status='failed', error_type=result.error_type, error=result.error)
+            summary['documents'] += 1
+            summary['failed'] += record['status'] == 'failed'
+            if exporter is not None and record['status'] == 'ok':
+                staged.append(record)
+                if len(staged) >= PARQUET_COMMIT_DOCUMENTS:
+                    commit_parquet()
+            else:
+                progress_file.write(json.dumps(record) + '\n')
+                progress_file.flush()
+            if log is not None:
+                detail = f"{record['pages']} pages" if record['status'] == 'ok' else f"{record['error_type']}: {record['error']}"
+                log(f"[{summary['documents']}/{len(todo)}] {record['status']} {result.source} ({detail})")
+        if exporter is not None:
+            commit_parquet()
+
+    seconds = time.perf_counter() - started
+    summary['seconds'] = seconds
+    summary['docs_per_sec'] = summary['documents'] / seconds if seconds > 0 else 0.0
+    summary['pages_per_sec'] = summary['pages'] / seconds if seconds > 0 else 0.0
+    return summary
+
+def _import_callable(spec):
+    """Resolves a 'module:attribute' string to the object it names."""
+    module_name, _, attribute = spec.partition(':')
+    if not module_name or not attribute:
+        raise argparse.ArgumentTypeError(f"expected 'module:callable', got {spec!r}")
+    try:
+        return getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise argparse.ArgumentTypeError(f"cannot import {spec!r}: {e}")
+
+def main(argv=None):
+    """
+    Command-line entry point for run_batch. Returns the process exit status:
+    0 if every document was converted, 1 if any failed.
+
+    Example:
+      python definitions.py papers/ extra.pdf -o results --format jsonl --overlays --workers 4
+    """
+    parser = argparse.ArgumentParser(
+        description="Run Docling layout analysis on PDFs and write element records (and overlays) to disk.")
+    parser.add_argument('inputs', nargs='+', help="PDF files, directories of PDFs, or http(s) URLs.")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directory for results and progress.")
+    parser.add_argument('--format', dest='output_format', choices=('jsonl', 'parquet'), default='jsonl',
+                        help="Element record format: a .jsonl file per document, or a Parquet dataset "
+                             "partitioned by class (default: jsonl).")
+    parser.add_argument('--overlays', action='store_true', help="Also save overlay PNGs per page.")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Search input directories recursively.")
+    parser.add_argument('--cache-dir', default=None, help="Reuse conversions through a DoclingResultCache here.")
+    parser.add_argument('--converter', type=_import_callable, default='docling.document_converter:DocumentConverter',
+                        help="Converter factory as 'module:callable' (default: %(default)s).")
+    parser.add_argument('--precheck', action='store_true',
+                        help="Skip truncated or corrupt PDFs with a fast structure check.")
+    args = parser.parse_args(argv)
+
+    cache = DoclingResultCache(args.cache_dir) if args.cache_dir else None
+    summary = run_batch(args.inputs, args.output_dir, output_format=args.output_format, overlays=args.overlays,
+                        max_workers=args.workers, converter_factory=args.converter, cache=cache,
+                        recursive=args.recursive, precheck=args.precheck)
+    print(f"Converted {summary['documents']} documents ({summary['pages']} pages, {summary['elements']} elements) "
+          f"in {summary['seconds']:.1f} s: {summary['docs_per_sec']:.2f} docs/sec, "
+          f"{summary['pages_per_sec']:.2f} pages/sec; {summary['failed']} failed, "
+          f"{summary['skipped']} already done.")
+    return 1 if summary['failed'] else 0
+
+import platform
+import statistics
+
+# Benchmark suite for the inspector's hot paths. Every case runs on synthetic pages and a stub
+# converter, so no Docling model, notebook kernel or network is involved.
+BENCHMARK_ELEMENT_COUNTS = (10, 100, 1000, 10000, 50000)
+BENCHMARK_PAGE_COUNTS = (1, 10, 100, 500, 2000)
+BENCHMARK_RESULTS_VERSION = 1
+
+class _BenchmarkPage:
+    """Stub Docling page whose render() returns a small blank image."""
+
+    def __init__(self, elements, render_size):
+        self.element_groups = elements
+        self._render_size = render_size
+
+    def render(self):
+        return Image.new('RGB', self._render_size, 'white')
+
+class _BenchmarkConverter:
+    """Stub converter producing num_pages stub pages with elements_per_page elements each."""
+
+    def __init__(self, num_pages, elements_per_page=20, render_size=(85, 110)):
+        _, elements = _synthetic_page(elements_per_page, render_size)
+        self.result = types.SimpleNamespace(pages=[_BenchmarkPage(elements, render_size) for _ in range(num_pages)])
+
+    def convert_single(self, pdf_bytes):
+        return self.result
+
+class _NullOutput:
+    """Stand-in for an ipywidgets.Output: a reusable context manager that swallows clear_output()."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def clear_output(self, wait=False):
+        pass
+
+@contextmanager
+def _swapped_globals(**values):
+    """Temporarily rebinds module globals (the viewer state used by update_display and on_image_click)."""
+    missing = object()
+    module_globals = globals()
+    saved = {name: module_globals.get(name, missing) for name in values}
+    module_globals.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is missing:
+                module_globals.pop(name, None)
+            else:
+                module_globals[name] = value
+
+def _time_case(function, repeats, number=1, calls=1):
+    """
+    Returns the best and median milliseconds per operation over repeats runs of number calls,
+    where each call of function performs calls operations.
+    """
+    timings = [seconds * 1000 / (number * calls) for seconds in timeit.repeat(function, number=number, repeat=repeats)]
+    return {'best_ms': min(timings), 'median_ms': statistics.median(timings), 'repeats': repeats}
+
+def _bench_draw_bounding_boxes(num_elements, repeats):
+    image, elements = _synthetic_page(num_elements, seed=num_elements)
+    visible_classes = ['Text', 'Title', 'Table']
+    return _time_case(lambda: draw_bounding_boxes(image, elements, visible_classes, DEFAULT_CLASS_COLORS), repeats)
+
+def _bench_on_image_click(num_elements, repeats, clicks=1000):
+    image, elements = _synthetic_page(num_elements, seed=num_elements)
+    rng = random.Random(num_elements)
+    events = [types.SimpleNamespace(xdata=rng.uniform(0, image.width), ydata=rng.uniform(0, image.height))
+              for _ in range(clicks)]
+
+    def click_all():
+        for event in events:
+            on_image_click(event)
+
+    with _swapped_globals(current_elements=elements, metadata_output=_NullOutput(),
+                          display_element_metadata=lambda element: None):
+        get_spatial_index(elements)  # Time the clicks, not the one-off index build.
+        return _time_case(click_all, repeats, calls=clicks)
+
+def _bench_update_display(num_elements, repeats, toggles=10):
+    page = _synthetic_page(num_elements, seed=num_elements)
+    classes = ['Text', 'Title', 'Table', 'Figure']
+    flags = [{name: name != classes[i % len(classes)] for name in classes} for i in range(toggles)]
+    state = {'step': 0}
+
+    def toggle():
+        update_display(0, flags[state['step'] % toggles])
+        state['step'] += 1
+
+    with _swapped_globals(all_pages_data=[page], class_colors=DEFAULT_CLASS_COLORS,
+                          image_output=_NullOutput(), clear_output=lambda wait=False: None):
+        _display_state.clear()
+        toggle()  # The first call composites the whole page; the timed calls are class toggles.
+        try:
+            return _time_case(toggle, repeats, number=toggles)
+        finally:
+            _display_state.clear()
+
+def _bench_extract_page_images_and_elements(num_pages, repeats):
+    docling_result = process_pdf_with_docling(_BenchmarkConverter(num_pages), _blank_pdf_bytes(num_pages))
+    return _time_case(lambda: extract_page_images_and_elements(docling_result), repeats)
+
+def _bench_load_pdf_document(num_pages, repeats):
+    pdf_bytes = _blank_pdf_bytes(num_pages)
+    return _time_case(lambda: load_pdf_document('upload', pdf_bytes), repeats, number=10)
+
+# name -> (size parameter, benchmark function); the size values come from the suite arguments.
+BENCHMARKS = {
+    'draw_bounding_boxes': ('elements', _bench_draw_bounding_boxes),
+    'on_image_click': ('elements', _bench_on_image_click),
+    'update_display': ('elements', _bench_update_display),
+    'extract_page_images_and_elements': ('pages', _bench_extract_page_images_and_elements),
+    'load_pdf_document': ('pages', _bench_load_pdf_document),
+}
+
+def _benchmark_case_name(benchmark, size_name, size):
+    return f"{benchmark}[{size_name}={size}]"
+
+def run_benchmark_suite(element_counts=BENCHMARK_ELEMENT_COUNTS, page_counts=BENCHMARK_PAGE_COUNTS, repeats=5,
+                        benchmarks=None, output_path=None, log=print):
+    """
+    Times the inspector's hot paths on synthetic data: draw_bounding_boxes, on_image_click hit
+    testing and update_display class toggles across element_counts, and
+    extract_page_images_and_elements and load_pdf_document across page_counts.
+
+    Arguments:
+      element_counts (iterable[int]): Elements per page for the per-page benchmarks.
+      page_counts (iterable[int]): Pages per document for the per-document benchmarks.
+      repeats (int): Timing runs per case; best and median are reported. Defaults to 5.
+      benchmarks (iterable[str], optional): Names from BENCHMARKS to run. Defaults to all.
+      output_path (str, optional): If given, the results are also written there as JSON.
+      log (callable or None): Receives one progress line per case. Defaults to print.
+
+    Output:
+      dict: {'version', 'created', 'python', 'platform', 'machine', 'results'}, where 'results' maps
+      case names such as 'draw_bounding_boxes[elements=1000]' to {'benchmark', 'params', 'best_ms',
+      'median_ms', 'repeats'}. Times are per operation (per call, per click or per toggle).
+
+    Raises:
+      ValueError: If benchmarks names an unknown benchmark or repeats is smaller than 1.
+    """
+    names = list(BENCHMARKS) if benchmarks is None else list(benchmarks)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {unknown}. Available: {list(BENCHMARKS)}")
+    if repeats < 1:
+        raise ValueError("repeats must be a positive integer.")
+    sizes = {'elements': list(element_counts), 'pages': list(page_counts)}
+
+    results = {}
+    for name in names:
+        size_name, function = BENCHMARKS[name]
+        for size in sizes[size_name]:
+            case = _benchmark_case_name(name, size_name, size)
+            results[case] = {'benchmark': name, 'params': {size_name: size}, **function(size, repeats)}
+            if log is not None:
+                log(f"{case}: best {results[case]['best_ms']:.3f} ms, median {results[case]['median_ms']:.3f} ms")
+
+    report = {
+        'version': BENCHMARK_RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if output_path is not None:
+        save_benchmark_results(report, output_path)
+    return report
+
+def save_benchmark_results(report, path):
+    """Writes a run_benchmark_suite report to path as JSON, atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def load_benchmark_results(path):
+    """Reads a report written by save_benchmark_results."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare_benchmark_results(baseline, current, tolerance=0.25, min_delta_ms=0.001):
+    """
+    Compares two benchmark reports case by case on their best times.
+
+    A case is a 'regression' if it got more than tolerance (as a fraction) slower and the slowdown
+    is also larger than min_delta_ms, which keeps timer noise on sub-microsecond cases from being
+    flagged; it is an 'improvement' under the mirrored condition and 'ok' otherwise. Cases present
+    in only one report are 'new' or 'missing'.
+
+    Arguments:
+      baseline (dict or str): The stored baseline report, or the path of its JSON file.
+      current (dict or str): The report to check, or the path of its JSON file.
+      tolerance (float): Allowed relative slowdown. Defaults to 0.25 (25 %).
+      min_delta_ms (float): Minimum absolute change in milliseconds to count. Defaults to 0.001.
+
+    Output:
+      list[dict]: One entry per case, sorted by name, with 'case', 'status', 'baseline_ms',
+      'current_ms' and 'ratio' (current / baseline, None if either side is missing).
+    """
+    if isinstance(baseline, str):
+        baseline = load_benchmark_results(baseline)
+    if isinstance(current, str):
+        current = load_benchmark_results(current)
+    baseline_results, current_results = baseline['results'], current['results']
+
+    comparison = []
+    for case in sorted(set(baseline_results) | set(current_results)):
+        baseline_ms = baseline_results[case]['best_ms'] if case in baseline_results else None
+        current_ms = current_results[case]['best_ms'] if case in current_results else None
+        ratio = None
+        if baseline_ms is None:
+            status = 'new'
+        elif current_ms is None:
+            status = 'missing'
+        else:
+            ratio = current_ms / baseline_ms if baseline_ms > 0 else float('inf')
+            delta_ms = current_ms - baseline_ms
+            if ratio > 1 + tolerance and delta_ms > min_delta_ms:
+                status = 'regression'
+            elif ratio < 1 / (1 + tolerance) and -delta_ms > min_delta_ms:
+                status = 'improvement'
+            else:
+                status = 'ok'
+        comparison.append({'case': case, 'status': status, 'baseline_ms': baseline_ms,
+                           'current_ms': current_ms, 'ratio': ratio})
+    return comparison
+
+def benchmark_main(argv=None):
+    """
+    Command-line entry point for the benchmark suite. Runs the suite, optionally saves the results
+    and compares them with a baseline. Returns 1 if any case regressed, 0 otherwise.
+
+    Example:
+      python definitions/definitions.py bench -o bench.json --baseline baseline.json
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the layout inspector's hot paths on synthetic data.")
+    parser.add_argument('-o', '--output', default=None, help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', default=None, help="Compare against this stored results file.")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative slowdown flagged as a regression (default: %(default)s).")
+    parser.add_argument('--repeats', type=int, default=5, help="Timing runs per case (default: %(default)s).")
+    parser.add_argument('--elements', type=int, nargs='+', default=list(BENCHMARK_ELEMENT_COUNTS),
+                        help="Element counts per page (default: %(default)s).")
+    parser.add_argument('--pages', type=int, nargs='+', default=list(BENCHMARK_PAGE_COUNTS),
+                        help="Page counts per document (default: %(default)s).")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None, help="Run only these benchmarks.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark_suite(args.elements, args.pages, repeats=args.repeats, benchmarks=args.only,
+                                 output_path=args.output)
+    if args.baseline is None:
+        return 0
+    comparison = compare_benchmark_results(args.baseline, report, tolerance=args.tolerance)
+    regressions = [entry for entry in comparison if entry['status'] == 'regression']
+    for entry in comparison:
+        if entry['status'] in ('regression', 'improvement'):
+            print(f"{entry['status'].upper()}: {entry['case']} {entry['baseline_ms']:.3f} ms -> "
+                  f"{entry['current_ms']:.3f} ms (x{entry['ratio']:.2f})")
+    print(f"{len(regressions)} regressions in {len(comparison)} cases (tolerance {args.tolerance:.0%}).")
+    return 1 if regressions else 0
+
+def cli(argv=None):
+    """
+    Script entry point: 'bench' as the first argument runs benchmark_main on the remaining
+    arguments, anything else runs the batch conversion main.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        return benchmark_main(argv[1:])
+    return main(argv)
+
+if __name__ == '__main__':
+    sys.exit(cli())
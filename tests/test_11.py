@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import Mock, MagicMock
+from PIL import Image as PIL_Image
+
+# definition_3f1c9a7e52b84d0c9e6a1d27b8c4f015 block
+from definition_3f1c9a7e52b84d0c9e6a1d27b8c4f015 import LazyPageSequence, extract_page_images_and_elements
+# end definition_3f1c9a7e52b84d0c9e6a1d27b8c4f015 block
+
+# Helper function to create mock page objects whose render() calls can be counted
+def create_mock_page(num_elements=1, render_fail=False):
+    page = Mock()
+    if render_fail:
+        page.render.side_effect = RuntimeError("Simulated page render failure")
+    else:
+        page.render.side_effect = lambda: MagicMock(spec=PIL_Image.Image)
+    page.element_groups = [Mock() for _ in range(num_elements)]
+    return page
+
+def create_mock_docling_result(num_pages, fail_at=None):
+    docling_result = Mock()
+    docling_result.pages = [create_mock_page(render_fail=(i == fail_at)) for i in range(num_pages)]
+    return docling_result
+
+def test_lazy_sequence_renders_nothing_up_front():
+    docling_result = create_mock_docling_result(5)
+    pages = extract_page_images_and_elements(docling_result, lazy=True)
+
+    assert isinstance(pages, LazyPageSequence)
+    assert len(pages) == 5
+    for page in docling_result.pages:
+        page.render.assert_not_called()
+
+def test_lazy_sequence_renders_on_access_and_reuses_cached_image():
+    docling_result = create_mock_docling_result(3)
+    pages = LazyPageSequence(docling_result)
+
+    image, elements = pages[1]
+    again, _ = pages[1]
+
+    assert image is again
+    assert elements is docling_result.pages[1].element_groups
+    assert docling_result.pages[1].render.call_count == 1
+    docling_result.pages[0].render.assert_not_called()
+
+def test_lazy_sequence_evicts_least_recently_used_page():
+    docling_result = create_mock_docling_result(4)
+    pages = LazyPageSequence(docling_result, max_cached_pages=2)
+
+    pages[0]
+    pages[1]
+    pages[0]  # Page 0 becomes most recently used
+    pages[2]  # Evicts page 1
+
+    assert pages.is_rendered(0)
+    assert not pages.is_rendered(1)
+    assert pages.is_rendered(2)
+
+def test_lazy_sequence_release_drops_rendered_images():
+    docling_result = create_mock_docling_result(2)
+    pages = LazyPageSequence(docling_result)
+    pages[0]
+    pages[1]
+
+    pages.release(0)
+    assert not pages.is_rendered(0)
+    assert pages.is_rendered(1)
+
+    pages.release()
+    assert not pages.is_rendered(1)
+
+@pytest.mark.parametrize("index, expected", [
+    (-1, 2),          # Negative indices count from the end
+    (3, IndexError),  # Out of range
+    (-4, IndexError), # Out of range from the end
+])
+def test_lazy_sequence_indexing(index, expected):
+    docling_result = create_mock_docling_result(3)
+    pages = LazyPageSequence(docling_result)
+
+    if isinstance(expected, type) and issubclass(expected, Exception):
+        with pytest.raises(expected):
+            pages[index]
+    else:
+        _, elements = pages[index]
+        assert elements is docling_result.pages[expected].element_groups
+
+def test_lazy_sequence_iteration_and_slicing():
+    docling_result = create_mock_docling_result(4)
+    pages = LazyPageSequence(docling_result)
+
+    assert len(list(pages)) == 4
+    assert len(pages[1:3]) == 2
+
+def test_lazy_sequence_propagates_render_error_on_access():
+    docling_result = create_mock_docling_result(2, fail_at=1)
+    pages = LazyPageSequence(docling_result)
+
+    pages[0]
+    with pytest.raises(RuntimeError):
+        pages[1]
+
+def test_lazy_sequence_invalid_docling_result():
+    with pytest.raises(AttributeError):
+        LazyPageSequence(None)
@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import Mock
+from PIL import Image as PIL_Image
+
+# definition_8b2e4d6f1a9c4e3b8d7f0a5c2e1b9d46 block
+from definition_8b2e4d6f1a9c4e3b8d7f0a5c2e1b9d46 import (
+    DoclingResultCache, create_interactive_viewer, extract_page_images_and_elements, process_pdf_with_docling,
+)
+# end definition_8b2e4d6f1a9c4e3b8d7f0a5c2e1b9d46 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+
+class MockElement:
+    def __init__(self, bbox, class_name, text_content, confidence):
+        self.bbox = bbox
+        setattr(self, 'class', class_name)
+        self.text_content = text_content
+        self.confidence = confidence
+
+def create_mock_docling_result(num_pages=2, size=(40, 30)):
+    docling_result = Mock()
+    docling_result.pages = []
+    for page_number in range(num_pages):
+        page = Mock()
+        page.render.return_value = PIL_Image.new('RGB', size, color=(255, page_number * 10, 0))
+        page.element_groups = [MockElement((1, 2, 10, 20), 'Text', f"Page {page_number}", 0.9)]
+        docling_result.pages.append(page)
+    return docling_result
+
+def create_mock_converter(num_pages=2):
+    converter = Mock()
+    converter.convert_single.return_value = create_mock_docling_result(num_pages)
+    return converter
+
+def test_repeat_conversion_is_served_from_cache(tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    converter = create_mock_converter()
+
+    first = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache)
+    second = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache)
+
+    assert converter.convert_single.call_count == 1
+    assert cache.hits == 1 and cache.misses == 1
+    assert len(second.pages) == len(first.pages) == 2
+
+    image = second.pages[1].render()
+    assert image.size == (40, 30)
+    assert image.getpixel((0, 0)) == (255, 10, 0)
+
+    element = second.pages[1].element_groups[0]
+    assert getattr(element, 'class') == 'Text'
+    assert element.bbox == (1.0, 2.0, 10.0, 20.0)
+    assert element.text_content == "Page 1"
+    assert element.confidence == 0.9
+
+def test_cache_hit_is_consumed_by_the_viewer_unchanged(tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    converter = create_mock_converter()
+    process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache)
+    cached = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache)
+    assert cache.hits == 1
+
+    pages = extract_page_images_and_elements(cached)
+    element = pages[0][1][0]
+    assert getattr(element, 'class') == element.class_name == 'Text'
+    assert create_interactive_viewer(pages, {'Text': 'red'}) is not None
+
+def test_cache_key_depends_on_bytes_and_converter_configuration(tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    converter_a = Mock(pipeline_options="ocr=True")
+    converter_b = Mock(pipeline_options="ocr=False")
+
+    key = cache.make_key(VALID_PDF_BYTES, converter_a)
+    assert key == cache.make_key(VALID_PDF_BYTES, converter_a)
+    assert key != cache.make_key(VALID_PDF_BYTES + b' ', converter_a)
+    assert key != cache.make_key(VALID_PDF_BYTES, converter_b)
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    converter = create_mock_converter(num_pages=1)
+    keys = [cache.make_key(VALID_PDF_BYTES + bytes([i]), converter) for i in range(3)]
+
+    cache.put(keys[0], create_mock_docling_result(1))
+    entry_size = cache.size_bytes()
+    cache.max_bytes = entry_size * 2
+
+    cache.put(keys[1], create_mock_docling_result(1))
+    assert cache.get(keys[0]) is not None  # keys[0] becomes most recently used
+    cache.put(keys[2], create_mock_docling_result(1))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.size_bytes() <= cache.max_bytes
+
+def test_failed_render_is_not_cached(tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    docling_result = create_mock_docling_result(2)
+    docling_result.pages[1].render.side_effect = RuntimeError("Simulated page render failure")
+    converter = Mock()
+    converter.convert_single.return_value = docling_result
+
+    result = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache)
+
+    assert result is docling_result
+    assert cache.get(cache.make_key(VALID_PDF_BYTES, converter)) is None
+    assert cache.size_bytes() == 0
+
+def test_invalid_max_bytes():
+    with pytest.raises(ValueError):
+        DoclingResultCache("unused", max_bytes=0)
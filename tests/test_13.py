@@ -0,0 +1,107 @@
+import os
+import time
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_c5a17e3d9f0b42e68a4d1c7b3e9f2a80 block
+from definition_c5a17e3d9f0b42e68a4d1c7b3e9f2a80 import convert_documents_batch
+# end definition_c5a17e3d9f0b42e68a4d1c7b3e9f2a80 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+NON_PDF_BYTES = b'This is some random text, definitely not a PDF document.'
+
+class StubPage:
+    def __init__(self, page_number):
+        self.element_groups = [SimpleNamespace(**{'bbox': (0, 0, 10, 10), 'class': 'Text',
+                                                   'text_content': f"Page {page_number}", 'confidence': 0.9})]
+
+    def render(self):
+        return PIL_Image.new('RGB', (20, 20))
+
+class StubConverter:
+    """Picklable stand-in for DocumentConverter; one page per 100 bytes of input."""
+    instances = 0
+
+    def __init__(self):
+        StubConverter.instances += 1
+        self.instance_id = StubConverter.instances
+
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage(i) for i in range(1 + len(pdf_bytes) // 100)])
+
+def stub_converter_factory():
+    return StubConverter()
+
+def test_batch_converts_all_sources_and_isolates_failures(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(VALID_PDF_BYTES * 5)
+    sources = [VALID_PDF_BYTES, NON_PDF_BYTES, str(pdf_path), str(tmp_path / "missing.pdf")]
+
+    results = list(convert_documents_batch(sources, max_workers=2, converter_factory=stub_converter_factory))
+
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    by_index = {result.index: result for result in results}
+
+    assert by_index[0].error is None
+    assert len(by_index[0].pages) == 1
+    assert len(by_index[2].pages) == 2
+    image, elements = by_index[2].pages[1]
+    assert image is None
+    assert getattr(elements[0], 'class') == 'Text'
+    assert elements[0].text_content == "Page 1"
+
+    assert by_index[1].pages is None
+    assert by_index[1].error_type == 'ValueError'
+    assert by_index[3].error_type == 'FileNotFoundError'
+
+def failing_converter_factory():
+    raise NameError("name 'DocumentConverter' is not defined")
+
+def test_batch_reports_converter_factory_failures():
+    results = list(convert_documents_batch([VALID_PDF_BYTES, VALID_PDF_BYTES], max_workers=1,
+                                           converter_factory=failing_converter_factory, max_attempts=3))
+
+    assert sorted(result.index for result in results) == [0, 1]
+    assert all(result.error_type == 'NameError' for result in results)
+    assert all("DocumentConverter" in result.error for result in results)
+
+class CrashingConverter(StubConverter):
+    """Kills its worker process on inputs containing b'CRASH', like a native crash in the model."""
+
+    def convert_single(self, pdf_bytes):
+        if b'CRASH' in pdf_bytes:
+            os._exit(1)
+        # Slow enough that the other documents are still in flight when the worker dies.
+        time.sleep(0.2)
+        return super().convert_single(pdf_bytes)
+
+def crashing_converter_factory():
+    return CrashingConverter()
+
+def test_batch_worker_crash_only_fails_the_crashing_document():
+    sources = [VALID_PDF_BYTES + bytes([i]) for i in range(5)]
+    sources.insert(2, VALID_PDF_BYTES + b'CRASH')
+    results = list(convert_documents_batch(sources, max_workers=3, converter_factory=crashing_converter_factory,
+                                           max_attempts=2))
+
+    by_index = {result.index: result for result in results}
+    assert sorted(by_index) == list(range(6))
+    assert by_index[2].error_type == 'BrokenProcessPool'
+    assert all(by_index[index].error is None for index in (0, 1, 3, 4, 5))
+
+def test_batch_render_pages_returns_images():
+    results = list(convert_documents_batch([VALID_PDF_BYTES], max_workers=1,
+                                           converter_factory=stub_converter_factory, render_pages=True))
+
+    image, _ = results[0].pages[0]
+    assert isinstance(image, PIL_Image.Image)
+    assert image.size == (20, 20)
+
+def test_batch_empty_sources():
+    assert list(convert_documents_batch([], max_workers=1, converter_factory=stub_converter_factory)) == []
+
+@pytest.mark.parametrize("kwargs", [{'max_workers': 0}, {'max_attempts': 0}])
+def test_batch_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        list(convert_documents_batch([VALID_PDF_BYTES], converter_factory=stub_converter_factory, **kwargs))
@@ -0,0 +1,60 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from PIL import Image as PIL_Image
+
+# definition_4e9b0c2a7d1f43a5b6c8e2d0f7a1b3c9 block
+from definition_4e9b0c2a7d1f43a5b6c8e2d0f7a1b3c9 import extract_page_images_and_elements
+# end definition_4e9b0c2a7d1f43a5b6c8e2d0f7a1b3c9 block
+
+class SlowPage:
+    """Page whose render() takes longer for earlier pages, so completion order differs from page order."""
+    def __init__(self, page_number, num_pages, render_fail=False):
+        self.page_number = page_number
+        self.delay = 0.01 * (num_pages - page_number)
+        self.render_fail = render_fail
+        self.element_groups = [f"element_{page_number}"]
+        self.render_thread = None
+
+    def render(self):
+        time.sleep(self.delay)
+        self.render_thread = threading.get_ident()
+        if self.render_fail:
+            raise RuntimeError("Simulated page render failure")
+        return PIL_Image.new('L', (10, 10), color=self.page_number)
+
+def create_docling_result(num_pages, fail_at=None):
+    docling_result = Mock()
+    docling_result.pages = [SlowPage(i, num_pages, render_fail=(i == fail_at)) for i in range(num_pages)]
+    return docling_result
+
+@pytest.mark.parametrize("executor_type", ['thread', 'process'])
+def test_parallel_extraction_preserves_page_order(executor_type):
+    docling_result = create_docling_result(6)
+
+    result = extract_page_images_and_elements(docling_result, max_workers=3, executor_type=executor_type)
+
+    assert isinstance(result, list)
+    assert len(result) == 6
+    for page_number, (image, elements) in enumerate(result):
+        assert isinstance(image, PIL_Image.Image)
+        assert image.getpixel((0, 0)) == page_number
+        assert elements == [f"element_{page_number}"]
+
+def test_parallel_extraction_uses_multiple_threads():
+    docling_result = create_docling_result(6)
+
+    extract_page_images_and_elements(docling_result, max_workers=3)
+
+    assert len({page.render_thread for page in docling_result.pages}) > 1
+
+def test_parallel_extraction_propagates_render_error():
+    docling_result = create_docling_result(4, fail_at=2)
+
+    with pytest.raises(RuntimeError):
+        extract_page_images_and_elements(docling_result, max_workers=2)
+
+def test_parallel_extraction_invalid_executor_type():
+    with pytest.raises(ValueError):
+        extract_page_images_and_elements(create_docling_result(1), max_workers=2, executor_type='gpu')
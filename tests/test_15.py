@@ -0,0 +1,79 @@
+import mmap
+import pytest
+
+# definition_a71d3e5c8b0f4926a3e4c7d1b5f8e2a6 block
+from definition_a71d3e5c8b0f4926a3e4c7d1b5f8e2a6 import load_pdf_document
+# end definition_a71d3e5c8b0f4926a3e4c7d1b5f8e2a6 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\n' + b'x' * 1000 + b'\n%%EOF'
+NON_PDF_BYTES = b'<html>This is some random text, definitely not a PDF document.</html>' * 10
+
+class MockStreamingResponse:
+    """Mimics a streamed requests.Response and records how many chunks were consumed."""
+    def __init__(self, body, chunk_size=100, headers=None):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.headers = headers or {}
+        self.chunks_served = 0
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.chunks_served += 1
+            yield self.body[start:start + self.chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def test_streaming_download_returns_small_body_in_memory(mocker):
+    response = MockStreamingResponse(VALID_PDF_BYTES)
+    mock_get = mocker.patch('requests.Session.get', return_value=response)
+
+    result = load_pdf_document('url', 'http://example.com/document.pdf', stream=True)
+
+    assert result == VALID_PDF_BYTES
+    assert mock_get.call_args.kwargs['stream'] is True
+
+def test_streaming_download_spools_large_body_to_memory_map(mocker):
+    mocker.patch('requests.Session.get', return_value=MockStreamingResponse(VALID_PDF_BYTES))
+
+    result = load_pdf_document('url', 'http://example.com/document.pdf', stream=True, spool_threshold=256)
+
+    assert isinstance(result, mmap.mmap)
+    assert len(result) == len(VALID_PDF_BYTES)
+    assert result[:] == VALID_PDF_BYTES
+
+def test_streaming_download_rejects_non_pdf_after_first_chunk(mocker):
+    response = MockStreamingResponse(NON_PDF_BYTES)
+    mocker.patch('requests.Session.get', return_value=response)
+
+    with pytest.raises(Exception, match="missing %PDF magic bytes"):
+        load_pdf_document('url', 'http://example.com/page.html', stream=True)
+    assert response.chunks_served == 1
+
+@pytest.mark.parametrize("headers", [
+    {},                               # Size only discovered while streaming
+    {'Content-Length': str(len(VALID_PDF_BYTES))},  # Rejected before reading the body
+])
+def test_streaming_download_enforces_max_bytes(mocker, headers):
+    response = MockStreamingResponse(VALID_PDF_BYTES, headers=headers)
+    mocker.patch('requests.Session.get', return_value=response)
+
+    with pytest.raises(Exception, match="maximum"):
+        load_pdf_document('url', 'http://example.com/document.pdf', stream=True, max_bytes=500)
+    assert response.chunks_served <= 6
+
+@pytest.mark.parametrize("spool_threshold", [0, 2, 3])
+def test_magic_bytes_are_checked_before_spooling(mocker, spool_threshold):
+    mocker.patch('requests.Session.get', return_value=MockStreamingResponse(NON_PDF_BYTES, chunk_size=1))
+    with pytest.raises(Exception, match="missing %PDF magic bytes"):
+        load_pdf_document('url', 'http://example.com/page.html', stream=True, spool_threshold=spool_threshold)
+
+    mocker.patch('requests.Session.get', return_value=MockStreamingResponse(VALID_PDF_BYTES, chunk_size=1))
+    result = load_pdf_document('url', 'http://example.com/document.pdf', stream=True, spool_threshold=spool_threshold)
+    assert isinstance(result, mmap.mmap) and result[:] == VALID_PDF_BYTES
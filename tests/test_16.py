@@ -0,0 +1,143 @@
+import mmap
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# definition_e2c84b1f6a3d4097b5e0d8c3a6f1b7e4 block
+from definition_e2c84b1f6a3d4097b5e0d8c3a6f1b7e4 import HttpDocumentCache, get_http_session, load_pdf_document
+# end definition_e2c84b1f6a3d4097b5e0d8c3a6f1b7e4 block
+
+class PdfRequestHandler(BaseHTTPRequestHandler):
+    """Serves server.documents with ETag / Last-Modified validators and records every response."""
+
+    def do_GET(self):
+        document = self.server.documents.get(self.path)
+        if document is None:
+            self.server.log.append(404)
+            self.send_response(404)
+            self.end_headers()
+            return
+        body, etag = document
+        validators = self.server.validators
+        if 'etag' in validators and self.headers.get('If-None-Match') == etag:
+            self.server.log.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        if 'last_modified' in validators and self.headers.get('If-Modified-Since') == 'Wed, 01 Jan 2025 00:00:00 GMT':
+            self.server.log.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        if 'etag' in validators:
+            self.send_header('ETag', etag)
+        if 'last_modified' in validators:
+            self.send_header('Last-Modified', 'Wed, 01 Jan 2025 00:00:00 GMT')
+        self.end_headers()
+        # Logged before the body goes out, so the client never sees a response the log lacks.
+        self.server.log.append(200)
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def pdf_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PdfRequestHandler)
+    server.documents = {'/doc.pdf': (b'%PDF-1.4\nversion one\n%%EOF', '"v1"')}
+    server.validators = {'etag', 'last_modified'}
+    server.log = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url_for(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def test_unchanged_document_is_revalidated_with_304(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+    url = url_for(pdf_server, '/doc.pdf')
+
+    first = load_pdf_document('url', url, http_cache=cache)
+    second = load_pdf_document('url', url, http_cache=cache)
+
+    assert first == second == b'%PDF-1.4\nversion one\n%%EOF'
+    assert pdf_server.log == [200, 304]
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+def test_changed_document_is_downloaded_again(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+    url = url_for(pdf_server, '/doc.pdf')
+    pdf_server.validators = {'etag'}
+
+    load_pdf_document('url', url, http_cache=cache)
+    pdf_server.documents['/doc.pdf'] = (b'%PDF-1.4\nversion two\n%%EOF', '"v2"')
+    result = load_pdf_document('url', url, http_cache=cache)
+
+    assert result == b'%PDF-1.4\nversion two\n%%EOF'
+    assert pdf_server.log == [200, 200]
+    assert cache.stats() == {'hits': 0, 'misses': 2}
+
+def test_cache_is_shared_between_instances(pdf_server, tmp_path):
+    url = url_for(pdf_server, '/doc.pdf')
+    HttpDocumentCache(str(tmp_path)).fetch(url)
+
+    other_cache = HttpDocumentCache(str(tmp_path))
+    other_cache.fetch(url)
+
+    assert other_cache.hits == 1
+    assert pdf_server.log == [200, 304]
+
+def test_response_without_validators_is_not_cached(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+    url = url_for(pdf_server, '/doc.pdf')
+    pdf_server.validators = set()
+
+    cache.fetch(url)
+    cache.fetch(url)
+
+    assert pdf_server.log == [200, 200]
+    assert cache.stats() == {'hits': 0, 'misses': 2}
+
+def test_http_errors_are_reported(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+
+    with pytest.raises(Exception, match="Failed to download PDF"):
+        load_pdf_document('url', url_for(pdf_server, '/missing.pdf'), http_cache=cache)
+
+def test_streamed_download_through_cache_is_spooled(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+    url = url_for(pdf_server, '/doc.pdf')
+
+    first = load_pdf_document('url', url, stream=True, spool_threshold=8, http_cache=cache)
+    second = load_pdf_document('url', url, stream=True, spool_threshold=8, http_cache=cache)
+
+    assert isinstance(first, mmap.mmap) and isinstance(second, mmap.mmap)
+    assert first[:] == second[:] == b'%PDF-1.4\nversion one\n%%EOF'
+    assert pdf_server.log == [200, 304]
+    # The spooled body was moved into the cache, leaving no temporary files behind.
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')]
+    with pytest.raises(Exception, match="maximum"):
+        load_pdf_document('url', url, stream=True, max_bytes=8, http_cache=cache)
+
+def test_concurrent_fetches_are_all_counted(pdf_server, tmp_path):
+    cache = HttpDocumentCache(str(tmp_path))
+    url = url_for(pdf_server, '/doc.pdf')
+    cache.fetch(url)
+
+    threads = [threading.Thread(target=lambda: [cache.fetch(url) for _ in range(5)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats() == {'hits': 40, 'misses': 1}
+
+def test_shared_session_is_reused():
+    assert get_http_session() is get_http_session()
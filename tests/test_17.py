@@ -0,0 +1,125 @@
+import random
+import sys
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from PIL import Image as PIL_Image
+
+# definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813 block
+from definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813 import (
+    PageSpatialIndex, create_interactive_viewer, get_spatial_index, on_image_click,
+)
+# end definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813 block
+
+class MockElement:
+    def __init__(self, bbox, name):
+        self.bbox = bbox
+        self.name = name
+
+    def __repr__(self):
+        return f"MockElement({self.name})"
+
+class MockMouseEvent:
+    def __init__(self, xdata, ydata):
+        self.xdata = xdata
+        self.ydata = ydata
+
+# A table containing a cell, both inside a page-wide text block
+page_block = MockElement([0, 0, 500, 500], "page_block")
+table = MockElement([100, 100, 300, 300], "table")
+cell = MockElement([150, 150, 200, 200], "cell")
+far_away = MockElement([800, 800, 820, 820], "far_away")
+elements = [page_block, table, cell, far_away]
+
+@pytest.mark.parametrize("point, expected", [
+    ((175, 175), [cell, table, page_block]),  # Innermost element first
+    ((120, 120), [table, page_block]),
+    ((150, 150), [cell, table, page_block]),  # Edges are inclusive
+    ((10, 10), [page_block]),
+    ((600, 600), []),
+])
+def test_query_point_orders_by_smallest_area(point, expected):
+    index = PageSpatialIndex(elements)
+    assert index.query_point(*point) == expected
+
+def test_equal_areas_prefer_topmost_element():
+    lower = MockElement([0, 0, 10, 10], "lower")
+    upper = MockElement([0, 0, 10, 10], "upper")
+    assert PageSpatialIndex([lower, upper]).hit_test(5, 5) is upper
+
+def test_query_rect_returns_intersecting_elements():
+    index = PageSpatialIndex(elements)
+    assert index.query_rect(190, 190, 250, 250) == [cell, table, page_block]
+    assert index.query_rect(805, 805, 806, 806) == [far_away]
+    assert index.query_rect(600, 600, 700, 700) == []
+
+def test_nearest_element():
+    index = PageSpatialIndex(elements)
+    assert index.nearest(175, 175) is cell
+    assert index.nearest(700, 700) is far_away
+    assert index.nearest(700, 700, max_distance=10) is None
+    assert PageSpatialIndex([]).nearest(0, 0) is None
+
+def test_index_matches_linear_scan_on_dense_page():
+    rng = random.Random(0)
+    boxes = []
+    for i in range(2000):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        boxes.append(MockElement([x, y, x + rng.uniform(1, 40), y + rng.uniform(1, 40)], i))
+    index = PageSpatialIndex(boxes)
+
+    for _ in range(200):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        expected = {b.name for b in boxes if b.bbox[0] <= x <= b.bbox[2] and b.bbox[1] <= y <= b.bbox[3]}
+        assert {b.name for b in index.query_point(x, y)} == expected
+
+def test_spatial_index_is_built_once_per_page():
+    page_elements = [table, cell]
+    assert get_spatial_index(page_elements) is get_spatial_index(page_elements)
+
+def test_on_image_click_selects_innermost_element(mocker):
+    mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.current_elements', new=list(elements))
+    mock_output = mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.metadata_output', new=MagicMock())
+    mock_display = mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.display_element_metadata', new=MagicMock())
+
+    on_image_click(MockMouseEvent(xdata=175, ydata=175))
+
+    mock_output.clear_output.assert_called_once()
+    mock_display.assert_called_once_with(cell)
+
+class FakeWidgetEvent:
+    """Stands in for ipyevents.Event: keeps the handler so a click can be simulated."""
+
+    def __init__(self, source, watched_events):
+        self.handlers = []
+
+    def on_dom_event(self, handler):
+        self.handlers.append(handler)
+
+def test_viewer_publishes_click_target_and_handles_clicks(mocker):
+    module = sys.modules[on_image_click.__module__]
+    mocker.patch.object(module, 'WidgetEvent', FakeWidgetEvent)
+    mock_display = mocker.patch.object(module, 'display_element_metadata')
+    element = SimpleNamespace(**{'bbox': (10, 10, 40, 30), 'class': 'Text', 'text_content': "hello", 'confidence': 0.9})
+    pages = [(PIL_Image.new('RGB', (100, 80), 'white'), [element])]
+
+    viewer = create_interactive_viewer(pages, {'Text': 'red'})
+    assert isinstance(module.metadata_output, module.widgets.Output)
+    (shown,) = module.current_elements
+    x0, y0, x1, y1 = shown.bbox
+
+    on_image_click(MockMouseEvent(xdata=(x0 + x1) / 2, ydata=(y0 + y1) / 2))
+    mock_display.assert_called_once_with(shown)
+
+    # A click on the page image reaches on_image_click through the widget event.
+    viewer.click_events.handlers[0]({'type': 'click', 'dataX': (x0 + x1) / 2, 'dataY': (y0 + y1) / 2})
+    assert mock_display.call_count == 2
+
+def test_on_image_click_without_viewer_does_nothing(mocker):
+    mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.current_elements', new=list(elements))
+    mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.metadata_output', new=None)
+    mock_display = mocker.patch('definition_9d6f2b8e4c1a47e3a0b5d9c7e2f4a813.display_element_metadata', new=MagicMock())
+
+    on_image_click(MockMouseEvent(xdata=175, ydata=175))
+
+    mock_display.assert_not_called()
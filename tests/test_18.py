@@ -0,0 +1,89 @@
+import sys
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# definition_1b7e3c9a5d2f4e08b6a4c1d9e7f3b5a2 block
+from definition_1b7e3c9a5d2f4e08b6a4c1d9e7f3b5a2 import LayoutElementStore
+# end definition_1b7e3c9a5d2f4e08b6a4c1d9e7f3b5a2 block
+
+def create_mock_element(bbox, class_name, text_content, confidence):
+    element = Mock()
+    element.bbox = bbox
+    setattr(element, 'class', class_name)
+    element.text_content = text_content
+    element.confidence = confidence
+    return element
+
+def create_mock_docling_result(pages_elements):
+    docling_result = Mock()
+    docling_result.pages = []
+    for elements_data in pages_elements:
+        page = Mock()
+        page.element_groups = [create_mock_element(*e) for e in elements_data]
+        page.render.side_effect = AssertionError("building the store must not render pages")
+        docling_result.pages.append(page)
+    return docling_result
+
+PAGES = [
+    [((0, 0, 10, 10), "Text", "Hello", 0.9), ((10, 10, 20, 20), "Title", "Wörld", 0.95)],
+    [],
+    [((30, 30, 40, 40), "Table", "", 0.4), ((50, 50, 60, 60), "Text", "A caption", None)],
+]
+
+@pytest.fixture
+def store():
+    return LayoutElementStore.from_docling_result(create_mock_docling_result(PAGES))
+
+def test_store_layout(store):
+    assert len(store) == 4
+    assert store.num_pages == 3
+    assert store.bboxes.shape == (4, 4) and store.bboxes.dtype == np.float32
+    assert store.confidences.dtype == np.float32
+    assert store.class_names == ["Text", "Title", "Table"]
+    assert store.class_codes.tolist() == [0, 1, 2, 0]
+    assert [store.page_range(p) for p in range(3)] == [(0, 2), (2, 2), (2, 4)]
+
+def test_element_views_match_source_elements(store):
+    view = store[1]
+    assert view.bbox == (10.0, 10.0, 20.0, 20.0)
+    assert getattr(view, 'class') == "Title"
+    assert view.class_name == view.class_ == "Title"
+    assert view.text_content == "Wörld"
+    assert view.confidence == pytest.approx(0.95)
+    assert store[-1].confidence is None
+    assert [v.text_content for v in store.page_elements(2)] == ["", "A caption"]
+    assert store.page_elements(1) == []
+    with pytest.raises(IndexError):
+        store[4]
+
+@pytest.mark.parametrize("query, expected", [
+    ({'class_names': ["Text"]}, [0, 3]),
+    ({'class_names': ["Text", "Missing"]}, [0, 3]),
+    ({'page_number': 2}, [2, 3]),
+    ({'class_names': ["Table"], 'max_confidence': 0.5}, [2]),
+    ({'min_confidence': 0.9}, [0, 1]),
+    ({}, [0, 1, 2, 3]),
+])
+def test_vectorized_select(store, query, expected):
+    assert store.select(**query).tolist() == expected
+
+def test_store_is_much_smaller_than_element_objects():
+    elements = [SimpleNamespace(**{'bbox': (float(i), float(i), i + 5.0, i + 5.0), 'class': "Text",
+                                   'text_content': f"word {i}", 'confidence': i / 1000})
+                for i in range(1000)]
+    # Per-element objects, their attribute dicts and the boxed values they reference
+    object_bytes = sum(
+        sys.getsizeof(e) + sys.getsizeof(e.__dict__) + sys.getsizeof(e.bbox)
+        + sum(sys.getsizeof(v) for v in e.bbox) + sys.getsizeof(e.text_content) + sys.getsizeof(e.confidence)
+        for e in elements
+    )
+
+    store = LayoutElementStore.from_pages([elements])
+
+    assert store.nbytes * 10 <= object_bytes
+
+def test_store_from_invalid_elements():
+    with pytest.raises(AttributeError):
+        LayoutElementStore.from_pages([[object()]])
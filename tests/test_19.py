@@ -0,0 +1,82 @@
+import random
+import sys
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_6c0a8e4f2b9d4173a5e1c8b0d6f2a4e9 block
+from definition_6c0a8e4f2b9d4173a5e1c8b0d6f2a4e9 import (
+    FAST_DRAW_MIN_ELEMENTS, LayoutElementStore, benchmark_draw_bounding_boxes, draw_bounding_boxes,
+)
+# end definition_6c0a8e4f2b9d4173a5e1c8b0d6f2a4e9 block
+
+CLASS_COLORS = {'Text': '#FF0000', 'Title': '#00FF00', 'Table': '#0000FF', 'Figure': '#123456'}
+
+def random_elements(count, width, height, seed):
+    """Random boxes including degenerate, fractional and partially off-page ones."""
+    rng = random.Random(seed)
+    elements = []
+    for _ in range(count):
+        x, y = rng.uniform(-20, width + 5), rng.uniform(-20, height + 5)
+        w, h = rng.choice([0, 1, 2, 3, rng.uniform(0, 40)]), rng.choice([0, 1, 2, 3, rng.uniform(0, 40)])
+        elements.append(SimpleNamespace(**{'bbox': (x, y, x + w, y + h), 'class': rng.choice(list(CLASS_COLORS)),
+                                           'text_content': '', 'confidence': 0.5}))
+    return elements
+
+@pytest.mark.parametrize("mode", ['RGB', 'RGBA', 'L', 'P', '1'])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batched_drawing_is_pixel_identical(mode, seed):
+    image = PIL_Image.new(mode, (80, 60), 'white' if mode in ('RGB', 'RGBA') else 1)
+    elements = random_elements(300, 80, 60, seed)
+    visible_classes = ['Text', 'Table', 'Figure']
+
+    expected = draw_bounding_boxes(image, elements, visible_classes, CLASS_COLORS, fast=False)
+    result = draw_bounding_boxes(image, elements, visible_classes, CLASS_COLORS, fast=True)
+
+    assert result.mode == expected.mode
+    assert result.tobytes() == expected.tobytes()
+    if mode == 'P':
+        assert result.getpalette() == expected.getpalette()
+
+@pytest.mark.parametrize("mode", ['RGB', 'P'])
+def test_batched_drawing_falls_back_to_public_api(mode, monkeypatch):
+    module = sys.modules[draw_bounding_boxes.__module__]
+    image = PIL_Image.new(mode, (80, 60), 'white' if mode == 'RGB' else 1)
+    elements = random_elements(300, 80, 60, seed=3)
+    expected = draw_bounding_boxes(image, elements, ['Text', 'Figure'], CLASS_COLORS, fast=False)
+
+    # A Pillow release outside the checked range must not reach the private primitive.
+    monkeypatch.setattr(module, 'PILLOW_CORE_DRAW_VERSIONS', ((0, 0), (0, 1)))
+    assert not module._pillow_core_draw_supported(module.ImageDraw.Draw(image.copy()))
+    result = draw_bounding_boxes(image, elements, ['Text', 'Figure'], CLASS_COLORS, fast=True)
+    assert result.tobytes() == expected.tobytes()
+
+def test_batched_drawing_from_layout_element_store():
+    image = PIL_Image.new('RGB', (80, 60), 'white')
+    store = LayoutElementStore.from_pages([random_elements(200, 80, 60, seed=3)])
+
+    expected = draw_bounding_boxes(image, store.page_elements(0), ['Title', 'Text'], CLASS_COLORS, fast=False)
+    result = draw_bounding_boxes(image, store, ['Title', 'Text'], CLASS_COLORS, fast=True)
+
+    assert result.tobytes() == expected.tobytes()
+
+def test_batched_drawing_leaves_input_unchanged_and_skips_uncolored_classes():
+    image = PIL_Image.new('RGB', (50, 50), 'white')
+    elements = [SimpleNamespace(**{'bbox': (5, 5, 40, 40), 'class': 'Caption'})] * FAST_DRAW_MIN_ELEMENTS
+
+    result = draw_bounding_boxes(image, elements, ['Caption'], CLASS_COLORS)
+
+    assert result is not image
+    assert result.tobytes() == image.tobytes()
+
+def test_batched_drawing_rejects_inverted_boxes():
+    image = PIL_Image.new('RGB', (50, 50), 'white')
+    elements = [SimpleNamespace(**{'bbox': (30, 5, 10, 40), 'class': 'Text'})]
+
+    with pytest.raises(ValueError):
+        draw_bounding_boxes(image, elements, ['Text'], CLASS_COLORS, fast=True)
+
+def test_benchmark_reports_identical_output():
+    result = benchmark_draw_bounding_boxes(num_boxes=500, page_size=(300, 400), repeats=1)
+    assert result['identical'] is True
+    assert result['loop_ms'] > 0 and result['batched_ms'] > 0
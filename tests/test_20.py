@@ -0,0 +1,130 @@
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_5b0e7c2a94d14f8e8a36c1f0d2e97b41 block
+from definition_5b0e7c2a94d14f8e8a36c1f0d2e97b41 import OverlayLayerCache, draw_bounding_boxes
+# end definition_5b0e7c2a94d14f8e8a36c1f0d2e97b41 block
+
+CLASS_COLORS = {'Text': 'red', 'Title': 'blue', 'Table': 'green'}
+
+def make_element(bbox, class_name):
+    return SimpleNamespace(bbox=bbox, **{'class': class_name})
+
+def make_page(mode='RGB'):
+    image = PIL_Image.new(mode, (120, 90), 'white')
+    elements = [
+        make_element((10, 10, 60, 30), 'Text'),
+        make_element((70.6, 12.2, 110.9, 40.4), 'Title'),
+        make_element((5, 50, 100, 85), 'Table'),
+        make_element((-4, -3, 8, 6), 'Text'),      # Partly off the page
+        make_element((115, 80, 130, 95), 'Table'), # Clipped at the bottom-right corner
+        make_element((40, 40, 40, 40), 'Title'),   # Degenerate box
+    ]
+    return image, elements
+
+@pytest.mark.parametrize("mode", ['RGB', 'RGBA', 'L'])
+@pytest.mark.parametrize("visible", [['Text'], ['Title'], ['Table'], []])
+def test_composite_matches_draw_bounding_boxes_per_class(mode, visible):
+    image, elements = make_page(mode)
+    cache = OverlayLayerCache()
+
+    composited = cache.composite(image, elements, visible, CLASS_COLORS)
+    expected = draw_bounding_boxes(image, elements, visible, CLASS_COLORS, fast=False)
+
+    assert composited.mode == expected.mode
+    assert composited.tobytes() == expected.tobytes()
+
+def test_composite_does_not_modify_the_page():
+    image, elements = make_page()
+    before = image.tobytes()
+
+    OverlayLayerCache().composite(image, elements, list(CLASS_COLORS), CLASS_COLORS)
+
+    assert image.tobytes() == before
+
+def test_toggling_reuses_cached_layers():
+    image, elements = make_page()
+    cache = OverlayLayerCache()
+
+    cache.composite(image, elements, ['Text', 'Title'], CLASS_COLORS)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    cache.composite(image, elements, ['Text'], CLASS_COLORS)
+    cache.composite(image, elements, ['Text', 'Title'], CLASS_COLORS)
+    assert (cache.hits, cache.misses) == (3, 2)
+
+    # Only the newly shown class is built.
+    cache.composite(image, elements, ['Text', 'Title', 'Table'], CLASS_COLORS)
+    assert cache.misses == 3
+
+def test_hiding_a_class_restores_the_original_pixels():
+    image, elements = make_page()
+    cache = OverlayLayerCache()
+
+    cache.composite(image, elements, ['Text', 'Title'], CLASS_COLORS)
+    hidden = cache.composite(image, elements, ['Title'], CLASS_COLORS)
+
+    assert hidden.tobytes() == draw_bounding_boxes(image, elements, ['Title'], CLASS_COLORS, fast=False).tobytes()
+
+def test_layers_are_stacked_in_class_colors_order():
+    image = PIL_Image.new('RGB', (50, 50), 'white')
+    elements = [make_element((10, 10, 40, 40), 'Title'), make_element((10, 10, 40, 40), 'Text')]
+
+    composited = OverlayLayerCache().composite(image, elements, ['Text', 'Title'], CLASS_COLORS)
+
+    # 'Title' comes after 'Text' in CLASS_COLORS, so it is drawn on top.
+    assert composited.getpixel((10, 10)) == (0, 0, 255)
+
+def test_layers_are_evicted_least_recently_used_across_pages():
+    pages = [make_page() for _ in range(3)]
+    cache = OverlayLayerCache()
+    image, elements = pages[0]
+    cache.composite(image, elements, list(CLASS_COLORS), CLASS_COLORS)
+    page_bytes = cache.nbytes
+    cache.max_bytes = page_bytes * 2
+
+    for image, elements in pages[1:]:
+        cache.composite(image, elements, list(CLASS_COLORS), CLASS_COLORS)
+
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.evictions > 0
+    # The first page was least recently used, so its layers have to be rebuilt.
+    misses = cache.misses
+    image, elements = pages[0]
+    cache.composite(image, elements, list(CLASS_COLORS), CLASS_COLORS)
+    assert cache.misses == misses + len(CLASS_COLORS)
+
+def test_new_page_at_reused_id_is_not_served_stale_layers():
+    cache = OverlayLayerCache()
+    image, elements = make_page()
+    cache.composite(image, elements, ['Text'], CLASS_COLORS)
+    del image
+
+    image, _ = make_page()
+    other_elements = [make_element((20, 20, 30, 30), 'Text')]
+    composited = cache.composite(image, other_elements, ['Text'], CLASS_COLORS)
+
+    assert composited.tobytes() == draw_bounding_boxes(image, other_elements, ['Text'], CLASS_COLORS, fast=False).tobytes()
+
+def test_clear_drops_everything():
+    image, elements = make_page()
+    cache = OverlayLayerCache()
+    cache.composite(image, elements, list(CLASS_COLORS), CLASS_COLORS)
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+def test_unsupported_mode_falls_back_to_drawing():
+    image, elements = make_page('RGB')
+    image = image.convert('P')
+
+    composited = OverlayLayerCache().composite(image, elements, ['Text'], CLASS_COLORS)
+
+    assert composited.tobytes() == draw_bounding_boxes(image, elements, ['Text'], CLASS_COLORS, fast=False).tobytes()
+
+def test_composite_rejects_non_images():
+    with pytest.raises(TypeError):
+        OverlayLayerCache().composite(None, [], ['Text'], CLASS_COLORS)
@@ -0,0 +1,148 @@
+import pytest
+import threading
+from unittest.mock import Mock
+from PIL import Image as PIL_Image
+
+# definition_c82d4a1f6e3b47a09d5f1e8b7a2c6d93 block
+from definition_c82d4a1f6e3b47a09d5f1e8b7a2c6d93 import LazyPageSequence, create_interactive_viewer
+# end definition_c82d4a1f6e3b47a09d5f1e8b7a2c6d93 block
+
+PAGE_SIZE = (100, 50)
+PAGE_BYTES = 100 * 50 * 3
+
+def create_docling_result(num_pages, render_fail_at=None):
+    docling_result = Mock()
+    pages = []
+    for i in range(num_pages):
+        page = Mock()
+        if i == render_fail_at:
+            page.render.side_effect = RuntimeError("Simulated page render failure")
+        else:
+            page.render.side_effect = lambda: PIL_Image.new('RGB', PAGE_SIZE, 'white')
+        page.element_groups = []
+        pages.append(page)
+    docling_result.pages = pages
+    return docling_result
+
+def test_byte_budget_evicts_least_recently_used_pages():
+    docling_result = create_docling_result(5)
+    pages = LazyPageSequence(docling_result, max_cached_pages=None, max_cached_bytes=2 * PAGE_BYTES)
+
+    pages[0]
+    pages[1]
+    pages[0]  # Page 0 becomes most recently used
+    pages[2]  # Evicts page 1
+
+    assert pages.is_rendered(0)
+    assert not pages.is_rendered(1)
+    assert pages.is_rendered(2)
+    assert pages.nbytes == 2 * PAGE_BYTES
+    assert pages.evictions == 1
+
+def test_evicted_page_is_rendered_again_on_demand():
+    docling_result = create_docling_result(3)
+    pages = LazyPageSequence(docling_result, max_cached_bytes=PAGE_BYTES)
+
+    pages[0]
+    pages[1]
+    image, _ = pages[0]
+
+    assert image.size == PAGE_SIZE
+    assert docling_result.pages[0].render.call_count == 2
+
+def test_requested_page_is_kept_even_if_over_budget():
+    docling_result = create_docling_result(2)
+    pages = LazyPageSequence(docling_result, max_cached_bytes=PAGE_BYTES // 2)
+
+    image, _ = pages[1]
+
+    assert image is not None
+    assert pages.is_rendered(1)
+
+def test_cache_info_reports_occupancy_and_counters():
+    docling_result = create_docling_result(3)
+    pages = LazyPageSequence(docling_result, max_cached_bytes=10 * PAGE_BYTES)
+
+    pages[0]
+    pages[0]
+    pages[1]
+
+    assert pages.cache_info() == {
+        'pages': 2,
+        'nbytes': 2 * PAGE_BYTES,
+        'max_pages': 8,
+        'max_bytes': 10 * PAGE_BYTES,
+        'hits': 1,
+        'misses': 2,
+        'evictions': 0,
+    }
+
+def test_release_updates_byte_count():
+    docling_result = create_docling_result(2)
+    pages = LazyPageSequence(docling_result)
+    pages[0]
+    pages[1]
+
+    pages.release(0)
+    assert pages.nbytes == PAGE_BYTES
+
+    pages.release()
+    assert pages.nbytes == 0
+
+def test_prefetch_renders_neighbouring_pages_in_background():
+    docling_result = create_docling_result(4)
+    pages = LazyPageSequence(docling_result)
+
+    futures = pages.prefetch([1, 2, 7, -1])  # Out-of-range indices are ignored
+    for future in futures:
+        future.result(timeout=5)
+
+    assert len(futures) == 2
+    assert pages.is_rendered(1) and pages.is_rendered(2)
+    pages[1]
+    assert docling_result.pages[1].render.call_count == 1
+
+def test_prefetch_skips_pages_already_rendered():
+    docling_result = create_docling_result(2)
+    pages = LazyPageSequence(docling_result)
+    pages[0]
+
+    assert pages.prefetch([0]) == []
+
+def test_access_waits_for_in_flight_prefetch_instead_of_rendering_twice():
+    docling_result = create_docling_result(2)
+    release_render = threading.Event()
+
+    def slow_render():
+        release_render.wait(timeout=5)
+        return PIL_Image.new('RGB', PAGE_SIZE, 'white')
+    docling_result.pages[1].render.side_effect = slow_render
+    pages = LazyPageSequence(docling_result)
+
+    pages.prefetch([1])
+    threading.Timer(0.05, release_render.set).start()
+    image, _ = pages[1]
+
+    assert image.size == PAGE_SIZE
+    assert docling_result.pages[1].render.call_count == 1
+
+def test_prefetch_error_is_reported_on_access():
+    docling_result = create_docling_result(2, render_fail_at=1)
+    pages = LazyPageSequence(docling_result)
+
+    for future in pages.prefetch([1]):
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        pages[1]
+
+def test_invalid_byte_budget():
+    with pytest.raises(ValueError):
+        LazyPageSequence(create_docling_result(1), max_cached_bytes=-1)
+
+def test_viewer_applies_byte_budget_to_lazy_pages():
+    pages = LazyPageSequence(create_docling_result(3))
+
+    create_interactive_viewer(pages, {'Text': 'red'}, max_cached_bytes=PAGE_BYTES)
+
+    assert pages.max_cached_bytes == PAGE_BYTES
@@ -0,0 +1,111 @@
+import gc
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_7e14b9d0a3c54f2d8b61e5a09c3f7d28 block
+from definition_7e14b9d0a3c54f2d8b61e5a09c3f7d28 import (
+    PagePyramid, ScaledLayoutElement, get_page_pyramid, render_page_overlay, draw_bounding_boxes,
+)
+# end definition_7e14b9d0a3c54f2d8b61e5a09c3f7d28 block
+
+CLASS_COLORS = {'Text': 'red', 'Title': 'blue'}
+
+def make_element(bbox, class_name):
+    return SimpleNamespace(bbox=bbox, text_content='Sample', confidence=0.9, **{'class': class_name})
+
+def make_page(size=(1200, 1800)):
+    image = PIL_Image.new('RGB', size, 'white')
+    elements = [make_element((120, 180, 600, 360), 'Text'), make_element((60, 90, 1140, 150), 'Title')]
+    return image, elements
+
+def test_levels_are_downscaled_to_their_target_heights():
+    image, elements = make_page()
+    pyramid = PagePyramid(image, elements, level_heights={'thumbnail': 150, 'screen': 600})
+
+    screen, _, scale = pyramid.level('screen')
+    thumbnail, _, _ = pyramid.level('thumbnail')
+
+    assert screen.size == (400, 600)
+    assert thumbnail.size == (100, 150)
+    assert scale == pytest.approx((1 / 3, 1 / 3))
+    assert pyramid.level_names == ['full', 'screen', 'thumbnail']
+
+def test_full_level_returns_the_original_page():
+    image, elements = make_page()
+    pyramid = PagePyramid(image, elements)
+
+    full, full_elements, scale = pyramid.level('full')
+
+    assert full is image
+    assert full_elements is elements
+    assert scale == (1.0, 1.0)
+
+def test_scaled_elements_match_the_level_and_forward_attributes():
+    image, elements = make_page()
+    pyramid = PagePyramid(image, elements, level_heights={'screen': 600})
+
+    _, screen_elements, _ = pyramid.level('screen')
+    element = screen_elements[0]
+
+    assert isinstance(element, ScaledLayoutElement)
+    assert element.bbox == pytest.approx((40, 60, 200, 120))
+    assert getattr(element, 'class') == 'Text'
+    assert element.text_content == 'Sample'
+    assert element.element is elements[0]
+
+def test_levels_never_upscale_small_pages():
+    image, elements = make_page(size=(300, 400))
+    pyramid = PagePyramid(image, elements, level_heights={'thumbnail': 160, 'screen': 600})
+
+    screen, screen_elements, scale = pyramid.level('screen')
+
+    assert screen is image
+    assert screen_elements is elements
+    assert scale == (1.0, 1.0)
+    assert pyramid.level('thumbnail')[0].height == 160
+
+def test_full_level_is_not_kept_alive_by_the_pyramid():
+    image, elements = make_page()
+    pyramid = PagePyramid(image, elements)
+
+    del image
+    gc.collect()
+
+    with pytest.raises(LookupError):
+        pyramid.level('full')
+    assert pyramid.level('screen')[0].height == 600
+
+def test_unknown_level_raises_key_error():
+    pyramid = PagePyramid(*make_page())
+    with pytest.raises(KeyError):
+        pyramid.level('poster')
+
+def test_non_image_input_raises_type_error():
+    with pytest.raises(TypeError):
+        PagePyramid("not an image", [])
+
+def test_get_page_pyramid_is_cached_per_page():
+    image, elements = make_page()
+
+    assert get_page_pyramid(image, elements) is get_page_pyramid(image, elements)
+    assert get_page_pyramid(image, list(elements)) is not get_page_pyramid(image, elements)
+
+def test_render_page_overlay_draws_at_screen_resolution_by_default():
+    image, elements = make_page()
+
+    overlay, shown_elements = render_page_overlay(image, elements, ['Text'], CLASS_COLORS)
+    screen, screen_elements, _ = get_page_pyramid(image, elements).level('screen')
+
+    assert overlay.height == 600
+    assert shown_elements is screen_elements
+    assert overlay.tobytes() == draw_bounding_boxes(screen, screen_elements, ['Text'], CLASS_COLORS, fast=False).tobytes()
+
+def test_render_page_overlay_full_level_for_zoom_and_export():
+    image, elements = make_page()
+
+    overlay, shown_elements = render_page_overlay(image, elements, ['Text', 'Title'], CLASS_COLORS, level='full')
+
+    assert overlay.size == image.size
+    assert shown_elements is elements
+    assert overlay.getpixel((120, 180)) == (255, 0, 0)
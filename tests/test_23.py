@@ -0,0 +1,103 @@
+import pytest
+import random
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from PIL import Image as PIL_Image
+
+# definition_e4a9c1b7d2f04b3a96e8d5c0f1a27b64 block
+import definition_e4a9c1b7d2f04b3a96e8d5c0f1a27b64 as viewer_module
+from definition_e4a9c1b7d2f04b3a96e8d5c0f1a27b64 import OverlayLayerCache, update_display
+# end definition_e4a9c1b7d2f04b3a96e8d5c0f1a27b64 block
+
+CLASS_COLORS = {'Text': 'red', 'Title': 'blue', 'Table': 'green'}
+
+def make_element(bbox, class_name):
+    return SimpleNamespace(bbox=bbox, **{'class': class_name})
+
+def make_page(mode='RGB', size=(200, 150)):
+    image = PIL_Image.new(mode, size, 'white')
+    elements = [
+        make_element((10, 10, 120, 60), 'Text'),
+        make_element((10, 10, 190, 30), 'Title'),  # Shares edges with the Text box
+        make_element((50, 40, 180, 140), 'Table'),
+        make_element((60, 50, 100, 90), 'Text'),
+    ]
+    return image, elements
+
+@pytest.mark.parametrize("mode", ['RGB', 'RGBA', 'L'])
+def test_visibility_delta_matches_full_composite(mode):
+    image, elements = make_page(mode)
+    cache = OverlayLayerCache()
+    rng = random.Random(0)
+    previous = {'Text', 'Title'}
+    pixels = cache.composite_array(image, elements, previous, CLASS_COLORS)
+
+    for _ in range(25):
+        visible = set(rng.sample(sorted(CLASS_COLORS), rng.randint(0, 3)))
+        cache.apply_visibility_delta(pixels, image, elements, previous, visible, CLASS_COLORS)
+        previous = visible
+
+        assert pixels.tobytes() == cache.composite_array(image, elements, visible, CLASS_COLORS).tobytes()
+
+def test_visibility_delta_without_changes_does_nothing():
+    image, elements = make_page()
+    cache = OverlayLayerCache()
+    pixels = cache.composite_array(image, elements, ['Text'], CLASS_COLORS)
+    before = pixels.copy()
+
+    assert cache.apply_visibility_delta(pixels, image, elements, ['Text'], ['Text', 'Unknown'], CLASS_COLORS) is False
+    assert (pixels == before).all()
+
+def test_composite_array_rejects_unsupported_modes():
+    image, elements = make_page('P')
+    with pytest.raises(ValueError):
+        OverlayLayerCache().composite_array(image, elements, ['Text'], CLASS_COLORS)
+
+@pytest.fixture
+def viewer_state(monkeypatch):
+    page = make_page()
+    monkeypatch.setattr(viewer_module, 'all_pages_data', [page, make_page()], raising=False)
+    monkeypatch.setattr(viewer_module, 'class_colors', dict(CLASS_COLORS), raising=False)
+    monkeypatch.setattr(viewer_module, 'image_output', MagicMock(), raising=False)
+    monkeypatch.setattr(viewer_module.plt, 'show', lambda: None)
+    monkeypatch.setattr(viewer_module, '_display_state', viewer_module.OrderedDict())
+    monkeypatch.setattr(viewer_module, 'display_stats', {'full_redraws': 0, 'delta_redraws': 0, 'redraws_avoided': 0})
+    return page
+
+def test_update_display_skips_redraw_when_nothing_changed(viewer_state):
+    flags = {'Text': True, 'Title': False, 'Table': True}
+
+    update_display(0, flags)
+    update_display(0, dict(flags))
+
+    assert viewer_module.display_stats == {'full_redraws': 1, 'delta_redraws': 0, 'redraws_avoided': 1}
+    viewer_module.image_output.__enter__.assert_called_once()
+
+def test_update_display_applies_only_the_delta(viewer_state):
+    image, elements = viewer_state
+
+    update_display(0, {'Text': True, 'Title': True, 'Table': True})
+    update_display(0, {'Text': True, 'Title': False, 'Table': True})
+
+    assert viewer_module.display_stats == {'full_redraws': 1, 'delta_redraws': 1, 'redraws_avoided': 0}
+    screen, screen_elements, _, _, pixels = viewer_module._display_state[0]
+    expected = viewer_module.overlay_layer_cache.composite_array(screen, screen_elements, ['Text', 'Table'], CLASS_COLORS)
+    assert pixels.tobytes() == expected.tobytes()
+
+def test_update_display_tracks_state_per_page(viewer_state):
+    flags = {'Text': True}
+
+    update_display(0, flags)
+    update_display(1, flags)
+    update_display(0, flags)
+
+    assert viewer_module.display_stats == {'full_redraws': 2, 'delta_redraws': 0, 'redraws_avoided': 1}
+
+def test_update_display_redraws_fully_when_colors_change(viewer_state):
+    flags = {'Text': True}
+
+    update_display(0, flags)
+    viewer_module.class_colors['Text'] = 'purple'
+    update_display(0, flags)
+
+    assert viewer_module.display_stats['full_redraws'] == 2
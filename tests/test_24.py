@@ -0,0 +1,207 @@
+import pytest
+import sys
+import threading
+from unittest.mock import MagicMock
+
+# definition_9a3f5e1c7b2d4e6f8a0b1c2d3e4f5a6b block
+from definition_9a3f5e1c7b2d4e6f8a0b1c2d3e4f5a6b import (
+    ConverterPool, DoclingResultCache, get_converter_pool, process_pdf_with_docling, WARMUP_PDF_BYTES,
+)
+# end definition_9a3f5e1c7b2d4e6f8a0b1c2d3e4f5a6b block
+
+class StubConverter:
+    """Counts conversions; stands in for a DocumentConverter."""
+    instances = 0
+
+    def __init__(self):
+        StubConverter.instances += 1
+        self.converted = []
+        self.healthy = True
+
+    def convert_single(self, pdf_bytes):
+        self.converted.append(pdf_bytes)
+        return MagicMock(pages=[])
+
+@pytest.fixture
+def factory():
+    StubConverter.instances = 0
+    return StubConverter
+
+def test_converters_are_built_lazily_and_reused(factory):
+    pool = ConverterPool(size=2, converter_factory=factory)
+
+    with pool.borrow() as first:
+        first.convert_single(b'%PDF-1')
+    with pool.borrow() as second:
+        second.convert_single(b'%PDF-2')
+
+    assert first is second
+    assert StubConverter.instances == 1
+    assert pool.stats() == {'size': 2, 'live': 1, 'idle': 1, 'in_use': 0,
+                            'conversions': 2, 'recycled': 0, 'replaced': 0}
+
+def test_warm_up_builds_every_converter_and_runs_a_blank_page(factory):
+    pool = ConverterPool(size=3, converter_factory=factory)
+
+    pool.warm_up()
+
+    assert StubConverter.instances == 3
+    assert pool.stats()['idle'] == 3
+    assert pool.stats()['conversions'] == 0
+    with pool.borrow() as converter:
+        assert converter.converted == [WARMUP_PDF_BYTES]
+
+def test_warmup_pdf_is_structurally_valid():
+    assert WARMUP_PDF_BYTES.startswith(b'%PDF-')
+    assert WARMUP_PDF_BYTES.rstrip().endswith(b'%%EOF')
+    startxref = int(WARMUP_PDF_BYTES.rsplit(b'startxref', 1)[1].split()[0])
+    assert WARMUP_PDF_BYTES[startxref:].startswith(b'xref')
+
+def test_converter_is_recycled_after_max_conversions(factory):
+    pool = ConverterPool(size=1, converter_factory=factory, max_conversions=2)
+
+    seen = []
+    for _ in range(5):
+        with pool.borrow() as converter:
+            seen.append(converter)
+
+    assert seen[0] is seen[1]
+    assert seen[2] is not seen[1]
+    assert StubConverter.instances == 3
+    assert pool.stats()['recycled'] == 2
+
+def test_unhealthy_converter_is_replaced_before_use(factory):
+    pool = ConverterPool(size=1, converter_factory=factory, health_check=lambda converter: converter.healthy)
+    with pool.borrow() as converter:
+        pass
+    converter.healthy = False
+
+    with pool.borrow() as replacement:
+        pass
+
+    assert replacement is not converter
+    assert pool.stats()['replaced'] == 1
+
+def test_converter_failing_health_check_after_error_is_dropped(factory):
+    pool = ConverterPool(size=1, converter_factory=factory, health_check=lambda converter: converter.healthy)
+
+    with pytest.raises(RuntimeError):
+        with pool.borrow() as converter:
+            converter.healthy = False
+            raise RuntimeError("model crashed")
+
+    assert pool.stats()['live'] == 0
+    with pool.borrow() as replacement:
+        assert replacement is not converter
+
+def test_check_health_discards_unhealthy_idle_converters(factory):
+    pool = ConverterPool(size=2, converter_factory=factory, health_check=lambda converter: converter.healthy)
+    pool.warm_up()
+    with pool.borrow() as converter:
+        pass
+    converter.healthy = False
+
+    assert pool.check_health() == 1
+    assert pool.stats()['live'] == 1
+
+def test_borrow_times_out_when_pool_is_exhausted(factory):
+    pool = ConverterPool(size=1, converter_factory=factory)
+
+    with pool.borrow():
+        with pytest.raises(TimeoutError):
+            with pool.borrow(timeout=0.05):
+                pass
+
+def test_waiting_borrower_gets_returned_converter(factory):
+    pool = ConverterPool(size=1, converter_factory=factory)
+    borrowed = []
+    release = threading.Event()
+
+    def hold():
+        with pool.borrow() as converter:
+            borrowed.append(converter)
+            release.wait(timeout=5)
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while not borrowed:
+        pass
+    threading.Timer(0.05, release.set).start()
+
+    with pool.borrow(timeout=5) as converter:
+        assert converter is borrowed[0]
+    holder.join()
+
+def test_failed_factory_frees_its_slot():
+    calls = []
+
+    def flaky_factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("weights not found")
+        return StubConverter()
+    pool = ConverterPool(size=1, converter_factory=flaky_factory)
+
+    with pytest.raises(OSError):
+        with pool.borrow():
+            pass
+    with pool.borrow(timeout=1) as converter:
+        assert isinstance(converter, StubConverter)
+
+def test_closed_pool_rejects_borrows(factory):
+    pool = ConverterPool(size=1, converter_factory=factory)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        with pool.borrow():
+            pass
+
+@pytest.mark.parametrize("kwargs", [{'size': 0}, {'max_conversions': 0}])
+def test_invalid_pool_settings(kwargs):
+    with pytest.raises(ValueError):
+        ConverterPool(**kwargs)
+
+def test_process_pdf_with_docling_borrows_from_pool(factory):
+    pool = ConverterPool(size=1, converter_factory=factory)
+
+    result = process_pdf_with_docling(pool, b'%PDF-1.4 document')
+
+    assert result.pages == []
+    assert pool.stats()['conversions'] == 1
+    with pool.borrow() as converter:
+        assert converter.converted == [b'%PDF-1.4 document']
+
+def test_cache_hit_never_borrows_from_pool(factory, tmp_path):
+    cache = DoclingResultCache(str(tmp_path))
+    process_pdf_with_docling(ConverterPool(size=1, converter_factory=factory), b'%PDF-1.4 document', cache=cache)
+    assert StubConverter.instances == 1
+
+    # A cold pool built from the same factory serves the hit without building or borrowing a converter.
+    cold_pool = ConverterPool(size=1, converter_factory=factory)
+    cold_pool._acquire = MagicMock(side_effect=AssertionError("borrowed on a cache hit"))
+    result = process_pdf_with_docling(cold_pool, b'%PDF-1.4 document', cache=cache)
+
+    assert result.pages == []
+    assert cache.hits == 1
+    assert StubConverter.instances == 1
+    cold_pool._acquire.assert_not_called()
+
+def test_get_converter_pool_is_process_wide(factory):
+    pool = get_converter_pool(size=1, converter_factory=factory)
+    try:
+        assert get_converter_pool() is pool
+        assert get_converter_pool(size=5) is pool
+    finally:
+        pool.close()
+    assert get_converter_pool(converter_factory=factory) is not pool
+
+def test_default_factory_builds_a_docling_converter(factory, monkeypatch):
+    module = sys.modules[ConverterPool.__module__]
+    monkeypatch.setattr(module, 'DocumentConverter', factory)
+    pool = ConverterPool(size=1)
+    with pool.borrow() as converter:
+        assert isinstance(converter, StubConverter)
+    pool.close()
+
+    monkeypatch.setattr(module, 'DocumentConverter', None)
+    with pytest.raises(ImportError, match="docling"):
+        with ConverterPool(size=1).borrow():
+            pass
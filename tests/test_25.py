@@ -0,0 +1,178 @@
+import pytest
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_2d8b6f4a1c9e47b3a5f0e7d1c3b9a842 block
+from definition_2d8b6f4a1c9e47b3a5f0e7d1c3b9a842 import (
+    AsyncDocumentPipeline, ConverterPool, load_pdf_document_async,
+    process_pdf_with_docling_async, extract_page_images_and_elements_async,
+)
+# end definition_2d8b6f4a1c9e47b3a5f0e7d1c3b9a842 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+NON_PDF_BYTES = b'This is some random text, definitely not a PDF document.'
+
+class StubPage:
+    def __init__(self, page_number):
+        self.element_groups = [SimpleNamespace(**{'bbox': (0, 0, 10, 10), 'class': 'Text',
+                                                   'text_content': f"Page {page_number}", 'confidence': 0.9})]
+
+    def render(self):
+        return PIL_Image.new('RGB', (20, 20))
+
+class StubConverter:
+    """Blocking stand-in for DocumentConverter that records how many conversions overlap."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def convert_single(self, pdf_bytes):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if b'SLOW' in pdf_bytes:
+                time.sleep(1.0)
+            return SimpleNamespace(pages=[StubPage(i) for i in range(1 + len(pdf_bytes) // 100)])
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def test_async_counterparts_match_blocking_functions():
+    async def run():
+        pdf_bytes = await load_pdf_document_async('upload', VALID_PDF_BYTES)
+        docling_result = await process_pdf_with_docling_async(StubConverter(), pdf_bytes)
+        return await extract_page_images_and_elements_async(docling_result)
+
+    pages = asyncio.run(run())
+
+    assert len(pages) == 1
+    image, elements = pages[0]
+    assert image.size == (20, 20)
+    assert elements[0].text_content == "Page 0"
+
+def test_async_load_propagates_validation_errors():
+    with pytest.raises(ValueError):
+        asyncio.run(load_pdf_document_async('upload', NON_PDF_BYTES))
+
+def test_blocking_steps_do_not_block_the_event_loop():
+    async def run():
+        pipeline = AsyncDocumentPipeline(StubConverter(delay=0.2))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticking = asyncio.ensure_future(ticker())
+        await pipeline.process(VALID_PDF_BYTES)
+        ticking.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 5
+
+def test_concurrency_limit_is_respected():
+    converter = StubConverter(delay=0.05)
+    pool = ConverterPool(size=8, converter_factory=lambda: converter)
+
+    async def run():
+        pipeline = AsyncDocumentPipeline(pool, max_concurrency=2)
+        return await asyncio.gather(*(pipeline.process(VALID_PDF_BYTES) for _ in range(6)))
+
+    results = asyncio.run(run())
+
+    assert len(results) == 6
+    assert converter.max_active <= 2
+
+def test_plain_converter_is_not_shared_between_concurrent_documents():
+    converter = StubConverter(delay=0.05)
+
+    async def run():
+        pipeline = AsyncDocumentPipeline(converter, max_concurrency=4)
+        await asyncio.gather(*(pipeline.process(VALID_PDF_BYTES) for _ in range(4)))
+
+    asyncio.run(run())
+
+    assert converter.max_active == 1
+
+def test_per_document_timeout():
+    async def run():
+        pipeline = AsyncDocumentPipeline(StubConverter(), timeout=0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await pipeline.process(VALID_PDF_BYTES + b'SLOW')
+        # Other documents are unaffected, and the timeout can be lifted per call.
+        return await pipeline.process(VALID_PDF_BYTES, timeout=None)
+
+    assert len(asyncio.run(run())) == 1
+
+def test_timed_out_conversion_keeps_the_converter_until_it_finishes():
+    converter = StubConverter()
+
+    async def run():
+        pipeline = AsyncDocumentPipeline(converter, timeout=0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await pipeline.process(VALID_PDF_BYTES + b'SLOW')
+        # The slow conversion is still running on its thread; the next one must wait for it.
+        return await pipeline.process(VALID_PDF_BYTES, timeout=None)
+
+    assert len(asyncio.run(run())) == 1
+    assert converter.max_active == 1
+
+def test_submitted_document_can_be_cancelled_individually():
+    async def run():
+        pool = ConverterPool(size=2, converter_factory=StubConverter)
+        pipeline = AsyncDocumentPipeline(pool)
+        slow = pipeline.submit(VALID_PDF_BYTES + b'SLOW')
+        fast = pipeline.submit(VALID_PDF_BYTES)
+        await asyncio.sleep(0.05)
+        slow.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+        return await fast
+
+    assert len(asyncio.run(run())) == 1
+
+def test_process_many_reports_each_document(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(VALID_PDF_BYTES * 5)
+    sources = [VALID_PDF_BYTES, NON_PDF_BYTES, str(pdf_path), VALID_PDF_BYTES + b'SLOW']
+
+    async def run():
+        pool = ConverterPool(size=4, converter_factory=StubConverter)
+        pipeline = AsyncDocumentPipeline(pool, max_concurrency=4, timeout=0.5)
+        return [result async for result in pipeline.process_many(sources)]
+
+    results = sorted(asyncio.run(run()), key=lambda result: result.index)
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[0].error is None and len(results[0].pages) == 1
+    assert results[1].error_type == 'ValueError'
+    assert results[2].error is None and len(results[2].pages) == 2
+    assert results[3].error_type == 'TimeoutError'
+
+def test_process_many_cancels_remaining_documents_when_closed_early():
+    async def run():
+        pool = ConverterPool(size=1, converter_factory=StubConverter)
+        pipeline = AsyncDocumentPipeline(pool, max_concurrency=1)
+        results = pipeline.process_many([VALID_PDF_BYTES] + [VALID_PDF_BYTES + b'SLOW'] * 3)
+        first = await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0)
+        return first, pipeline.in_flight
+
+    first, in_flight = asyncio.run(run())
+
+    assert first.error is None
+    assert in_flight == 0
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError):
+        AsyncDocumentPipeline(StubConverter(), max_concurrency=0)
@@ -0,0 +1,167 @@
+import pytest
+import json
+import os
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_f06c3b8e2a1d4975b4e7a9d0c2f18e53 block
+from definition_f06c3b8e2a1d4975b4e7a9d0c2f18e53 import (
+    run_batch, main, read_elements_parquet, _collect_pdf_sources, _document_id,
+)
+# end definition_f06c3b8e2a1d4975b4e7a9d0c2f18e53 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+NON_PDF_BYTES = b'This is some random text, definitely not a PDF document.'
+
+class StubPage:
+    def __init__(self, page_number):
+        self.element_groups = [
+            SimpleNamespace(**{'bbox': (2, 2, 15, 8), 'class': 'Title', 'text_content': f"Heading {page_number}", 'confidence': 0.95}),
+            SimpleNamespace(**{'bbox': (2, 10, 18, 18), 'class': 'Text', 'text_content': f"Body {page_number}", 'confidence': 0.9}),
+        ]
+
+    def render(self):
+        return PIL_Image.new('RGB', (20, 20), 'white')
+
+class StubConverter:
+    """Picklable stand-in for DocumentConverter; one page per 100 bytes of input."""
+
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage(i) for i in range(1 + len(pdf_bytes) // 100)])
+
+def stub_converter_factory():
+    return StubConverter()
+
+class CrashingConverter(StubConverter):
+    """Kills its worker process on inputs containing b'CRASH', like a segfault in a native library."""
+
+    def convert_single(self, pdf_bytes):
+        if b'CRASH' in pdf_bytes:
+            os._exit(1)
+        return super().convert_single(pdf_bytes)
+
+def crashing_converter_factory():
+    return CrashingConverter()
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    directory = tmp_path / "pdfs"
+    (directory / "nested").mkdir(parents=True)
+    (directory / "a.pdf").write_bytes(VALID_PDF_BYTES)
+    (directory / "b.pdf").write_bytes(VALID_PDF_BYTES * 4)
+    (directory / "broken.pdf").write_bytes(NON_PDF_BYTES)
+    (directory / "notes.txt").write_text("not a pdf")
+    (directory / "nested" / "c.pdf").write_bytes(VALID_PDF_BYTES)
+    return directory
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_collect_sources_expands_directories(pdf_dir):
+    flat = _collect_pdf_sources([str(pdf_dir)])
+    nested = _collect_pdf_sources([str(pdf_dir)], recursive=True)
+
+    assert [os.path.basename(source) for source in flat] == ['a.pdf', 'b.pdf', 'broken.pdf']
+    assert [os.path.basename(source) for source in nested] == ['a.pdf', 'b.pdf', 'broken.pdf', 'c.pdf']
+    assert _collect_pdf_sources([str(pdf_dir / "a.pdf"), str(pdf_dir / "a.pdf")]) == [str(pdf_dir / "a.pdf")]
+
+def test_document_ids_are_stable_and_distinct(pdf_dir):
+    assert _document_id(str(pdf_dir / "a.pdf")) == _document_id(str(pdf_dir / "a.pdf"))
+    assert _document_id(str(pdf_dir / "a.pdf")) != _document_id(str(pdf_dir / "nested" / "a.pdf"))
+    assert _document_id(str(pdf_dir / "a.pdf")).startswith("a-")
+
+def test_run_batch_writes_elements_overlays_and_progress(pdf_dir, tmp_path):
+    output_dir = tmp_path / "out"
+
+    summary = run_batch([str(pdf_dir)], str(output_dir), overlays=True, max_workers=2,
+                        converter_factory=stub_converter_factory, log=None)
+
+    assert summary['documents'] == 3
+    assert summary['failed'] == 1
+    assert summary['pages'] == 1 + 2
+    assert summary['elements'] == 2 * 3
+    assert summary['docs_per_sec'] > 0 and summary['pages_per_sec'] > 0
+
+    records = read_jsonl(output_dir / "elements" / f"{_document_id(str(pdf_dir / 'b.pdf'))}.jsonl")
+    assert [(record['page'], record['class']) for record in records] == [(1, 'Title'), (1, 'Text'), (2, 'Title'), (2, 'Text')]
+    assert records[0]['text_content'] == "Heading 0"
+    assert (records[0]['x0'], records[0]['y0'], records[0]['x1'], records[0]['y1']) == (2, 2, 15, 8)
+
+    overlay_dir = output_dir / "overlays" / _document_id(str(pdf_dir / 'b.pdf'))
+    assert sorted(os.listdir(overlay_dir)) == ['page_0001.png', 'page_0002.png']
+    overlay = PIL_Image.open(overlay_dir / 'page_0001.png')
+    assert overlay.getpixel((2, 2)) != (255, 255, 255)
+
+    progress = {os.path.basename(record['source']): record for record in read_jsonl(output_dir / "progress.jsonl")}
+    assert progress['a.pdf']['status'] == 'ok'
+    assert progress['broken.pdf']['status'] == 'failed'
+    assert progress['broken.pdf']['error_type'] == 'ValueError'
+
+def test_run_batch_resumes_and_retries_failures(pdf_dir, tmp_path):
+    output_dir = tmp_path / "out"
+    run_batch([str(pdf_dir)], str(output_dir), max_workers=1, converter_factory=stub_converter_factory, log=None)
+    (pdf_dir / "broken.pdf").write_bytes(VALID_PDF_BYTES)
+
+    summary = run_batch([str(pdf_dir)], str(output_dir), max_workers=1,
+                        converter_factory=stub_converter_factory, log=None)
+
+    assert summary['skipped'] == 2
+    assert summary['documents'] == 1
+    assert summary['failed'] == 0
+    assert (output_dir / "elements" / f"{_document_id(str(pdf_dir / 'broken.pdf'))}.jsonl").exists()
+
+def test_run_batch_ignores_torn_progress_line(pdf_dir, tmp_path):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    (output_dir / "progress.jsonl").write_text('{"source": "trunc')
+
+    summary = run_batch([str(pdf_dir / "a.pdf")], str(output_dir), max_workers=1,
+                        converter_factory=stub_converter_factory, log=None)
+
+    assert summary['documents'] == 1
+
+def test_run_batch_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        run_batch([], str(tmp_path), output_format='csv')
+
+def test_main_reports_throughput_and_exit_status(pdf_dir, tmp_path, capsys):
+    converter = f"{__name__}:stub_converter_factory"
+
+    status = main([str(pdf_dir / "a.pdf"), '-o', str(tmp_path / "out"), '--workers', '1', '--converter', converter])
+    assert status == 0
+    output = capsys.readouterr().out
+    assert "docs/sec" in output and "pages/sec" in output
+
+    status = main([str(pdf_dir / "broken.pdf"), '-o', str(tmp_path / "out"), '--workers', '1', '--converter', converter])
+    assert status == 1
+
+def test_main_rejects_unimportable_converter(tmp_path):
+    with pytest.raises(SystemExit):
+        main(['x.pdf', '-o', str(tmp_path), '--converter', 'no_such_module:factory'])
+
+def test_main_writes_parquet_dataset_despite_a_crashing_input(pdf_dir, tmp_path):
+    (pdf_dir / "crash.pdf").write_bytes(VALID_PDF_BYTES + b"CRASH")
+    output_dir = tmp_path / "out"
+    inputs = [str(pdf_dir / name) for name in ("a.pdf", "b.pdf", "crash.pdf")]
+    converter = f"{__name__}:crashing_converter_factory"
+
+    status = main(inputs + ['-o', str(output_dir), '--format', 'parquet', '--workers', '2', '--converter', converter])
+
+    assert status == 1
+    progress = {os.path.basename(record['source']): record for record in read_jsonl(output_dir / "progress.jsonl")}
+    assert progress['a.pdf']['status'] == progress['b.pdf']['status'] == 'ok'
+    assert progress['crash.pdf']['status'] == 'failed'
+    table = read_elements_parquet(str(output_dir / "elements"))
+    assert sorted(set(table.column('document_id').to_pylist())) == sorted(_document_id(source) for source in inputs[:2])
+    assert table.num_rows == 2 * (1 + 2)
+    # Written by ParquetElementExporter, partitioned by class, with no staging files left behind.
+    assert sorted(os.listdir(output_dir / "elements")) == ['class=Text', 'class=Title']
+
+    # Once fixed, only the crashed document is converted again and joins the dataset.
+    (pdf_dir / "crash.pdf").write_bytes(VALID_PDF_BYTES)
+    status = main(inputs + ['-o', str(output_dir), '--format', 'parquet', '--workers', '2', '--converter', converter])
+
+    assert status == 0
+    table = read_elements_parquet(str(output_dir / "elements"), filters=[('class', '=', 'Title')])
+    assert sorted(table.column('page').to_pylist()) == [1, 1, 1, 2]
@@ -0,0 +1,123 @@
+import os
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+pa = pytest.importorskip("pyarrow")
+
+# definition_0a6e3c1f9b7d42e5a8c4f2b0d6e1a937 block
+from definition_0a6e3c1f9b7d42e5a8c4f2b0d6e1a937 import (
+    LayoutElementStore, ParquetElementExporter, element_arrow_schema, read_elements_parquet,
+)
+# end definition_0a6e3c1f9b7d42e5a8c4f2b0d6e1a937 block
+
+def make_element(bbox, class_name, text_content, confidence):
+    return SimpleNamespace(**{'bbox': bbox, 'class': class_name, 'text_content': text_content, 'confidence': confidence})
+
+class StubPage:
+    def __init__(self, elements):
+        self.element_groups = elements
+
+    def render(self):
+        raise AssertionError("exporting must not render pages")
+
+def make_result(pages_elements):
+    return SimpleNamespace(pages=[StubPage([make_element(*e) for e in elements]) for elements in pages_elements])
+
+DOC_A = [
+    [((0, 0, 10, 10), "Text", "Hello", 0.9), ((10, 10, 20, 20), "Table", "Wörld", 0.3)],
+    [],
+    [((30, 30, 40, 40), "Table", "", 0.8), ((50, 50, 60, 60), "Text", "No score", None)],
+]
+DOC_B = [
+    [((1, 2, 3, 4), "Table", "B table", 0.1), ((5, 6, 7, 8), "Title", "B title", 0.99)],
+]
+
+def rows_by_key(table):
+    return {(row['document_id'], row['page'], row['element_index']): row for row in table.to_pylist()}
+
+def test_rows_match_elements(tmp_path):
+    root = str(tmp_path / "dataset")
+    with ParquetElementExporter(root) as exporter:
+        exporter.add_document("a", make_result(DOC_A))
+        exporter.add_document("b", make_result(DOC_B))
+    assert exporter.documents == 2
+    assert exporter.rows_written == 6
+    assert sorted(os.listdir(root)) == ["class=Table", "class=Text", "class=Title"]
+
+    rows = rows_by_key(read_elements_parquet(root))
+    assert len(rows) == 6
+    row = rows[("a", 1, 1)]
+    assert row['class'] == "Table"
+    assert row['text_content'] == "Wörld"
+    assert (row['x0'], row['y0'], row['x1'], row['y1']) == (10, 10, 20, 20)
+    assert row['confidence'] == pytest.approx(0.3)
+    assert rows[("a", 3, 1)]['confidence'] is None
+    assert rows[("b", 1, 0)]['text_content'] == "B table"
+
+def test_predicate_pushdown_query(tmp_path):
+    root = str(tmp_path / "dataset")
+    with ParquetElementExporter(root) as exporter:
+        exporter.add_document("a", make_result(DOC_A))
+        exporter.add_document("b", make_result(DOC_B))
+    table = read_elements_parquet(root, columns=['document_id', 'page', 'text_content'],
+                                  filters=[('class', '=', 'Table'), ('confidence', '<', 0.5)])
+    assert sorted(table.column('text_content').to_pylist()) == ["B table", "Wörld"]
+
+def test_row_groups_are_bounded(tmp_path):
+    root = str(tmp_path / "dataset")
+    pages = [[((i, i, i + 1, i + 1), "Text", f"t{i}", 0.5) for i in range(7)]]
+    with ParquetElementExporter(root, partition_by=(), row_group_size=3) as exporter:
+        for i in range(4):
+            exporter.add_document(f"doc{i}", make_result(pages))
+            # Buffered rows never exceed a single row group.
+            assert sum(exporter._buffered.values()) < 3
+    (name,) = os.listdir(root)
+    import pyarrow.parquet as pq
+    metadata = pq.ParquetFile(os.path.join(root, name)).metadata
+    assert metadata.num_rows == 28
+    assert max(metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)) <= 3
+
+def test_many_small_partitions_stay_bounded(tmp_path):
+    root = str(tmp_path / "dataset")
+    pages = [[((i, i, i + 1, i + 1), "Text", f"t{i}", 0.5) for i in range(5)]]
+    with ParquetElementExporter(root, partition_by=('document_id',), max_buffered_rows=12,
+                                max_open_files=2) as exporter:
+        for i in range(20):
+            exporter.add_document(f"doc{i:02d}", make_result(pages))
+            assert exporter._buffered_total <= 12
+            assert len(exporter._writers) <= 2
+    assert len(os.listdir(root)) == 20
+    table = read_elements_parquet(root)
+    assert table.num_rows == 100
+    assert sorted(set(table.column('document_id').to_pylist())) == [f"doc{i:02d}" for i in range(20)]
+
+def test_reopened_partition_gets_a_new_file(tmp_path):
+    root = str(tmp_path / "dataset")
+    with ParquetElementExporter(root, max_buffered_rows=1, max_open_files=1) as exporter:
+        for _ in range(2):
+            exporter.add_document("a", make_result(DOC_A))
+    assert len(os.listdir(os.path.join(root, "class=Text"))) > 1
+    assert read_elements_parquet(root).num_rows == 8
+
+def test_accepts_store_and_extracted_pages(tmp_path):
+    root = str(tmp_path / "dataset")
+    image = PIL_Image.new('RGB', (10, 10))
+    pages = [(image, [make_element(*e) for e in elements]) for elements in DOC_A]
+    with ParquetElementExporter(root, partition_by=('document_id',)) as exporter:
+        exporter.add_document("store", LayoutElementStore.from_docling_result(make_result(DOC_A)))
+        exporter.add_document("pages", pages)
+        exporter.add_document("empty", make_result([[]]))
+    table = read_elements_parquet(root)
+    assert table.num_rows == 8
+    assert sorted(os.listdir(root)) == ["document_id=pages", "document_id=store"]
+
+def test_schema_and_invalid_arguments(tmp_path):
+    assert element_arrow_schema().names == [
+        'document_id', 'page', 'element_index', 'class', 'x0', 'y0', 'x1', 'y1', 'confidence', 'text_content']
+    with pytest.raises(ValueError):
+        ParquetElementExporter(str(tmp_path), partition_by=('colour',))
+    with pytest.raises(ValueError):
+        ParquetElementExporter(str(tmp_path), row_group_size=0)
+    with pytest.raises(ValueError):
+        ParquetElementExporter(str(tmp_path), max_open_files=0)
@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+import pytest
+
+# definition_3c7f1a9e5b2d4068a1e9c4f7b3d0a516 block
+import definition_3c7f1a9e5b2d4068a1e9c4f7b3d0a516 as bench_module
+from definition_3c7f1a9e5b2d4068a1e9c4f7b3d0a516 import (
+    BENCHMARKS, benchmark_main, compare_benchmark_results, load_benchmark_results, run_benchmark_suite,
+)
+# end definition_3c7f1a9e5b2d4068a1e9c4f7b3d0a516 block
+
+def make_report(timings):
+    return {'version': 1, 'results': {case: {'best_ms': ms, 'median_ms': ms} for case, ms in timings.items()}}
+
+@pytest.fixture(scope="module")
+def quick_report(tmp_path_factory):
+    path = tmp_path_factory.mktemp("bench") / "results.json"
+    report = run_benchmark_suite(element_counts=(10, 50), page_counts=(1, 3), repeats=2,
+                                 output_path=str(path), log=None)
+    return report, path
+
+def test_suite_covers_every_benchmark_and_size(quick_report):
+    report, _ = quick_report
+    assert set(report['results']) == {
+        'draw_bounding_boxes[elements=10]', 'draw_bounding_boxes[elements=50]',
+        'on_image_click[elements=10]', 'on_image_click[elements=50]',
+        'update_display[elements=10]', 'update_display[elements=50]',
+        'extract_page_images_and_elements[pages=1]', 'extract_page_images_and_elements[pages=3]',
+        'load_pdf_document[pages=1]', 'load_pdf_document[pages=3]',
+    }
+    for result in report['results'].values():
+        assert result['benchmark'] in BENCHMARKS
+        assert 0 < result['best_ms'] <= result['median_ms']
+        assert result['repeats'] == 2
+
+def test_results_are_saved_as_json(quick_report):
+    report, path = quick_report
+    assert load_benchmark_results(str(path)) == json.loads(json.dumps(report))
+
+def test_suite_restores_viewer_globals(quick_report):
+    assert bench_module.current_elements == []
+    assert bench_module.metadata_output is None
+    assert not hasattr(bench_module, 'all_pages_data')
+    assert bench_module.display_element_metadata.__name__ == 'display_element_metadata'
+
+def test_compare_flags_regressions_and_improvements():
+    baseline = make_report({'a': 10.0, 'b': 10.0, 'c': 10.0, 'd': 0.0001, 'gone': 1.0})
+    current = make_report({'a': 14.0, 'b': 10.5, 'c': 5.0, 'd': 0.0005, 'added': 1.0})
+    statuses = {entry['case']: entry['status'] for entry in compare_benchmark_results(baseline, current, tolerance=0.25)}
+    assert statuses == {'a': 'regression', 'b': 'ok', 'c': 'improvement', 'd': 'ok',
+                        'gone': 'missing', 'added': 'new'}
+
+def test_unknown_benchmark_raises():
+    with pytest.raises(ValueError):
+        run_benchmark_suite(benchmarks=['no_such_benchmark'], log=None)
+
+def test_benchmark_main_exit_status(tmp_path, quick_report):
+    _, path = quick_report
+    fast_baseline = make_report({case: 1e-6 for case in load_benchmark_results(str(path))['results']})
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps(fast_baseline))
+    argv = ['--only', 'draw_bounding_boxes', '--elements', '10', '--repeats', '1']
+    assert benchmark_main(argv + ['-o', str(tmp_path / "out.json")]) == 0
+    assert (tmp_path / "out.json").exists()
+    # Against an impossibly fast baseline every case regresses, unless the tolerance absorbs it.
+    assert benchmark_main(argv + ['--baseline', str(baseline_path)]) == 1
+    assert benchmark_main(argv + ['--baseline', str(baseline_path), '--tolerance', '1e9']) == 0
+
+def test_script_runs_benchmarks_with_bench_subcommand(tmp_path):
+    output = tmp_path / "bench.json"
+    command = [sys.executable, bench_module.__file__, 'bench', '--only', 'draw_bounding_boxes',
+               '--elements', '10', '--repeats', '1', '-o', str(output)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert load_benchmark_results(str(output))['results']
@@ -0,0 +1,114 @@
+import json
+import logging
+import tracemalloc
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_5e2b8d0f4a1c47e9b3d6a8c0e2f41b75 block
+import definition_5e2b8d0f4a1c47e9b3d6a8c0e2f41b75 as pipeline_module
+from definition_5e2b8d0f4a1c47e9b3d6a8c0e2f41b75 import (
+    InstrumentationCollector, JsonLinesSink, LoggingSink, disable_instrumentation, draw_bounding_boxes,
+    enable_instrumentation, extract_page_images_and_elements, instrumented, load_pdf_document,
+    process_pdf_with_docling,
+)
+# end definition_5e2b8d0f4a1c47e9b3d6a8c0e2f41b75 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+
+class StubPage:
+    def __init__(self):
+        self.element_groups = [SimpleNamespace(**{'bbox': (1, 1, 8, 8), 'class': 'Text', 'text_content': 'x', 'confidence': 0.9})]
+
+    def render(self):
+        return PIL_Image.new('RGB', (10, 10), 'white')
+
+class StubConverter:
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage() for _ in range(3)])
+
+class FailingConverter:
+    def convert_single(self, pdf_bytes):
+        raise RuntimeError("model crashed")
+
+@pytest.fixture(autouse=True)
+def no_leaked_sink():
+    yield
+    disable_instrumentation()
+
+def run_pipeline():
+    pdf_bytes = load_pdf_document('upload', VALID_PDF_BYTES)
+    docling_result = process_pdf_with_docling(StubConverter(), pdf_bytes)
+    pages = extract_page_images_and_elements(docling_result)
+    for image, elements in pages:
+        draw_bounding_boxes(image, elements, ['Text'], {'Text': 'red'})
+
+def test_disabled_instrumentation_is_a_shared_no_op():
+    assert pipeline_module._stage('convert') is pipeline_module._stage('render', page_index=1)
+    run_pipeline()
+
+def test_records_every_stage_and_page():
+    collector = InstrumentationCollector()
+    with instrumented(collector):
+        run_pipeline()
+    stages = [record['stage'] for record in collector.records]
+    assert stages == ['validate', 'convert', 'render', 'render', 'render', 'draw', 'draw', 'draw']
+    assert [record['page_index'] for record in collector.records if record['stage'] == 'render'] == [0, 1, 2]
+    for record in collector.records:
+        assert record['wall_s'] >= 0 and record['cpu_s'] >= 0
+        assert record['error'] is None
+        assert 'traced_peak_bytes' not in record
+    summary = collector.summary()
+    assert summary['render']['count'] == 3
+    assert summary['draw']['count'] == 3
+    # After leaving the block nothing is recorded any more.
+    run_pipeline()
+    assert len(collector.records) == 8
+
+def test_failed_stage_is_recorded_and_reraised():
+    collector = InstrumentationCollector()
+    with instrumented(collector):
+        with pytest.raises(RuntimeError):
+            process_pdf_with_docling(FailingConverter(), VALID_PDF_BYTES)
+    (record,) = collector.records
+    assert record['stage'] == 'convert' and record['error'] == 'RuntimeError'
+    assert collector.summary()['convert']['errors'] == 1
+
+def test_trace_memory_measures_allocations():
+    was_tracing = tracemalloc.is_tracing()
+    collector = InstrumentationCollector()
+    with instrumented(collector, trace_memory=True):
+        with pipeline_module._stage('outer'):
+            kept = bytearray(2_000_000)
+            with pipeline_module._stage('inner'):
+                scratch = bytearray(1_000_000)
+                del scratch
+    inner, outer = collector.records
+    assert inner['traced_peak_bytes'] >= 1_000_000
+    assert inner['traced_delta_bytes'] < 500_000
+    assert outer['traced_delta_bytes'] >= 2_000_000
+    assert outer['traced_peak_bytes'] >= 3_000_000
+    assert tracemalloc.is_tracing() == was_tracing
+    del kept
+
+def test_json_lines_and_logging_sinks(tmp_path, caplog):
+    path = tmp_path / "stages.jsonl"
+    with JsonLinesSink(str(path)) as sink, instrumented(sink):
+        run_pipeline()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['stage'] for record in records].count('render') == 3
+
+    with caplog.at_level(logging.INFO), instrumented(LoggingSink()):
+        process_pdf_with_docling(StubConverter(), VALID_PDF_BYTES)
+    assert any("stage=convert" in message for message in caplog.messages)
+
+def test_failing_sink_does_not_break_pipeline():
+    def broken_sink(record):
+        raise OSError("disk full")
+
+    enable_instrumentation(broken_sink)
+    run_pipeline()
+
+def test_sink_must_be_callable():
+    with pytest.raises(TypeError):
+        enable_instrumentation("not a sink")
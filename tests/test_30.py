@@ -0,0 +1,113 @@
+import urllib.error
+import urllib.request
+import pytest
+import requests
+from types import SimpleNamespace
+from unittest.mock import patch
+from PIL import Image as PIL_Image
+
+# definition_8f4d2a6c0e1b47a3b9c5d7e1f3a06b28 block
+from definition_8f4d2a6c0e1b47a3b9c5d7e1f3a06b28 import (
+    Counter, Histogram, MetricsRegistry, extract_page_images_and_elements, load_pdf_document,
+    metrics_registry, process_pdf_with_docling, start_metrics_server,
+)
+# end definition_8f4d2a6c0e1b47a3b9c5d7e1f3a06b28 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+
+class StubPage:
+    element_groups = []
+
+    def render(self):
+        return PIL_Image.new('RGB', (4, 4))
+
+class StubConverter:
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage(), StubPage()])
+
+class FailingConverter:
+    def convert_single(self, pdf_bytes):
+        raise TypeError("bad input")
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics_registry.clear()
+    yield
+    metrics_registry.clear()
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', "Jobs.", ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='say "hi"')
+    histogram = registry.histogram('latency_seconds', "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a"} 1' in text
+    assert 'jobs_total{kind="say \\"hi\\""} 2' in text
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+    assert histogram.snapshot()['sum'] == pytest.approx(5.55)
+
+def test_metric_validation():
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', "Jobs.", ('kind',))
+    assert registry.counter('jobs_total', "Jobs.", ('kind',)) is counter
+    with pytest.raises(ValueError):
+        registry.histogram('jobs_total', "Jobs.")
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind='a')
+    assert isinstance(counter, Counter) and isinstance(registry.histogram('h', "H."), Histogram)
+
+def test_load_pdf_document_updates_counters():
+    load_pdf_document('upload', VALID_PDF_BYTES)
+    with pytest.raises(ValueError):
+        load_pdf_document('upload', b'not a pdf')
+    with pytest.raises(TypeError):
+        load_pdf_document('upload', "not bytes")
+    with patch('requests.get', side_effect=requests.exceptions.ConnectionError("refused")):
+        with pytest.raises(Exception):
+            load_pdf_document('url', 'http://example.com/doc.pdf')
+
+    assert metrics_registry.get('pdf_documents_loaded_total').value(source_type='upload') == 1
+    assert metrics_registry.get('pdf_bytes_loaded_total').value(source_type='upload') == len(VALID_PDF_BYTES)
+    failures = metrics_registry.get('pdf_load_failures_total')
+    assert failures.value(source_type='upload', error_type='ValueError') == 1
+    assert failures.value(source_type='upload', error_type='TypeError') == 1
+    assert failures.value(source_type='url', error_type='ConnectionError') == 1
+
+def test_conversion_and_render_metrics():
+    result = process_pdf_with_docling(StubConverter(), VALID_PDF_BYTES)
+    extract_page_images_and_elements(result)
+    with pytest.raises(TypeError):
+        process_pdf_with_docling(FailingConverter(), VALID_PDF_BYTES)
+
+    assert metrics_registry.get('docling_conversion_seconds').snapshot()['count'] == 1
+    assert metrics_registry.get('docling_pages_converted_total').value() == 2
+    assert metrics_registry.get('docling_page_render_seconds').snapshot()['count'] == 2
+    assert metrics_registry.get('docling_conversion_failures_total').value(error_type='TypeError') == 1
+
+def test_metrics_endpoint_on_localhost():
+    load_pdf_document('upload', VALID_PDF_BYTES)
+    server = start_metrics_server(port=0)
+    try:
+        host, port = server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            body = response.read().decode('utf-8')
+        assert 'pdf_documents_loaded_total{source_type="upload"} 1' in body
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+        assert excinfo.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
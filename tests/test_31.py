@@ -0,0 +1,151 @@
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_2b9e5c7a1d3f4860b4a2e6c8d0f1a3b5 block
+from definition_2b9e5c7a1d3f4860b4a2e6c8d0f1a3b5 import (
+    DoclingResultCache, ExtractedPages, LazyPageSequence, PageSubsetResult, ParquetElementExporter,
+    _element_records, extract_page_images_and_elements, page_numbers_of, parse_page_selection,
+    process_pdf_with_docling, read_elements_parquet,
+)
+# end definition_2b9e5c7a1d3f4860b4a2e6c8d0f1a3b5 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+
+class StubPage:
+    def __init__(self, number, rendered):
+        self.number = number
+        self.rendered = rendered
+        self.element_groups = [SimpleNamespace(**{'bbox': (0, 0, 5, 5), 'class': 'Text',
+                                                  'text_content': f"page {number}", 'confidence': 0.9})]
+
+    def render(self):
+        self.rendered.append(self.number)
+        return PIL_Image.new('RGB', (8, 8))
+
+class WholeDocumentConverter:
+    """A converter without page-range support: always converts all num_pages pages."""
+
+    def __init__(self, num_pages=20):
+        self.num_pages = num_pages
+        self.rendered = []
+
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage(n, self.rendered) for n in range(1, self.num_pages + 1)])
+
+class PageRangeConverter(WholeDocumentConverter):
+    """A converter analysing only the requested (first, last) page range, like Docling's page_range."""
+
+    def __init__(self, num_pages=20):
+        super().__init__(num_pages)
+        self.calls = []
+
+    def convert_single(self, pdf_bytes, page_range=None):
+        self.calls.append(page_range)
+        first, last = page_range or (1, self.num_pages)
+        last = min(last, self.num_pages)
+        return SimpleNamespace(pages=[StubPage(n, self.rendered) for n in range(first, last + 1)])
+
+@pytest.mark.parametrize("selection, expected", [
+    (None, None),
+    (3, (3,)),
+    ([5, 1, 5], (1, 5)),
+    (range(10, 13), (10, 11, 12)),
+    ("10-12", (10, 11, 12)),
+    ("1, 3, 5-7", (1, 3, 5, 6, 7)),
+    ("first 3", (1, 2, 3)),
+    ("First:2", (1, 2)),
+])
+def test_parse_page_selection(selection, expected):
+    assert parse_page_selection(selection) == expected
+
+@pytest.mark.parametrize("selection, error", [
+    ("", ValueError), ("3-1", ValueError), ("a-b", ValueError), ("1--2", ValueError),
+    ([0, 1], ValueError), ([], ValueError), (["1"], TypeError), (2.5, TypeError), (True, TypeError),
+])
+def test_parse_page_selection_rejects_invalid(selection, error):
+    with pytest.raises(error):
+        parse_page_selection(selection)
+
+def test_page_range_converter_only_analyses_selected_span():
+    converter = PageRangeConverter()
+    result = process_pdf_with_docling(converter, VALID_PDF_BYTES, pages="10-12, 14")
+    assert converter.calls == [(10, 14)]
+    assert isinstance(result, PageSubsetResult)
+    assert result.page_numbers == [10, 11, 12, 14]
+    assert [page.number for page in result.pages] == [10, 11, 12, 14]
+
+def test_whole_document_converter_result_is_cut_down():
+    converter = WholeDocumentConverter(num_pages=5)
+    result = process_pdf_with_docling(converter, VALID_PDF_BYTES, pages=[2, 4, 9])
+    # Pages past the end of the document are ignored.
+    assert result.page_numbers == [2, 4]
+    assert [page.number for page in result.pages] == [2, 4]
+    assert page_numbers_of(result) == (2, 4)
+
+def test_extraction_renders_only_selected_pages_and_keeps_numbers():
+    converter = PageRangeConverter()
+    result = process_pdf_with_docling(converter, VALID_PDF_BYTES, pages="first 3")
+    extracted = extract_page_images_and_elements(result)
+    assert isinstance(extracted, ExtractedPages)
+    assert extracted.page_numbers == (1, 2, 3)
+    assert converter.rendered == [1, 2, 3]
+
+    converter.rendered.clear()
+    subset = extract_page_images_and_elements(result, pages=[2, 3], max_workers=2)
+    assert subset.page_numbers == (2, 3)
+    assert sorted(converter.rendered) == [2, 3]
+    assert [elements[0].text_content for _, elements in subset] == ["page 2", "page 3"]
+
+def test_extraction_selects_pages_of_a_full_result():
+    converter = WholeDocumentConverter(num_pages=8)
+    result = process_pdf_with_docling(converter, VALID_PDF_BYTES)
+    assert page_numbers_of(result) == tuple(range(1, 9))
+    assert not isinstance(extract_page_images_and_elements(result), ExtractedPages)
+    converter.rendered.clear()
+
+    lazy = extract_page_images_and_elements(result, lazy=True, pages="6-7")
+    assert isinstance(lazy, LazyPageSequence)
+    assert lazy.page_numbers == (6, 7) and len(lazy) == 2
+    assert converter.rendered == []
+    assert lazy[1][1][0].text_content == "page 7"
+    assert converter.rendered == [7]
+
+def test_page_range_is_part_of_the_cache_key(tmp_path):
+    cache = DoclingResultCache(str(tmp_path / "cache"))
+    converter = PageRangeConverter()
+    first = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache, pages="3-4")
+    again = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache, pages="3-4")
+    other = process_pdf_with_docling(converter, VALID_PDF_BYTES, cache=cache, pages="5")
+    assert converter.calls == [(3, 4), (5, 5)]
+    assert first.page_numbers == again.page_numbers == [3, 4]
+    assert other.page_numbers == [5]
+    assert [page.element_groups[0].text_content for page in again.pages] == ["page 3", "page 4"]
+
+def test_cache_renders_only_selected_pages(tmp_path):
+    cache = DoclingResultCache(str(tmp_path / "cache"))
+    whole = WholeDocumentConverter(num_pages=6)
+    process_pdf_with_docling(whole, VALID_PDF_BYTES, cache=cache, pages="2")
+    assert whole.rendered == [2]
+
+    ranged = PageRangeConverter(num_pages=6)
+    process_pdf_with_docling(ranged, VALID_PDF_BYTES, cache=cache, pages="2, 5")
+    assert ranged.rendered == [2, 5]
+    hit = process_pdf_with_docling(ranged, VALID_PDF_BYTES, cache=cache, pages=[5, 2])
+    assert cache.hits == 1 and ranged.rendered == [2, 5]
+    assert page_numbers_of(hit) == (2, 5)
+    assert [elements[0].text_content for _, elements in extract_page_images_and_elements(hit)] == ["page 2", "page 5"]
+    # Another selection with the same first and last page is a different entry.
+    process_pdf_with_docling(ranged, VALID_PDF_BYTES, cache=cache, pages="2-5")
+    assert cache.misses == 3
+
+def test_exports_keep_original_page_numbers(tmp_path):
+    result = process_pdf_with_docling(PageRangeConverter(), VALID_PDF_BYTES, pages="10, 12")
+    extracted = extract_page_images_and_elements(result)
+    assert [record['page'] for record in _element_records("doc", "doc.pdf", extracted)] == [10, 12]
+
+    with ParquetElementExporter(str(tmp_path / "dataset"), partition_by=()) as exporter:
+        exporter.add_document("doc", result)
+        exporter.add_document("lazy", extract_page_images_and_elements(result, lazy=True))
+    table = read_elements_parquet(str(tmp_path / "dataset"))
+    assert sorted(table.column('page').to_pylist()) == [10, 10, 12, 12]
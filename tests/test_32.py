@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_6d1f3b8a2c5e4972a0b7d9e1c3f5a864 block
+from definition_6d1f3b8a2c5e4972a0b7d9e1c3f5a864 import (
+    MappedPageStore, create_interactive_viewer, extract_page_images_and_elements, page_numbers_of,
+    process_pdf_with_docling,
+)
+# end definition_6d1f3b8a2c5e4972a0b7d9e1c3f5a864 block
+
+class StubPage:
+    def __init__(self, number, mode, renders):
+        self.number = number
+        self.mode = mode
+        self.renders = renders
+        self.element_groups = [SimpleNamespace(**{'bbox': (1, 2, 3, 4), 'class': 'Text',
+                                                  'text_content': f"page {number}", 'confidence': 0.5})]
+
+    def render(self):
+        self.renders.append(self.number)
+        rng = np.random.default_rng(self.number)
+        size = (17 + self.number, 11)
+        if self.mode == 'RGB':
+            return PIL_Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), 'RGB')
+        if self.mode == 'RGBA':
+            return PIL_Image.fromarray(rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8), 'RGBA')
+        return PIL_Image.new(self.mode, size, 1)
+
+def make_result(modes, renders):
+    return SimpleNamespace(pages=[StubPage(n, mode, renders) for n, mode in enumerate(modes, start=1)])
+
+def test_store_round_trips_pixels_and_elements(tmp_path):
+    renders = []
+    result = make_result(['RGB', 'L', 'RGBA', '1', 'P'], renders)
+    expected = [page.render() for page in result.pages]
+    renders.clear()
+
+    store = MappedPageStore.create(str(tmp_path / "doc"), result)
+    assert renders == [1, 2, 3, 4, 5]
+    assert len(store) == 5
+    assert page_numbers_of(store) == (1, 2, 3, 4, 5)
+    for index, original in enumerate(expected):
+        image, elements = store[index]
+        converted = original.convert('L') if original.mode == '1' else original.convert('RGB') if original.mode == 'P' else original
+        assert image.mode == converted.mode
+        assert image.size == converted.size
+        assert image.tobytes() == converted.tobytes()
+        assert elements[0].text_content == f"page {index + 1}"
+        assert getattr(elements[0], 'class') == 'Text'
+    assert store[-1][0].size == expected[-1].size
+    with pytest.raises(IndexError):
+        store[5]
+
+def test_arrays_are_read_only_views_of_the_mapping(tmp_path):
+    store = MappedPageStore.create(str(tmp_path / "doc"), make_result(['RGB', 'L'], []))
+    array = store.array(0)
+    assert array.shape == (11, 18, 3)
+    assert not array.flags.writeable
+    assert isinstance(array.base, np.memmap) or isinstance(array.base.base, np.memmap)
+    assert array.ctypes.data % 64 == 0 and store.array(1).ctypes.data % 64 == 0
+    # Repeated access returns the same image object, so identity-keyed caches keep hitting.
+    assert store[1][0] is store[1][0]
+
+def test_reopening_skips_rendering(tmp_path):
+    renders = []
+    result = make_result(['RGB'] * 3, renders)
+    store_dir = str(tmp_path / "doc")
+    first = extract_page_images_and_elements(result, page_store_dir=store_dir)
+    assert isinstance(first, MappedPageStore) and renders == [1, 2, 3]
+
+    again = extract_page_images_and_elements(result, page_store_dir=store_dir)
+    reopened = MappedPageStore(store_dir)
+    assert renders == [1, 2, 3]
+    assert again[2][0].tobytes() == first[2][0].tobytes() == reopened[2][0].tobytes()
+    with pytest.raises(FileExistsError):
+        MappedPageStore.create(store_dir, result)
+
+def test_page_subsets_keep_their_numbers(tmp_path):
+    renders = []
+    converter = SimpleNamespace(convert_single=lambda pdf_bytes: make_result(['L'] * 6, renders))
+    subset = process_pdf_with_docling(converter, b'%PDF-1.4', pages="2, 5")
+    store = extract_page_images_and_elements(subset, page_store_dir=str(tmp_path / "doc"))
+    assert renders == [2, 5]
+    assert store.page_numbers == (2, 5)
+    assert MappedPageStore(str(tmp_path / "doc")).page_numbers == (2, 5)
+
+def test_store_is_shared_with_another_process(tmp_path):
+    store_dir = str(tmp_path / "doc")
+    store = MappedPageStore.create(store_dir, make_result(['RGB', 'L'], []))
+    definitions_dir = os.path.dirname(sys.modules[MappedPageStore.__module__].__file__)
+    module_name = MappedPageStore.__module__
+    code = (f"import sys; sys.path.insert(0, {definitions_dir!r}); import {module_name} as d; "
+            f"print(d.MappedPageStore({store_dir!r}).array(1).sum())")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert int(output.strip().splitlines()[-1]) == int(store.array(1).sum())
+
+def test_viewer_accepts_a_page_store(tmp_path):
+    store = MappedPageStore.create(str(tmp_path / "doc"), make_result(['RGB', 'L'], []))
+    assert len(store[0][1]) == 1
+    assert create_interactive_viewer(store, {'Text': 'red'}) is not None
+    # Docling-style elements expose only 'class'.
+    pages = extract_page_images_and_elements(make_result(['RGB'], []))
+    assert not hasattr(pages[0][1][0], 'class_name')
+    assert create_interactive_viewer(pages, {'Text': 'red'}) is not None
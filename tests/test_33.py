@@ -0,0 +1,155 @@
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from PIL import Image as PIL_Image
+
+# definition_9c3e5a7b1d2f4086b8e0a4c6d2f1b3e7 block
+from definition_9c3e5a7b1d2f4086b8e0a4c6d2f1b3e7 import ConverterPool, StreamingPipeline, _blank_pdf_bytes
+# end definition_9c3e5a7b1d2f4086b8e0a4c6d2f1b3e7 block
+
+VALID_PDF_BYTES = b'%PDF-1.4\nSample PDF content.\n%EOF'
+
+class LiveCounter:
+    """Counts pages rendered but not yet consumed by the sink."""
+
+    def __init__(self):
+        self.live = 0
+        self.max_live = 0
+        self.lock = threading.Lock()
+
+    def rendered(self):
+        with self.lock:
+            self.live += 1
+            self.max_live = max(self.max_live, self.live)
+
+    def consumed(self):
+        with self.lock:
+            self.live -= 1
+
+class StubPage:
+    def __init__(self, number, counter):
+        self.number = number
+        self.counter = counter
+        self.element_groups = [SimpleNamespace(**{'bbox': (1, 1, 6, 6), 'class': 'Text',
+                                                  'text_content': f"page {number}", 'confidence': 0.9})]
+
+    def render(self):
+        if self.counter is not None:
+            self.counter.rendered()
+        return PIL_Image.new('RGB', (10, 10), 'white')
+
+class ChunkedConverter:
+    """Supports page ranges, like Docling's convert with page_range."""
+
+    def __init__(self, num_pages, counter=None):
+        self.num_pages = num_pages
+        self.counter = counter
+        self.calls = []
+
+    def convert_single(self, pdf_bytes, page_range=None):
+        self.calls.append(page_range)
+        first, last = page_range
+        return SimpleNamespace(pages=[StubPage(n, self.counter) for n in range(first, min(last, self.num_pages) + 1)])
+
+class WholeDocumentConverter:
+    def __init__(self, num_pages):
+        self.num_pages = num_pages
+
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[StubPage(n, None) for n in range(1, self.num_pages + 1)])
+
+def test_pages_reach_sink_in_order_and_drawn():
+    received = []
+
+    def sink(page_number, image, elements):
+        received.append((page_number, image.getpixel((1, 1)), elements[0].text_content))
+
+    converter = ChunkedConverter(num_pages=10)
+    pipeline = StreamingPipeline(converter, sink, class_colors={'Text': '#FF0000'}, pages_per_chunk=4)
+    summary = pipeline.run(VALID_PDF_BYTES)
+    assert [page_number for page_number, _, _ in received] == list(range(1, 11))
+    assert all(pixel == (255, 0, 0) for _, pixel, _ in received)
+    assert received[3][2] == "page 4"
+    assert converter.calls == [(1, 4), (5, 8), (9, 12)]
+    assert summary['pages'] == 10
+    assert all(summary['stages'][name]['pages'] == 10 for name in StreamingPipeline.STAGES)
+
+def test_memory_is_bounded_by_the_queues():
+    counter = LiveCounter()
+    queue_size = 2
+    depths = []
+    pipeline = None
+
+    def slow_sink(page_number, image, elements):
+        depths.append(pipeline.queue_depths())
+        time.sleep(0.002)
+        counter.consumed()
+
+    pipeline = StreamingPipeline(ChunkedConverter(num_pages=200, counter=counter), slow_sink,
+                                 queue_size=queue_size, pages_per_chunk=5)
+    summary = pipeline.run(VALID_PDF_BYTES)
+    assert summary['pages'] == 200
+    # Rendered pages can only wait in the draw and sink queues or be held by one stage each.
+    assert counter.max_live <= 2 * queue_size + 3
+    assert all(depth <= queue_size for snapshot in depths for depth in snapshot.values())
+    assert summary['stages']['sink']['max_depth'] == queue_size
+    assert summary['stages']['sink']['blocked_s'] > 0
+
+class StrictConverter(ChunkedConverter):
+    """Rejects page ranges outside the document, optionally reporting the page count like Docling."""
+
+    def __init__(self, num_pages, report_page_count):
+        super().__init__(num_pages)
+        self.report_page_count = report_page_count
+
+    def convert_single(self, pdf_bytes, page_range=None):
+        if page_range[1] > self.num_pages:
+            raise ValueError(f"page_range {page_range} is out of range")
+        result = super().convert_single(pdf_bytes, page_range)
+        if self.report_page_count:
+            result.input = SimpleNamespace(page_count=self.num_pages)
+        return result
+
+@pytest.mark.parametrize("report_page_count, pdf_bytes", [
+    (True, VALID_PDF_BYTES),        # page count from the first converted chunk
+    (False, _blank_pdf_bytes(8)),   # page count hinted by precheck_pdf; the range past it is rejected
+])
+def test_chunks_stop_at_the_last_page(report_page_count, pdf_bytes):
+    received = []
+    converter = StrictConverter(num_pages=8, report_page_count=report_page_count)
+    StreamingPipeline(converter, lambda n, image, elements: received.append(n), pages_per_chunk=3).run(pdf_bytes)
+    assert received == list(range(1, 9))
+    assert converter.calls == [(1, 3), (4, 6), (7, 8)]
+
+@pytest.mark.parametrize("report_page_count", [True, False])
+def test_undercounted_precheck_does_not_truncate(report_page_count):
+    # The page tree claims 5 pages, but the converter sees 11 (e.g. pages added by an incremental update).
+    received = []
+    converter = StrictConverter(num_pages=11, report_page_count=report_page_count)
+    StreamingPipeline(converter, lambda n, image, elements: received.append(n),
+                      pages_per_chunk=3).run(_blank_pdf_bytes(5))
+    assert received == list(range(1, 12))
+
+def test_whole_document_converter_and_pool():
+    received = []
+    pool = ConverterPool(size=1, converter_factory=lambda: WholeDocumentConverter(num_pages=3))
+    summary = StreamingPipeline(pool, lambda n, image, elements: received.append(n)).run(VALID_PDF_BYTES)
+    assert received == [1, 2, 3] and summary['pages'] == 3
+    pool.close()
+
+def test_stage_errors_stop_the_pipeline():
+    def failing_sink(page_number, image, elements):
+        if page_number == 3:
+            raise OSError("disk full")
+
+    pipeline = StreamingPipeline(ChunkedConverter(num_pages=1000), failing_sink, queue_size=1)
+    with pytest.raises(OSError):
+        pipeline.run(VALID_PDF_BYTES)
+    assert pipeline.stats['convert']['pages'] < 1000
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        StreamingPipeline(ChunkedConverter(1), print, queue_size=0)
+    with pytest.raises(ValueError):
+        StreamingPipeline(ChunkedConverter(1), print, pages_per_chunk=0)
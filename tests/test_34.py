@@ -0,0 +1,103 @@
+import pytest
+from types import SimpleNamespace
+
+# definition_4e7b1c9d3a5f4628b0d2e8a6c4f1b3d9 block
+from definition_4e7b1c9d3a5f4628b0d2e8a6c4f1b3d9 import (
+    PdfStructureError, _blank_pdf_bytes, convert_documents_batch, load_pdf_document, precheck_pdf, precheck_pdf_file,
+)
+# end definition_4e7b1c9d3a5f4628b0d2e8a6c4f1b3d9 block
+
+VALID_PDF_BYTES = _blank_pdf_bytes(num_pages=3)
+
+class StubConverter:
+    def convert_single(self, pdf_bytes):
+        return SimpleNamespace(pages=[])
+
+def stub_converter_factory():
+    return StubConverter()
+
+def with_trailer(trailer_entries):
+    """VALID_PDF_BYTES with extra entries in its trailer dictionary."""
+    return VALID_PDF_BYTES.replace(b"/Root 1 0 R >>", b"/Root 1 0 R " + trailer_entries + b" >>")
+
+def test_valid_pdf_passes():
+    verdict = precheck_pdf(VALID_PDF_BYTES)
+    assert verdict.ok and verdict.errors == () and verdict.warnings == ()
+    assert verdict.version == '1.4'
+    assert verdict.size == len(VALID_PDF_BYTES)
+    assert verdict.page_count == 3
+    assert not verdict.encrypted and not verdict.linearized
+    assert VALID_PDF_BYTES[verdict.startxref:].startswith(b"xref")
+
+@pytest.mark.parametrize("content, error", [
+    (b"", 'empty'),
+    (b"GIF89a" + VALID_PDF_BYTES[5:], 'missing_header'),
+    (VALID_PDF_BYTES[:len(VALID_PDF_BYTES) // 2], 'missing_eof'),
+    (VALID_PDF_BYTES[:VALID_PDF_BYTES.rindex(b"startxref")] + b"%%EOF\n", 'missing_startxref'),
+    (VALID_PDF_BYTES.replace(b"startxref\n", b"startxref\n1"), 'bad_startxref'),
+])
+def test_broken_pdfs_are_reported(content, error):
+    verdict = precheck_pdf(content)
+    assert not verdict.ok
+    assert error in verdict.errors
+
+def test_encryption_is_reported_not_rejected():
+    # Owner-password-only files (permission restrictions) still convert; the caller decides.
+    verdict = precheck_pdf(with_trailer(b"/Encrypt 9 0 R"))
+    assert verdict.ok and verdict.encrypted
+    assert verdict.warnings == ('encrypted',)
+
+def make_large_pdf(padding_before_pages):
+    """A structurally valid PDF with padding_before_pages bytes between the header and the page tree."""
+    body = b"%PDF-1.7\n%" + b"0" * padding_before_pages + b"\n1 0 obj\n<< /Type /Pages /Kids [] /Count 99 >>\nendobj\n"
+    body += b"0" * 10_000_000
+    return body + b"xref\n0 1\n0000000000 65535 f \ntrailer\n<< /Size 1 >>\nstartxref\n%d\n%%%%EOF" % len(body)
+
+def test_large_buffer_reads_only_head_and_tail():
+    verdict = precheck_pdf(memoryview(make_large_pdf(0)))
+    assert verdict.ok and verdict.version == '1.7'
+    assert verdict.page_count == 99
+    # A page tree out of reach of the head and tail windows leaves the count unknown, not wrong.
+    verdict = precheck_pdf(make_large_pdf(10_000))
+    assert verdict.ok and verdict.page_count is None
+
+def test_linearized_page_count():
+    linearized = VALID_PDF_BYTES.replace(b"%PDF-1.4\n", b"%PDF-1.4\n99 0 obj\n<< /Linearized 1 /L 1 /N 42 >>\nendobj\n")
+    verdict = precheck_pdf(linearized)
+    assert verdict.linearized and verdict.page_count == 42
+
+def test_tolerated_oddities_are_warnings():
+    verdict = precheck_pdf(b"junk" + VALID_PDF_BYTES + b"\ngarbage")
+    # startxref is then relative to the header, which readers accept.
+    assert verdict.ok
+    assert set(verdict.warnings) == {'header_not_at_start', 'data_after_eof'}
+
+def test_precheck_pdf_file_matches_buffer(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(with_trailer(b"/Encrypt 9 0 R"))
+    assert precheck_pdf_file(str(path)) == precheck_pdf(path.read_bytes())
+
+def test_load_pdf_document_precheck():
+    truncated = VALID_PDF_BYTES[:len(VALID_PDF_BYTES) // 2]
+    # The magic-byte check alone accepts a truncated download.
+    assert load_pdf_document('upload', truncated) == truncated
+    assert load_pdf_document('upload', VALID_PDF_BYTES, precheck=True) == VALID_PDF_BYTES
+    assert load_pdf_document('upload', with_trailer(b"/Encrypt 9 0 R"), precheck=True)
+    with pytest.raises(PdfStructureError) as excinfo:
+        load_pdf_document('upload', truncated, precheck=True)
+    assert isinstance(excinfo.value, ValueError)
+    assert 'missing_eof' in excinfo.value.precheck.errors
+
+def test_batch_rejects_broken_files_before_conversion(tmp_path):
+    good = tmp_path / "good.pdf"
+    good.write_bytes(VALID_PDF_BYTES)
+    encrypted = tmp_path / "encrypted.pdf"
+    encrypted.write_bytes(with_trailer(b"/Encrypt 9 0 R"))
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(VALID_PDF_BYTES.replace(b"startxref\n", b"startxref\n1"))
+    sources = [str(good), str(encrypted), str(broken), VALID_PDF_BYTES[:40]]
+    results = sorted(convert_documents_batch(sources, max_workers=1, converter_factory=stub_converter_factory,
+                                             precheck=True), key=lambda result: result.index)
+    assert results[0].error is None and results[1].error is None
+    assert results[2].error_type == 'PdfStructureError' and 'bad_startxref' in results[2].error
+    assert results[3].error_type == 'PdfStructureError' and 'missing_eof' in results[3].error